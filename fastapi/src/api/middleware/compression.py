@@ -0,0 +1,179 @@
+import gzip
+from typing import Callable, Dict, List, Optional, Sequence
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.memory_cache import MISSING, MemoryCache
+
+# Кодировки в порядке предпочтения при равном q: brotli сжимает JSON заметно плотнее gzip
+ENCODINGS = ("br", "gzip")
+
+
+def choose_encoding(accept_encoding: str, encodings: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """
+    Кодировка ответа по заголовку Accept-Encoding: с наибольшим q, при равном —
+    по порядку encodings. None — клиент не принимает ни одну из них.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    default = weights.get("*", 0.0)
+    best: Optional[str] = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _etag_with_encoding(etag: str, encoding: str) -> str:
+    """ETag сжатого представления: у разных кодировок одного тела сильные ETag различаются."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(candidate: str) -> str:
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if candidate.endswith(suffix):
+            return candidate[:-len(suffix)] + '"'
+    return candidate
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware сжатия JSON-ответов gzip и brotli по Accept-Encoding.
+
+    Сжатие выполняется при ответе, а не при заполнении кеша: тела ответов
+    собираются из нескольких значений кеша (страница и фасеты) или из моделей,
+    так что готового сжатого тела под ключом кеша нет. Тело с ETag (маршруты
+    с политикой кеширования, см. ConditionalRequestMiddleware) запоминается
+    в памяти процесса по ETag и кодировке и сжимается один раз на воркер;
+    тело без ETag сжимается при каждом ответе.
+
+    Стоит снаружи ConditionalRequestMiddleware: у сжатых представлений к ETag
+    добавляется кодировка, а в If-None-Match она снимается перед сравнением,
+    так что 304 работает для любой кодировки.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        gzip_level: int,
+        brotli_quality: int,
+        memo: MemoryCache,
+    ):
+        """
+        Args:
+            app: Приложение ASGI
+            minimum_size: Тела меньше этого размера (в байтах) не сжимаются
+            gzip_level: Уровень сжатия gzip
+            brotli_quality: Качество сжатия brotli
+            memo: Кеш сжатых тел по (ETag, кодировка)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.memo = memo
+        self.compressors: Dict[str, Callable[[bytes], bytes]] = {
+            "br": lambda body: brotli.compress(body, mode=brotli.MODE_TEXT, quality=brotli_quality),
+            "gzip": lambda body: gzip.compress(body, compresslevel=gzip_level, mtime=0),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # scope меняется на месте: маршрут, который в него положит роутер, нужен внешним middleware
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"] if name != b"if-none-match"
+            ] + [(b"if-none-match", ",".join(_strip_encoding(c.strip()) for c in if_none_match.split(",")).encode())]
+
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] == 304:
+                    await send(self._not_modified(message, encoding, if_none_match))
+                    return
+                if (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith("application/json")
+                ):
+                    await send(message)
+                    return
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) < self.minimum_size:
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag")
+            compressed = self._compress(body, etag, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if etag is not None:
+                headers["etag"] = _etag_with_encoding(etag, encoding)
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, body: bytes, etag: Optional[str], encoding: str) -> bytes:
+        """
+        Сжатое тело; с ETag — из памяти по (ETag, кодировка). Тела без ETag сжимаются
+        каждый раз: хешировать каждое тело ради ключа памяти почти так же дорого.
+        """
+        if etag is None:
+            return self.compressors[encoding](body)
+        memo_key = (etag, encoding)
+        compressed = self.memo.get(memo_key)
+        if compressed is MISSING:
+            compressed = self.compressors[encoding](body)
+            self.memo.set(memo_key, compressed)
+        return compressed
+
+    @staticmethod
+    def _not_modified(message: Message, encoding: str, if_none_match: Optional[str]) -> Message:
+        """304 с ETag того представления, которое есть у клиента."""
+        headers = MutableHeaders(raw=list(message["headers"]))
+        etag = headers.get("etag")
+        if etag is not None and if_none_match is not None:
+            encoded = _etag_with_encoding(etag, encoding)
+            if encoded in if_none_match:
+                headers["etag"] = encoded
+                headers.add_vary_header("Accept-Encoding")
+        return {**message, "headers": headers.raw}
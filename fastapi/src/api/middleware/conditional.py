@@ -0,0 +1,108 @@
+from typing import List, Mapping, Optional
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.cache_service import compute_etag
+
+# Заголовки тела, которые не отправляются с 304
+_ENTITY_HEADERS = ("content-length", "content-type", "content-encoding")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Совпадает ли ETag с заголовком If-None-Match. Для If-None-Match по RFC 9110
+    используется слабое сравнение: префикс W/ не учитывается.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def _is_cursor_request(scope: Scope) -> bool:
+    query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    return any(name == "cursor" for name, _ in query)
+
+
+class ConditionalRequestMiddleware:
+    """
+    ASGI-middleware условных запросов для GET-маршрутов с политикой кеширования.
+
+    Тело успешного ответа буферизуется (ответы API — небольшой JSON), по нему
+    вычисляется сильный ETag, и ответ дополняется ETag и Cache-Control маршрута.
+    Если If-None-Match клиента или CDN совпал, вместо тела уходит 304. Так
+    неизменившийся ответ не передаётся повторно, а CDN может отдавать его сам
+    в пределах max-age и обновлять в фоне по stale-while-revalidate.
+
+    Маршруты, отдающие модели из кеша, ставят ETag закешированного значения сами
+    и на совпавший If-None-Match отвечают 304 до сборки моделей; такому ответу
+    middleware только добавляет Cache-Control.
+
+    Курсорные страницы привязаны к point-in-time Elasticsearch и не кешируются.
+    """
+
+    def __init__(self, app: ASGIApp, policies: Mapping[str, str]):
+        """
+        Args:
+            app: Приложение ASGI
+            policies: Шаблон пути маршрута -> значение Cache-Control
+        """
+        self.app = app
+        self.policies = dict(policies)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or _is_cursor_request(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Optional[Message] = None
+        policy: Optional[str] = None
+        chunks: List[bytes] = []
+
+        async def send_conditional(message: Message) -> None:
+            nonlocal start, policy
+            if message["type"] == "http.response.start":
+                # маршрут FastAPI кладёт в scope при сопоставлении пути
+                policy = self.policies.get(getattr(scope.get("route"), "path", None))
+                if policy is not None and message["status"] == 304:
+                    # маршрут сам ответил 304 по ETag закешированного значения (api.v1.responses.not_modified)
+                    headers = MutableHeaders(raw=list(message["headers"]))
+                    headers["cache-control"] = policy
+                    policy = None
+                    await send({**message, "headers": headers.raw})
+                    return
+                if policy is None or message["status"] != 200:
+                    policy = None
+                    await send(message)
+                    return
+                start = message
+                return
+            if policy is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag") or compute_etag(body)
+            headers["etag"] = etag
+            headers["cache-control"] = policy
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                for name in _ENTITY_HEADERS:
+                    del headers[name]
+                await send({**start, "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_conditional)
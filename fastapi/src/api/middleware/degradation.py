@@ -0,0 +1,38 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import DEGRADED_RESPONSES
+from db.resilience import track_degradations
+
+DEGRADED_HEADER = "X-Degraded"
+
+
+class DegradationMiddleware:
+    """
+    ASGI-middleware: сообщает клиенту, что ответ собран в деградированном режиме
+    (например, из устаревшего кеша, пока Elasticsearch недоступен).
+
+    Причины перечисляются в заголовке X-Degraded. Такой ответ помечается
+    Cache-Control: no-store, чтобы CDN не продолжал отдавать его после восстановления.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        reasons = track_degradations()
+
+        async def send_with_degradations(message: Message) -> None:
+            if message["type"] == "http.response.start" and reasons:
+                headers = MutableHeaders(scope=message)
+                headers[DEGRADED_HEADER] = ",".join(sorted(reasons))
+                headers["cache-control"] = "no-store"
+                for reason in reasons:
+                    DEGRADED_RESPONSES.labels(reason).inc()
+            await send(message)
+
+        await self.app(scope, receive, send_with_degradations)
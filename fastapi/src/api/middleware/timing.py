@@ -0,0 +1,44 @@
+import time
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import HTTP_REQUEST_DURATION
+
+# Метка для запросов, не попавших ни в один маршрут API: путь в метку не берём,
+# иначе случайные URL раздуют число временных рядов
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class TimingMiddleware:
+    """
+    ASGI-middleware: время обработки запроса по шаблону маршрута и статусу ответа.
+
+    Написано на чистом ASGI, а не через BaseHTTPMiddleware, чтобы не добавлять
+    к каждому запросу лишнюю задачу и копирование тела ответа.
+    """
+
+    def __init__(self, app: ASGIApp, excluded_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # маршрут FastAPI кладёт в scope при сопоставлении пути
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
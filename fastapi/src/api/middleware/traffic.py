@@ -0,0 +1,41 @@
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.warmup import TrafficRecorder
+
+
+class TrafficRecorderMiddleware:
+    """
+    ASGI-middleware: отмечает успешные GET-запросы в TrafficRecorder для прогрева
+    кеша (см. services.warmup). Курсорные страницы не отмечаются: их не прогреть.
+
+    Стоит внутри ConditionalRequestMiddleware, чтобы его ответы 304 тоже считались;
+    304, которыми маршруты отвечают сами, считаются как успешные.
+    """
+
+    def __init__(self, app: ASGIApp, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+        # маршрут FastAPI кладёт в scope при сопоставлении пути
+        route_path = getattr(scope.get("route"), "path", None)
+        if status not in (200, 304) or route_path is None:
+            return
+        query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        if not any(name == "cursor" for name, _ in query):
+            self.recorder.record(route_path, scope.get("path_params", {}), query)
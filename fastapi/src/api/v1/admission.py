@@ -0,0 +1,28 @@
+from typing import AsyncIterator
+
+from fastapi import Request
+
+
+async def admission_control(request: Request) -> AsyncIterator[None]:
+    """
+    Зависимость роутеров API: допускает запрос по лимиту класса стоимости его
+    маршрута (см. core.admission) и освобождает место после обработки.
+    Идёт после request_deadline: ожидание места не длиннее срока запроса.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Raises:
+        OverloadedError: Класс маршрута перегружен.
+    """
+
+    admission = request.app.state.admission
+    if admission is None:
+        yield
+        return
+    limiter = admission.limiter_for(getattr(request.scope.get("route"), "path", None))
+    await limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release(admission.latency())
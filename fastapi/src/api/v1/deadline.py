@@ -0,0 +1,17 @@
+from fastapi import Request
+
+from core.config import config
+from db.resilience import set_deadline
+
+
+async def request_deadline(request: Request) -> None:
+    """
+    Зависимость роутеров API: задаёт бюджет времени чтений Elasticsearch
+    для запроса по шаблону пути его маршрута (ELASTIC_DEADLINES).
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+    """
+
+    route = getattr(request.scope.get("route"), "path", None)
+    set_deadline(config.ELASTIC_DEADLINES.get(route, config.ELASTIC_DEADLINE))
@@ -1,48 +1,116 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing import Dict, List, Optional, Union
 
+from api.v1.responses import JSONBytesResponse, not_modified, set_etag
 from services.film_service import FilmService, get_film_service
-from models.film_model import FilmResponseModel, FilmSearchResponseModel
+from services.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
+from models.batch_model import BatchRequestModel
+from models.film_model import FilmFilters, FilmResponseModel, FilmSearchResponseModel, FilmsPageWithFacets
+from models.suggestion_model import Suggestion
 
 router = APIRouter()
 
-@router.get("/", response_model=List[FilmSearchResponseModel])
+CURSOR_DESCRIPTION = (
+    "Cursor for deep pagination: pass an empty value to start, then the value of the "
+    f"{NEXT_CURSOR_HEADER} response header. When set, page_number is ignored"
+)
+
+
+def _cursor_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+@router.get("/", response_model=Union[List[FilmSearchResponseModel], FilmsPageWithFacets])
 async def get_films_list(
     sort: str = Query("-imdb_rating", description="Sort order"),
-    genre: Optional[str] = Query(None, description="Filter by genre UUID"),
+    genre: List[str] = Query([], description="Filter by genre UUID; repeat to match any of several genres"),
+    rating_min: Optional[float] = Query(None, ge=0, le=10, description="Minimal IMDb rating"),
+    rating_max: Optional[float] = Query(None, ge=0, le=10, description="Maximal IMDb rating"),
+    person: Optional[str] = Query(None, description="Filter by person UUID in any role"),
+    facets: bool = Query(False, description="Return {films, facets} with genre counts and a rating histogram"),
     page_number: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     film_service: FilmService = Depends(get_film_service)
-) -> List[FilmSearchResponseModel]:
+) -> Response:
     """
-    Получает список фильмов с возможностью сортировки по рейтингу и фильтрации по жанру.
+    Получает список фильмов с сортировкой по рейтингу и фильтрами по жанрам, рейтингу
+    и персоне; с facets=true — вместе с агрегациями в том же ответе.
     """
-    return await film_service.get_films_list(sort, genre, page_number, page_size)
+    filters = FilmFilters(genres=genre, rating_min=rating_min, rating_max=rating_max, person=person)
+    if cursor is None:
+        return JSONBytesResponse(await film_service.get_films_list(sort, filters, page_number, page_size, facets))
+    try:
+        films, next_cursor = await film_service.get_films_list_by_cursor(sort, filters, cursor, page_size)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(exc))
+    if facets:
+        body = b'{"films":' + orjson.dumps(films) + b',"facets":' + await film_service.get_facets(filters) + b"}"
+        return JSONBytesResponse(body, headers=_cursor_headers(next_cursor))
+    return ORJSONResponse(films, headers=_cursor_headers(next_cursor))
 
 @router.get("/search", response_model=List[FilmSearchResponseModel])
 async def search_films(
     query: str = Query(..., description="Search query"),
     page_number: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     film_service: FilmService = Depends(get_film_service)
-) -> List[FilmSearchResponseModel]:
+) -> Response:
     """
     Поиск фильмов по названию и описанию.
     """
-    return await film_service.search(query, page_number, page_size)
+    if cursor is None:
+        return JSONBytesResponse(await film_service.search(query, page_number, page_size))
+    try:
+        films, next_cursor = await film_service.search_by_cursor(query, cursor, page_size)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(exc))
+    return ORJSONResponse(films, headers=_cursor_headers(next_cursor))
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_films(
+    prefix: str = Query(..., max_length=50, description="Prefix typed so far"),
+    size: int = Query(10, ge=1, le=20, description="Number of suggestions"),
+    film_service: FilmService = Depends(get_film_service)
+) -> Response:
+    """
+    Подсказки для строки поиска: id и названия фильмов, начинающихся с введённого текста
+    (или содержащих слово, которое с него начинается).
+    """
+    return JSONBytesResponse(await film_service.suggest(prefix, size))
+
+
+@router.post("/batch", response_model=List[FilmResponseModel])
+async def films_batch(
+    batch: BatchRequestModel,
+    film_service: FilmService = Depends(get_film_service)
+) -> List[FilmResponseModel]:
+    """
+    Возвращает несколько фильмов за один запрос. Несуществующие id пропускаются.
+    """
+    return await film_service.get_many(batch.ids)
 
 
 @router.get('/{film_id}', response_model=FilmResponseModel)
 async def film_details(
     film_id: str,
+    request: Request,
+    response: Response,
     film_service: FilmService = Depends(get_film_service)
 ) -> FilmResponseModel:
     
-    film = await film_service.get_by_id(film_id)
+    cached = await not_modified(request, lambda: film_service.get_etag(film_id))
+    if cached is not None:
+        return cached
+    film, etag = await film_service.get_by_id_with_etag(film_id)
     if not film:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
+    set_etag(response, etag)
     return film
 
 
@@ -51,10 +119,18 @@ async def similar_films(
     film_id: str,
     page_number: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=50, description="Page size"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     film_service: FilmService = Depends(get_film_service)
-) -> List[FilmSearchResponseModel]:
+) -> Response:
     """
-    Возвращает список похожих фильмов по жанрам, актёрам, режиссёрам, сценаристам, названию и описанию.
+    Возвращает список похожих фильмов по названию, описанию, жанрам и составу в порядке убывания
+    схожести, при равной схожести — рейтинга.
     """
-    return await film_service.get_similar_films(film_id, page_number, page_size)
+    if cursor is None:
+        return JSONBytesResponse(await film_service.get_similar_films(film_id, page_number, page_size))
+    try:
+        films, next_cursor = await film_service.get_similar_films_by_cursor(film_id, cursor, page_size)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(exc))
+    return ORJSONResponse(films, headers=_cursor_headers(next_cursor))
 
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from typing import List, Optional
 from http import HTTPStatus
 
+from api.v1.responses import JSONBytesResponse, not_modified, set_etag
 from services.genre_service import GenreService, get_genre_service
+from models.batch_model import BatchRequestModel
 from models.genre_model import Genre
+from models.suggestion_model import Suggestion
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Genre])
 async def get_genres_list(
+    request: Request,
+    response: Response,
     page_number: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Page size"),
     genre_service: GenreService = Depends(get_genre_service)
@@ -16,11 +21,18 @@ async def get_genres_list(
     """
     Получает список жанров с пагинацией.
     """
-    return await genre_service.get_genres_list(page_number, page_size)
+    cached = await not_modified(request, lambda: genre_service.get_genres_list_etag(page_number, page_size))
+    if cached is not None:
+        return cached
+    genres, etag = await genre_service.get_genres_list_with_etag(page_number, page_size)
+    set_etag(response, etag)
+    return genres
 
 
 @router.get("/search", response_model=List[Genre])
 async def search_genres(
+    request: Request,
+    response: Response,
     query: str = Query(..., description="Поисковый запрос"),
     page_number: int = Query(1, ge=1, description="Номер страницы"),
     page_size: int = Query(50, ge=1, le=100, description="Размер страницы"),
@@ -29,18 +41,52 @@ async def search_genres(
     """
     Поиск жанров по названию с учетом опечаток.
     """
-    return await genre_service.search(query, page_number, page_size)
+    cached = await not_modified(request, lambda: genre_service.search_etag(query, page_number, page_size))
+    if cached is not None:
+        return cached
+    genres, etag = await genre_service.search_with_etag(query, page_number, page_size)
+    set_etag(response, etag)
+    return genres
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_genres(
+    prefix: str = Query(..., max_length=50, description="Введённое начало названия"),
+    size: int = Query(10, ge=1, le=20, description="Количество подсказок"),
+    genre_service: GenreService = Depends(get_genre_service)
+) -> Response:
+    """
+    Подсказки для строки поиска: id и названия жанров по началу ввода.
+    """
+    return JSONBytesResponse(await genre_service.suggest(prefix, size))
+
+
+@router.post("/batch", response_model=List[Genre])
+async def genres_batch(
+    batch: BatchRequestModel,
+    genre_service: GenreService = Depends(get_genre_service)
+) -> List[Genre]:
+    """
+    Возвращает несколько жанров за один запрос. Несуществующие id пропускаются.
+    """
+    return await genre_service.get_many(batch.ids)
 
 
 @router.get("/{genre_id}", response_model=Genre)
 async def get_genre_by_id(
     genre_id: str,
+    request: Request,
+    response: Response,
     genre_service: GenreService = Depends(get_genre_service)
 ) -> Genre:
     """
     Получает жанр по его UUID.
     """
-    genre = await genre_service.get_by_id(genre_id)
+    cached = await not_modified(request, lambda: genre_service.get_etag(genre_id))
+    if cached is not None:
+        return cached
+    genre, etag = await genre_service.get_by_id_with_etag(genre_id)
     if not genre:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Genre not found")
+    set_etag(response, etag)
     return genre
@@ -0,0 +1,77 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List
+
+from api.v1.responses import JSONBytesResponse
+from services.person_service import PersonService, get_person_service
+from models.batch_model import BatchRequestModel
+from models.film_model import FilmSearchResponseModel
+from models.person_model import PersonResponseModel
+from models.suggestion_model import Suggestion
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=List[PersonResponseModel])
+async def search_persons(
+    query: str = Query(..., description="Search query"),
+    page_number: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(50, ge=1, le=100, description="Page size"),
+    person_service: PersonService = Depends(get_person_service)
+) -> List[PersonResponseModel]:
+    """
+    Поиск персон по имени с учетом опечаток.
+    """
+    return await person_service.search(query, page_number, page_size)
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_persons(
+    prefix: str = Query(..., max_length=50, description="Prefix typed so far"),
+    size: int = Query(10, ge=1, le=20, description="Number of suggestions"),
+    person_service: PersonService = Depends(get_person_service)
+) -> Response:
+    """
+    Подсказки для строки поиска: id и имена персон по началу имени или фамилии.
+    """
+    return JSONBytesResponse(await person_service.suggest(prefix, size))
+
+
+@router.post("/batch", response_model=List[PersonResponseModel])
+async def persons_batch(
+    batch: BatchRequestModel,
+    person_service: PersonService = Depends(get_person_service)
+) -> List[PersonResponseModel]:
+    """
+    Возвращает несколько персон за один запрос. Несуществующие id пропускаются.
+    """
+    return await person_service.get_many(batch.ids)
+
+
+@router.get("/{person_id}", response_model=PersonResponseModel)
+async def person_details(
+    person_id: str,
+    person_service: PersonService = Depends(get_person_service)
+) -> PersonResponseModel:
+    """
+    Получает персону по UUID вместе с её фильмами и ролями.
+    """
+    person = await person_service.get_by_id(person_id)
+    if not person:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
+    return person
+
+
+@router.get("/{person_id}/film", response_model=List[FilmSearchResponseModel])
+async def person_films(
+    person_id: str,
+    person_service: PersonService = Depends(get_person_service)
+) -> Response:
+    """
+    Возвращает фильмы, в которых участвовала персона.
+    """
+    films = await person_service.get_person_films(person_id)
+    if films is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
+    return JSONBytesResponse(films)
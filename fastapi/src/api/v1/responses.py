@@ -0,0 +1,42 @@
+from http import HTTPStatus
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+from api.middleware.conditional import etag_matches
+from core.config import config
+
+
+class JSONBytesResponse(Response):
+    """
+    Ответ с уже сериализованным JSON-телом.
+
+    Тело отдаётся как есть: без валидации через response_model и без повторной
+    сериализации, поэтому закешированные байты уходят клиенту без обработки.
+    """
+    media_type = "application/json"
+
+
+async def not_modified(request: Request, etag: Callable[[], Awaitable[Optional[str]]]) -> Optional[Response]:
+    """
+    Ответ 304, если If-None-Match запроса совпал с ETag закешированного значения:
+    модели не собираются и не сериализуются. ETag запрашивается только у условных
+    запросов; Cache-Control добавит ConditionalRequestMiddleware.
+
+    Args:
+        request: Текущий запрос
+        etag: Корутина, возвращающая ETag закешированного значения (None — его нет в кеше)
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not config.HTTP_CACHE_ENABLED or if_none_match is None:
+        return None
+    value = await etag()
+    if value is None or not etag_matches(if_none_match, value):
+        return None
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": value})
+
+
+def set_etag(response: Response, etag: Optional[str]) -> None:
+    """ETag ответа из кеша: по нему следующий условный запрос получит 304 без сборки моделей."""
+    if etag is not None and config.HTTP_CACHE_ENABLED:
+        response.headers["ETag"] = etag
@@ -0,0 +1,143 @@
+"""Детерминированный синтетический каталог фильмов, жанров и персон."""
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+from db.indexes import SUGGEST_FIELD, suggest_field
+from etl.pipelines import GENRE_ID_NAMESPACE, PERSON_ROLES, film_suggestion
+
+BASE_GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary",
+    "Drama", "Family", "Fantasy", "History", "Horror", "Music", "Musical", "Mystery",
+    "News", "Reality-TV", "Romance", "Sci-Fi", "Short", "Sport", "Talk-Show", "Thriller",
+    "War", "Western",
+]
+FIRST_NAMES = [
+    "Anna", "Boris", "Clara", "Daniel", "Elena", "Felix", "Greta", "Hugo", "Irina", "Jonas",
+    "Kira", "Lev", "Maria", "Nikita", "Olga", "Pavel", "Rosa", "Sergey", "Tamara", "Viktor",
+]
+LAST_NAMES = [
+    "Abbott", "Baker", "Carter", "Dawson", "Ellis", "Fisher", "Grant", "Hayes", "Irving", "Jensen",
+    "Keller", "Lambert", "Morgan", "Nolan", "Owens", "Parker", "Quinn", "Reed", "Stone", "Turner",
+]
+SYLLABLES = ["ka", "lo", "mi", "ren", "sta", "tor", "vel", "an", "dor", "ix", "el", "mar", "no", "quin", "zu"]
+
+# Схема индекса фильмов для локального Elasticsearch: сам сервис этим индексом не владеет
+MOVIES_INDEX_BODY = {
+    "settings": {"refresh_interval": "1s"},
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "title": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            "description": {"type": "text"},
+            "imdb_rating": {"type": "float"},
+            "genres": {"type": "keyword"},
+            "modified": {"type": "date"},
+            **{
+                role_field: {
+                    "type": "nested",
+                    "properties": {"id": {"type": "keyword"}, "name": {"type": "keyword"}},
+                }
+                for role_field in PERSON_ROLES
+            },
+        },
+    },
+}
+
+
+@dataclass
+class CatalogSpec:
+    """Размеры каталога; одинаковые параметры всегда дают одинаковый каталог."""
+    films: int = 10_000
+    persons: int = 2_000
+    genres: int = 25
+    seed: int = 42
+
+
+@dataclass
+class Catalog:
+    """Сгенерированный каталог в виде документов индексов."""
+    films: Dict[str, dict] = field(default_factory=dict)
+    genres: Dict[str, dict] = field(default_factory=dict)
+    persons: Dict[str, dict] = field(default_factory=dict)
+    films_suggest: Dict[str, dict] = field(default_factory=dict)
+    vocabulary: List[str] = field(default_factory=list)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def build_vocabulary(spec: CatalogSpec, size: int = 500) -> List[str]:
+    """Словарь, из которого составляются названия и описания фильмов (и поисковые запросы)."""
+    rng = random.Random(spec.seed + 2)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def genre_docs(spec: CatalogSpec) -> Dict[str, dict]:
+    names = BASE_GENRES[:spec.genres] + [f"Genre {number}" for number in range(len(BASE_GENRES), spec.genres)]
+    docs = {}
+    for name in names:
+        genre_id = str(uuid.uuid5(GENRE_ID_NAMESPACE, name.lower()))
+        docs[genre_id] = {"id": genre_id, "name": name, SUGGEST_FIELD: suggest_field(name)}
+    return docs
+
+
+def person_refs(spec: CatalogSpec) -> List[dict]:
+    rng = random.Random(spec.seed + 1)
+    return [
+        {"id": _uuid(rng), "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"}
+        for _ in range(spec.persons)
+    ]
+
+
+def iter_films(spec: CatalogSpec, genre_names: List[str], persons: List[dict], vocabulary: List[str]) -> Iterator[dict]:
+    """Фильмы по одному, без накопления в памяти (для загрузки в настоящий Elasticsearch)."""
+    rng = random.Random(spec.seed)
+    started = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for number in range(spec.films):
+        yield {
+            "id": _uuid(rng),
+            "title": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).capitalize(),
+            "description": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(15, 40))),
+            "imdb_rating": round(rng.uniform(1.0, 10.0), 1),
+            "genres": rng.sample(genre_names, k=min(len(genre_names), rng.randint(1, 3))),
+            "actors": rng.sample(persons, k=min(len(persons), rng.randint(2, 8))),
+            "writers": rng.sample(persons, k=min(len(persons), rng.randint(1, 2))),
+            "directors": rng.sample(persons, k=1),
+            "modified": (started + timedelta(seconds=number)).isoformat(),
+        }
+
+
+def generate_catalog(spec: CatalogSpec) -> Catalog:
+    """
+    Каталог целиком в памяти, вместе с денормализованными персонами и подсказками
+    фильмов (в той же форме, что строит ETL).
+    """
+    vocabulary = build_vocabulary(spec)
+    genres = genre_docs(spec)
+    persons = person_refs(spec)
+    catalog = Catalog(genres=genres, vocabulary=vocabulary)
+    for film in iter_films(spec, [genre["name"] for genre in genres.values()], persons, vocabulary):
+        catalog.films[film["id"]] = film
+        catalog.films_suggest[film["id"]] = film_suggestion(film["id"], film)
+        roles_by_person: Dict[str, List[str]] = {}
+        for role_field, role in PERSON_ROLES.items():
+            for person in film[role_field]:
+                roles_by_person.setdefault(person["id"], []).append(role)
+        for person in film["actors"] + film["writers"] + film["directors"]:
+            roles = roles_by_person.pop(person["id"], None)
+            if roles is None:
+                continue
+            doc = catalog.persons.setdefault(
+                person["id"],
+                {"id": person["id"], "full_name": person["name"], "films": [], SUGGEST_FIELD: suggest_field(person["name"])},
+            )
+            doc["films"].append({"id": film["id"], "roles": roles})
+    return catalog
@@ -0,0 +1,911 @@
+"""
+Внутрипроцессные заменители Elasticsearch и Redis для бенчмарков.
+
+Реализуют только то подмножество API AsyncElasticsearch и redis.asyncio.Redis,
+которым пользуется сервис. Поиск не считает релевантность: документы отдаются
+в порядке сортировки (или вставки) с ранним выходом после нужной страницы, чтобы
+собственная стоимость заменителя не заслоняла стоимость кода сервиса. Сетевую
+задержку и время ответа хранилища имитирует параметр latency.
+"""
+import asyncio
+import bisect
+import contextlib
+import fnmatch
+import heapq
+import itertools
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import orjson
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import NotFoundError
+from redis.exceptions import ResponseError
+
+_SEARCH_BODY_KEYS = ("query", "sort", "from", "size", "_source", "search_after", "pit", "track_total_hits", "suggest", "aggs", "post_filter")
+_SHARDS = {"total": 1, "successful": 1, "skipped": 0, "failed": 0}
+
+
+def _not_found(what: str) -> NotFoundError:
+    meta = ApiResponseMeta(
+        status=404, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=NodeConfig("http", "fake", 9200)
+    )
+    return NotFoundError(f"{what} not found", meta, {})
+
+
+def _field_values(doc: dict, path: str) -> List[Any]:
+    """Значения поля по пути через точку, с раскрытием вложенных списков."""
+    values = [doc]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            item = value.get(part) if isinstance(value, dict) else None
+            if isinstance(item, list):
+                next_values.extend(item)
+            elif item is not None:
+                next_values.append(item)
+        values = next_values
+    return values
+
+
+def _tokens(value: Any) -> set:
+    return set(str(value).lower().split())
+
+
+def _project(source: dict, includes: Any) -> Optional[dict]:
+    if includes is False:
+        return None
+    if not includes or includes is True:
+        return source
+    if isinstance(includes, str):
+        includes = [includes]
+    return {key: source[key] for key in includes if key in source}
+
+
+class FakeIndices:
+    """Подмножество клиента indices."""
+
+    def __init__(self, es: "FakeElasticsearch"):
+        self.es = es
+
+    async def exists(self, index: str, **kwargs: Any) -> bool:
+        return index in self.es.docs
+
+    async def get_alias(self, name: str, **kwargs: Any) -> dict:
+        # заменитель не знает алиасов: каждое имя — обычный индекс
+        raise _not_found(f"alias {name}")
+
+    async def create(self, index: str, **kwargs: Any) -> dict:
+        self.es.docs.setdefault(index, {})
+        return {"acknowledged": True, "index": index}
+
+    async def refresh(self, **kwargs: Any) -> dict:
+        return {"_shards": _SHARDS}
+
+
+class FakeElasticsearch:
+    """
+    Заменитель AsyncElasticsearch: документы хранятся в словарях index -> id -> source.
+
+    Счётчик calls ведёт число вызовов по операциям.
+    """
+
+    def __init__(self, docs: Dict[str, Dict[str, dict]], latency: float = 0.0):
+        self.docs = docs
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.indices = FakeIndices(self)
+        self._orders: Dict[Tuple[str, str, str], List[str]] = {}
+        self._postings: Dict[Tuple[str, str], Dict[Any, List[str]]] = {}
+        self._suggest_cache: Dict[Tuple[str, str, int], List[Tuple[str, int, str]]] = {}
+        self._filter_cache: Dict[Tuple[str, int, bytes], List[str]] = {}
+        self._aggregations_cache: Dict[Tuple[str, int, bytes], dict] = {}
+        self._pits: Dict[str, str] = {}
+        self._scrolls: Dict[str, Tuple[Iterator[dict], int]] = {}
+        self._ids = itertools.count()
+
+    def options(self, **kwargs: Any) -> "FakeElasticsearch":
+        return self
+
+    async def ping(self, **kwargs: Any) -> bool:
+        await self._call("ping")
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def _call(self, operation: str) -> None:
+        self.calls[operation] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _index(self, index: str) -> Dict[str, dict]:
+        try:
+            return self.docs[index]
+        except KeyError:
+            raise _not_found(f"index {index}") from None
+
+    async def get(self, index: str, id: str, **kwargs: Any) -> dict:
+        await self._call("get")
+        source = self._index(index).get(id)
+        if source is None:
+            raise _not_found(f"document {id}")
+        return {"_index": index, "_id": id, "found": True, "_source": source}
+
+    async def mget(self, index: str, ids: List[str], source_includes: Any = None, **kwargs: Any) -> dict:
+        await self._call("mget")
+        docs = self._index(index)
+        result = []
+        for doc_id in ids:
+            source = docs.get(doc_id)
+            if source is None:
+                result.append({"_index": index, "_id": doc_id, "found": False})
+            else:
+                result.append({"_index": index, "_id": doc_id, "found": True, "_source": _project(source, source_includes)})
+        return {"docs": result}
+
+    async def count(self, index: str, body: Optional[dict] = None, **kwargs: Any) -> dict:
+        await self._call("count")
+        query = (body or kwargs).get("query", {"match_all": {}})
+        return {"count": sum(1 for doc_id, doc in self._index(index).items() if self._matches(doc_id, doc, query))}
+
+    async def open_point_in_time(self, index: str, keep_alive: str, **kwargs: Any) -> dict:
+        await self._call("open_point_in_time")
+        self._index(index)
+        pit_id = f"pit-{next(self._ids)}"
+        self._pits[pit_id] = index
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, id: str, **kwargs: Any) -> dict:
+        await self._call("close_point_in_time")
+        if self._pits.pop(id, None) is None:
+            raise _not_found(f"pit {id}")
+        return {"succeeded": True}
+
+    async def msearch(self, searches: List[dict], **kwargs: Any) -> dict:
+        await self._call("msearch")
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            try:
+                responses.append(self._search(header["index"], body))
+            except NotFoundError as exc:
+                responses.append({"error": {"type": "index_not_found_exception", "reason": str(exc)}, "status": 404})
+        return {"took": 0, "responses": responses}
+
+    async def search(self, index: Optional[str] = None, body: Optional[dict] = None, scroll: Optional[str] = None, **kwargs: Any) -> dict:
+        await self._call("search")
+        body = dict(body or {})
+        if "from_" in kwargs:
+            kwargs["from"] = kwargs.pop("from_")
+        body.update({key: kwargs[key] for key in _SEARCH_BODY_KEYS if key in kwargs})
+        if "pit" in body:
+            index = self._pits.get(body["pit"]["id"])
+            if index is None:
+                raise _not_found(f"pit {body['pit']['id']}")
+        if "suggest" in body:
+            return self._suggest(index, body)
+        if scroll is None:
+            response = self._search(index, body)
+            if "pit" in body:
+                response["pit_id"] = body["pit"]["id"]
+            return response
+        # скролл: весь результат отдаётся пачками размера size
+        size = body.get("size", 10)
+        hits = iter(self._search(index, {**body, "from": 0, "size": len(self._index(index))})["hits"]["hits"])
+        scroll_id = f"scroll-{next(self._ids)}"
+        self._scrolls[scroll_id] = (hits, size)
+        return self._scroll_page(scroll_id)
+
+    async def scroll(self, scroll_id: str, **kwargs: Any) -> dict:
+        await self._call("scroll")
+        return self._scroll_page(scroll_id)
+
+    async def clear_scroll(self, scroll_id: Any = None, **kwargs: Any) -> dict:
+        self._scrolls.pop(scroll_id, None)
+        return {"succeeded": True}
+
+    def _scroll_page(self, scroll_id: str) -> dict:
+        hits, size = self._scrolls.get(scroll_id, (iter(()), 0))
+        hits = list(itertools.islice(hits, size))
+        return {"_scroll_id": scroll_id, "_shards": _SHARDS, "took": 0, "hits": {"hits": hits}}
+
+    def _search(self, index: str, body: dict) -> dict:
+        if "aggs" in body or "post_filter" in body:
+            return self._search_with_aggs(index, body)
+        started = time.perf_counter()
+        docs = self._index(index)
+        query = body.get("query") or {"match_all": {}}
+        start = body.get("from", 0)
+        size = body.get("size", 10)
+        sort = body.get("sort")
+        if sort == "_doc":
+            sort = None
+        if isinstance(sort, dict):
+            sort = [sort]
+
+        ranked = self._similar(index, query)
+        if ranked is not None:
+            if sort:
+                # оценка убывает с местом в выдаче: по ней работают _score и search_after
+                rows = (
+                    (doc_id, [1.0 / rank if self._sort_spec(entry)[0] == "_score"
+                              else self._sort_values(index, doc_id, [entry])[0] for entry in sort])
+                    for rank, doc_id in enumerate(ranked, start=1)
+                )
+                after = body.get("search_after")
+                if after is not None:
+                    rows = (row for row in rows if row[1] < after)
+                selected = list(itertools.islice(rows, start, start + size))
+            else:
+                selected = [(doc_id, None) for doc_id in itertools.islice(ranked, start, start + size)]
+        elif body.get("search_after") is None and (not sort or self._simple_sort(sort)):
+            ordered = self._ordered_ids(index, sort[0] if sort else None)
+            matching = (
+                (doc_id, self._sort_values(index, doc_id, sort) if sort else None)
+                for doc_id in ordered
+                if self._matches(doc_id, docs[doc_id], query)
+            )
+            selected = list(itertools.islice(matching, start, start + size))
+        else:
+            selected = self._sorted_search(index, query, sort or [], body.get("search_after"), start, size)
+
+        includes = body.get("_source", True)
+        hits = []
+        for doc_id, sort_values in selected:
+            hit = {"_index": index, "_id": doc_id, "_score": 1.0}
+            source = _project(docs[doc_id], includes)
+            if source is not None:
+                hit["_source"] = source
+            if sort_values is not None:
+                hit["sort"] = sort_values
+            hits.append(hit)
+        took = int((time.perf_counter() - started) * 1000)
+        return {"took": took, "timed_out": False, "_shards": _SHARDS, "hits": {"hits": hits}}
+
+    def _search_with_aggs(self, index: str, body: dict) -> dict:
+        """Поиск с агрегациями и post_filter: в отличие от обычного, просматривает все совпадения."""
+        query = body.get("query") or {"match_all": {}}
+        post_filter = body.get("post_filter")
+        matching = self._filtered_ids(index, query)
+        hits_query = {"bool": {"filter": [query, post_filter]}} if post_filter else query
+        hit_ids = self._filtered_ids(index, hits_query)
+        sort = body.get("sort")
+        if isinstance(sort, dict):
+            sort = [sort]
+        if sort and self._simple_sort(sort) and "search_after" not in body:
+            allowed = set(hit_ids)
+            start, size = body.get("from", 0), body.get("size", 10)
+            ordered = (doc_id for doc_id in self._ordered_ids(index, sort[0]) if doc_id in allowed)
+            docs = self._index(index)
+            response = {"took": 0, "timed_out": False, "_shards": _SHARDS, "hits": {"hits": [
+                {"_index": index, "_id": doc_id, "_score": None, "_source": _project(docs[doc_id], body.get("_source", True)),
+                 "sort": self._sort_values(index, doc_id, sort)}
+                for doc_id in itertools.islice(ordered, start, start + size)
+            ]}}
+        else:
+            plain_body = {key: value for key, value in body.items() if key not in ("aggs", "post_filter")}
+            response = self._search(index, {**plain_body, "query": hits_query})
+        response["hits"]["total"] = {"value": len(hit_ids), "relation": "eq"}
+        aggs = body.get("aggs") or {}
+        key = (index, len(matching), orjson.dumps([query, aggs], option=orjson.OPT_SORT_KEYS))
+        if key not in self._aggregations_cache:
+            if len(self._aggregations_cache) >= 1024:
+                self._aggregations_cache.clear()
+            self._aggregations_cache[key] = {name: self._aggregate(index, matching, spec) for name, spec in aggs.items()}
+        response["aggregations"] = self._aggregations_cache[key]
+        return response
+
+    def _filtered_ids(self, index: str, query: dict) -> List[str]:
+        """Id документов, подходящих под фильтр; результаты запоминаются, как кеш фильтров Elasticsearch."""
+        docs = self._index(index)
+        key = (index, len(docs), orjson.dumps(query, option=orjson.OPT_SORT_KEYS))
+        if key not in self._filter_cache:
+            if len(self._filter_cache) >= 1024:
+                self._filter_cache.clear()
+            self._filter_cache[key] = self._compute_filter(index, query)
+        return self._filter_cache[key]
+
+    def _compute_filter(self, index: str, query: dict) -> List[str]:
+        docs = self._index(index)
+        options = query.get("bool")
+        if options is not None and set(options) == {"filter"}:
+            # как битовые множества Elasticsearch: bool из фильтров — пересечение их результатов
+            clauses = options["filter"] if isinstance(options["filter"], list) else [options["filter"]]
+            if not clauses:
+                return list(docs)
+            allowed = set.intersection(*(set(self._filtered_ids(index, clause)) for clause in clauses))
+            return [doc_id for doc_id in docs if doc_id in allowed]
+        return [doc_id for doc_id, doc in docs.items() if self._matches(doc_id, doc, query)]
+
+    def _aggregate(self, index: str, doc_ids: List[str], spec: dict) -> dict:
+        """Агрегации filter, terms и histogram; вложенные агрегации — только у filter."""
+        docs = self._index(index)
+        if "filter" in spec:
+            allowed = set(self._filtered_ids(index, spec["filter"]))
+            selected = [doc_id for doc_id in doc_ids if doc_id in allowed]
+            result: Dict[str, Any] = {"doc_count": len(selected)}
+            for name, sub_spec in (spec.get("aggs") or {}).items():
+                result[name] = self._aggregate(index, selected, sub_spec)
+            return result
+        if "terms" in spec:
+            options = spec["terms"]
+            counts = Counter(value for doc_id in doc_ids for value in set(_field_values(docs[doc_id], options["field"])))
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:options.get("size", 10)]
+            return {"buckets": [{"key": key, "doc_count": count} for key, count in ranked]}
+        if "histogram" in spec:
+            options = spec["histogram"]
+            interval = options["interval"]
+            counts = Counter(
+                (value // interval) * interval for doc_id in doc_ids for value in _field_values(docs[doc_id], options["field"])
+            )
+            bounds = options.get("extended_bounds")
+            if options.get("min_doc_count") == 0 and bounds:
+                key = (bounds["min"] // interval) * interval
+                while key <= bounds["max"]:
+                    counts.setdefault(key, 0)
+                    key += interval
+            return {"buckets": [{"key": key, "doc_count": counts[key]} for key in sorted(counts)]}
+        raise ValueError(f"Aggregation {spec} is not supported by the fake")
+
+    def _suggest(self, index: str, body: dict) -> dict:
+        """Completion suggester: префикс ищется в отсортированном списке входов, как по FST."""
+        docs = self._index(index)
+        response: Dict[str, list] = {}
+        for name, options in body["suggest"].items():
+            prefix = " ".join(options["prefix"].lower().split())
+            completion = options["completion"]
+            inputs = self._suggest_inputs(index, completion["field"])
+            matched: Dict[str, int] = {}
+            for text, weight, doc_id in itertools.islice(inputs, bisect.bisect_left(inputs, (prefix,)), None):
+                if not text.startswith(prefix):
+                    break
+                matched[doc_id] = weight
+            top = heapq.nlargest(completion.get("size", 5), matched.items(), key=lambda item: item[1])
+            response[name] = [{
+                "text": prefix,
+                "options": [
+                    {"_index": index, "_id": doc_id, "_score": float(weight), "_source": _project(docs[doc_id], body.get("_source", True))}
+                    for doc_id, weight in top
+                ],
+            }]
+        return {"took": 0, "timed_out": False, "_shards": _SHARDS, "hits": {"hits": []}, "suggest": response}
+
+    def _suggest_inputs(self, index: str, field: str) -> List[Tuple[str, int, str]]:
+        docs = self._index(index)
+        key = (index, field, len(docs))
+        if key not in self._suggest_cache:
+            self._suggest_cache[key] = sorted(
+                (text.lower(), (doc.get(field) or {}).get("weight", 0), doc_id)
+                for doc_id, doc in docs.items()
+                for text in (doc.get(field) or {}).get("input", ())
+            )
+        return self._suggest_cache[key]
+
+    @staticmethod
+    def _sort_spec(entry: Any) -> Tuple[str, str, Optional[str]]:
+        if isinstance(entry, str):
+            return entry, "asc", None
+        (field, options), = entry.items()
+        if isinstance(options, str):
+            return field, options, None
+        return field, options.get("order", "asc"), options.get("missing")
+
+    def _simple_sort(self, sort: List[Any]) -> bool:
+        return len(sort) == 1 and self._sort_spec(sort[0])[0] not in ("_score", "_shard_doc")
+
+    def _ordered_ids(self, index: str, sort_entry: Any) -> List[str]:
+        """Id документов в порядке сортировки по одному полю; порядок вычисляется один раз."""
+        docs = self.docs[index]
+        if sort_entry is None:
+            return list(docs)
+        field, order, _ = self._sort_spec(sort_entry)
+        cache_key = (index, field, order)
+        if cache_key not in self._orders or len(self._orders[cache_key]) != len(docs):
+            self._orders[cache_key] = sorted(
+                docs,
+                key=lambda doc_id: (docs[doc_id].get(field) is None, docs[doc_id].get(field) or 0),
+                reverse=order == "desc",
+            )
+        return self._orders[cache_key]
+
+    def _sort_values(self, index: str, doc_id: str, sort: List[Any]) -> List[Any]:
+        values = []
+        for entry in sort:
+            field, _, _ = self._sort_spec(entry)
+            if field == "_shard_doc":
+                values.append(self._position(index, doc_id))
+            elif field == "_score":
+                values.append(1.0)
+            else:
+                values.append(self.docs[index][doc_id].get(field))
+        return values
+
+    def _position(self, index: str, doc_id: str) -> int:
+        positions = self._postings.setdefault((index, "_position"), {})
+        if len(positions) != len(self.docs[index]):
+            positions.clear()
+            positions.update({key: number for number, key in enumerate(self.docs[index])})
+        return positions[doc_id]
+
+    def _sorted_search(
+        self, index: str, query: dict, sort: List[Any], search_after: Optional[List[Any]], start: int, size: int
+    ) -> List[Tuple[str, List[Any]]]:
+        """Общий путь: полная выборка, сортировка по всем ключам, search_after."""
+        docs = self.docs[index]
+        specs = [self._sort_spec(entry) for entry in sort]
+
+        def key(values: List[Any]) -> tuple:
+            parts = []
+            for value, (_, order, missing) in zip(values, specs):
+                is_missing = value is None
+                # missing: _first ставит пропуски в начало независимо от направления
+                missing_rank = (0 if is_missing else 1) if missing == "_first" else (1 if is_missing else 0)
+                number = 0 if is_missing else value
+                if isinstance(number, str):
+                    parts.append((missing_rank, number if order == "asc" else "".join(chr(0x10FFFF - ord(c)) for c in number)))
+                else:
+                    parts.append((missing_rank, number if order == "asc" else -number))
+            return tuple(parts)
+
+        rows = [
+            (doc_id, self._sort_values(index, doc_id, sort))
+            for doc_id, doc in docs.items()
+            if self._matches(doc_id, doc, query)
+        ]
+        rows.sort(key=lambda row: key(row[1]))
+        if search_after is not None:
+            after_key = key(search_after)
+            rows = [row for row in rows if key(row[1]) > after_key]
+        return rows[start:start + size]
+
+    def _similar(self, index: str, query: dict) -> Optional[Iterator[str]]:
+        """
+        Выдача запроса похожих фильмов: more_like_this отдельно или в should вместе
+        с условиями по составу. Сначала похожие по жанрам, затем остальные совпавшие
+        по составу в порядке убывания рейтинга. None — запрос не такой.
+        """
+        if "more_like_this" in query:
+            return self._more_like_this(index, query["more_like_this"])
+        options = query.get("bool") or {}
+        should = options.get("should") or []
+        like = next((clause["more_like_this"] for clause in should if "more_like_this" in clause), None)
+        if like is None:
+            return None
+        docs = self.docs[index]
+        others = [clause for clause in should if "more_like_this" not in clause]
+        excluded = options.get("must_not") or []
+
+        def ranked() -> Iterator[str]:
+            seen: Set[str] = set()
+            by_rating = self._ordered_ids(index, {"imdb_rating": {"order": "desc"}})
+            matching_others = (
+                doc_id for doc_id in by_rating
+                if any(self._matches(doc_id, docs[doc_id], clause) for clause in others)
+            )
+            for doc_id in itertools.chain(self._more_like_this(index, like), matching_others):
+                if doc_id not in seen and not any(self._matches(doc_id, docs[doc_id], clause) for clause in excluded):
+                    seen.add(doc_id)
+                    yield doc_id
+
+        return ranked()
+
+    def _more_like_this(self, index: str, options: dict) -> Iterator[str]:
+        """Похожие по жанрам: документы того же первого жанра в порядке убывания рейтинга."""
+        docs = self.docs[index]
+        liked = [docs[like["_id"]] for like in options.get("like", []) if isinstance(like, dict) and like.get("_id") in docs]
+        if not liked or not liked[0].get("genres"):
+            return iter(())
+        postings = self._postings.setdefault((index, "genres"), {})
+        if not postings:
+            for doc_id in self._ordered_ids(index, {"imdb_rating": {"order": "desc"}}):
+                for genre in docs[doc_id].get("genres") or []:
+                    postings.setdefault(genre, []).append(doc_id)
+        liked_id = liked[0]["id"]
+        return (doc_id for doc_id in postings.get(liked[0]["genres"][0], []) if doc_id != liked_id)
+
+    def _matches(self, doc_id: str, doc: dict, query: dict) -> bool:
+        (kind, options), = query.items()
+        if kind == "match_all":
+            return True
+        if kind == "ids":
+            return doc_id in options["values"]
+        if kind in ("term", "terms"):
+            (field, expected), = options.items()
+            if isinstance(expected, dict):
+                expected = expected.get("value")
+            expected = set(expected) if isinstance(expected, list) else {expected}
+            values = [doc_id] if field == "_id" else _field_values(doc, field)
+            return any(value in expected for value in values)
+        if kind == "match":
+            (field, match), = options.items()
+            text = match["query"] if isinstance(match, dict) else match
+            return self._text_matches(doc, [field], text)
+        if kind == "multi_match":
+            return self._text_matches(doc, options.get("fields", []), options["query"])
+        if kind == "nested":
+            return self._matches(doc_id, doc, options["query"])
+        if kind == "range":
+            (field, bounds), = options.items()
+            return any(self._in_range(value, bounds) for value in _field_values(doc, field))
+        if kind == "bool":
+            return self._bool_matches(doc_id, doc, options)
+        raise ValueError(f"Query {kind} is not supported by the fake")
+
+    def _bool_matches(self, doc_id: str, doc: dict, options: dict) -> bool:
+        def clauses(name: str) -> List[dict]:
+            value = options.get(name) or []
+            return value if isinstance(value, list) else [value]
+
+        required = clauses("must") + clauses("filter")
+        if not all(self._matches(doc_id, doc, clause) for clause in required):
+            return False
+        if any(self._matches(doc_id, doc, clause) for clause in clauses("must_not")):
+            return False
+        should = clauses("should")
+        minimum = options.get("minimum_should_match", 0 if required else 1)
+        return not should or sum(self._matches(doc_id, doc, clause) for clause in should) >= int(minimum)
+
+    @staticmethod
+    def _text_matches(doc: dict, fields: Iterable[str], text: str) -> bool:
+        words = _tokens(text)
+        return any(words & _tokens(value) for field in fields for value in _field_values(doc, field.split("^")[0]))
+
+    @staticmethod
+    def _in_range(value: Any, bounds: dict) -> bool:
+        checks = {"gte": value.__ge__, "gt": value.__gt__, "lte": value.__le__, "lt": value.__lt__}
+        return all(checks[op](bound) is True for op, bound in bounds.items() if op in checks)
+
+
+class FakePubSub:
+    """Подписка на каналы FakeRedis."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels: List[str] = []
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self.channels.append(channel)
+            self.redis.subscribers.setdefault(channel, []).append(self.queue)
+            self.queue.put_nowait({"type": "subscribe", "channel": channel.encode(), "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        for channel in self.channels:
+            self.redis.subscribers.get(channel, []).remove(self.queue)
+        self.channels = []
+
+
+class FakePipeline:
+    """Пайплайн FakeRedis: команды копятся и выполняются одним вызовом."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands: List[Tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args: Any, **kwargs: Any) -> "FakePipeline":
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        await self.redis._call("pipeline")
+        results = []
+        for name, args, kwargs in self.commands:
+            results.append(self.redis._apply(name, *args, **kwargs))
+        self.commands = []
+        return results
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def _stream_seq(entry_id: Any) -> int:
+    """Порядковый номер записи потока заменителя по её id вида <n>-0."""
+    return int(_to_bytes(entry_id).split(b"-")[0])
+
+
+class FakeRedis:
+    """
+    Заменитель redis.asyncio.Redis: строки, хеши, множества и сортированные
+    множества с TTL, pub/sub и потоки с группами потребителей внутри процесса.
+
+    EVAL поддерживает только сценарий «удалить ключ, если значение совпадает»,
+    которым снимаются блокировки кеша. XAUTOCLAIM ничего не забирает: потребители
+    заменителя не падают.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.data: Dict[str, Any] = {}
+        self.expires: Dict[str, float] = {}
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self.streams: Dict[str, List[Tuple[bytes, Dict[bytes, bytes]]]] = {}
+        # (поток, группа) -> позиция следующей недоставленной записи
+        self.groups: Dict[Tuple[str, str], int] = {}
+        self.stream_ids = itertools.count(1)
+        self.stream_added = asyncio.Event()
+
+    async def _call(self, command: str) -> None:
+        self.calls[command] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _apply(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        return getattr(self, f"_{name}")(*args, **kwargs)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        return self.data[key] if self._alive(key) else None
+
+    def _set(self, key: str, value: Any, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._alive(key):
+            return None
+        self.data[key] = _to_bytes(value)
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        elif px is not None:
+            self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def _delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                deleted += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def _sadd(self, key: str, *members: Any) -> int:
+        if not self._alive(key):
+            self.data[key] = set()
+        target = self.data[key]
+        added = {_to_bytes(member) for member in members} - target
+        target.update(added)
+        return len(added)
+
+    def _smembers(self, key: str) -> set:
+        return set(self.data[key]) if self._alive(key) else set()
+
+    def _expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def _zincrby(self, key: str, amount: float, member: Any) -> float:
+        if not self._alive(key):
+            self.data[key] = {}
+        scores = self.data[key]
+        member = _to_bytes(member)
+        scores[member] = scores.get(member, 0.0) + amount
+        return scores[member]
+
+    def _zadd(self, key: str, mapping: Dict[Any, float]) -> int:
+        if not self._alive(key):
+            self.data[key] = {}
+        scores = self.data[key]
+        added = sum(_to_bytes(member) not in scores for member in mapping)
+        scores.update({_to_bytes(member): float(score) for member, score in mapping.items()})
+        return added
+
+    def _zrangebyscore(self, key: str, min: Any, max: Any) -> list:
+        low, high = float(min), float(max)
+        ranked = sorted((self.data[key] if self._alive(key) else {}).items(), key=lambda item: (item[1], item[0]))
+        return [member for member, score in ranked if low <= score <= high]
+
+    def _zremrangebyscore(self, key: str, min: Any, max: Any) -> int:
+        removed = self._zrangebyscore(key, min, max)
+        for member in removed:
+            del self.data[key][member]
+        return len(removed)
+
+    def _zunionstore(self, dest: str, keys: Dict[str, float]) -> int:
+        scores: Dict[bytes, float] = {}
+        for key, weight in keys.items():
+            for member, score in (self.data[key] if self._alive(key) else {}).items():
+                scores[member] = scores.get(member, 0.0) + score * weight
+        self.data[dest] = scores
+        self.expires.pop(dest, None)
+        return len(scores)
+
+    def _zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> list:
+        ranked = sorted((self.data[key] if self._alive(key) else {}).items(), key=lambda item: (-item[1], item[0]))
+        ranked = ranked[start:None if end == -1 else end + 1]
+        return ranked if withscores else [member for member, _ in ranked]
+
+    def _zremrangebyrank(self, key: str, start: int, end: int) -> int:
+        if not self._alive(key):
+            return 0
+        ascending = list(reversed(self._zrevrange(key, 0, -1)))
+        end = len(ascending) + end if end < 0 else end
+        removed = ascending[start:end + 1] if end >= start else []
+        for member in removed:
+            del self.data[key][member]
+        return len(removed)
+
+    def _xadd(self, name: str, fields: dict, maxlen: Optional[int] = None, approximate: bool = True) -> bytes:
+        entry_id = f"{next(self.stream_ids)}-0".encode()
+        self.streams.setdefault(name, []).append(
+            (entry_id, {_to_bytes(field): _to_bytes(value) for field, value in fields.items()})
+        )
+        self.stream_added.set()
+        self.stream_added = asyncio.Event()
+        return entry_id
+
+    async def ping(self) -> bool:
+        await self._call("ping")
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        await self._call("get")
+        return self._get(key)
+
+    async def set(self, key: str, value: Any, **kwargs: Any) -> Optional[bool]:
+        await self._call("set")
+        return self._set(key, value, **kwargs)
+
+    async def delete(self, *keys: str) -> int:
+        await self._call("delete")
+        return self._delete(*keys)
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        await self._call("mget")
+        return [self._get(key) for key in keys]
+
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        await self._call("hget")
+        return self.data[key].get(field) if self._alive(key) else None
+
+    async def hset(self, key: str, field: Optional[str] = None, value: Any = None, mapping: Optional[dict] = None) -> int:
+        await self._call("hset")
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        if not self._alive(key):
+            self.data[key] = {}
+        self.data[key].update({name: _to_bytes(item) for name, item in items.items()})
+        return len(items)
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        await self._call("hdel")
+        target = self.data.get(key, {}) if self._alive(key) else {}
+        return sum(target.pop(field, None) is not None for field in fields)
+
+    async def rename(self, source: str, destination: str) -> bool:
+        await self._call("rename")
+        if not self._alive(source):
+            raise ValueError("no such key")
+        self.data[destination] = self.data.pop(source)
+        self.expires.pop(destination, None)
+        return True
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> int:
+        await self._call("eval")
+        key, token = keys_and_args[0], keys_and_args[1]
+        if self._get(key) == _to_bytes(token):
+            return self._delete(key)
+        return 0
+
+    async def sadd(self, key: str, *members: Any) -> int:
+        await self._call("sadd")
+        return self._sadd(key, *members)
+
+    async def smembers(self, key: str) -> set:
+        await self._call("smembers")
+        return self._smembers(key)
+
+    async def zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> list:
+        await self._call("zrevrange")
+        return self._zrevrange(key, start, end, withscores)
+
+    async def xadd(self, name: str, fields: dict, **kwargs: Any) -> bytes:
+        await self._call("xadd")
+        return self._xadd(name, fields, **kwargs)
+
+    async def xgroup_create(self, name: str, groupname: str, id: str = "$", mkstream: bool = False) -> bool:
+        await self._call("xgroup_create")
+        if name not in self.streams and not mkstream:
+            raise ResponseError("ERR The XGROUP subcommand requires the key to exist")
+        if (name, groupname) in self.groups:
+            raise ResponseError("BUSYGROUP Consumer Group name already exists")
+        entries = self.streams.setdefault(name, [])
+        self.groups[(name, groupname)] = len(entries) if id == "$" else 0
+        return True
+
+    async def xreadgroup(
+        self, groupname: str, consumername: str, streams: dict, count: Optional[int] = None, block: Optional[int] = None
+    ) -> list:
+        await self._call("xreadgroup")
+        added = self.stream_added
+        response = self._read_group(groupname, streams, count)
+        if not response and block is not None:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(added.wait(), timeout=block / 1000 or None)
+            response = self._read_group(groupname, streams, count)
+        return response
+
+    def _read_group(self, groupname: str, streams: dict, count: Optional[int]) -> list:
+        response = []
+        for name in streams:
+            position = self.groups[(name, groupname)]
+            entries = self.streams[name][position:position + count if count else None]
+            if entries:
+                self.groups[(name, groupname)] = position + len(entries)
+                response.append([name.encode(), entries])
+        return response
+
+    async def xread(self, streams: dict, count: Optional[int] = None, block: Optional[int] = None) -> list:
+        await self._call("xread")
+        added = self.stream_added
+        response = self._read(streams, count)
+        if not response and block is not None:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(added.wait(), timeout=block / 1000 or None)
+            response = self._read(streams, count)
+        return response
+
+    def _read(self, streams: dict, count: Optional[int]) -> list:
+        response = []
+        for name, last_id in streams.items():
+            last = _stream_seq(last_id)
+            entries = [entry for entry in self.streams.get(name, []) if _stream_seq(entry[0]) > last][:count]
+            if entries:
+                response.append([name.encode(), entries])
+        return response
+
+    async def xrevrange(self, name: str, max: str = "+", min: str = "-", count: Optional[int] = None) -> list:
+        await self._call("xrevrange")
+        return list(reversed(self.streams.get(name, [])))[:count]
+
+    async def xack(self, name: str, groupname: str, *ids: Any) -> int:
+        await self._call("xack")
+        return len(ids)
+
+    async def xautoclaim(self, name: str, groupname: str, consumername: str, min_idle_time: int, **kwargs: Any) -> list:
+        await self._call("xautoclaim")
+        return [b"0-0", [], []]
+
+    async def publish(self, channel: str, message: Any) -> int:
+        await self._call("publish")
+        queues = self.subscribers.get(channel, [])
+        for queue in queues:
+            queue.put_nowait({"type": "message", "channel": channel.encode(), "data": _to_bytes(message)})
+        return len(queues)
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        for key in list(self.data):
+            if self._alive(key) and (match is None or fnmatch.fnmatchcase(key, match)):
+                yield key.encode()
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,376 @@
+"""
+Нагрузочный бенчмарк API из каталога src.
+
+Каталог синтетический и детерминированный. По умолчанию он загружается
+во внутрипроцессные заменители Elasticsearch и Redis; с --backend local
+используются настоящие сервисы из настроек (с --seed-local каталог туда
+предварительно загружается, индексы перестраиваются). Каждый роутер api/v1
+нагружается с фиксированной конкурентностью, затем выводятся пропускная
+способность, p50/p95/p99 и число обращений к Elasticsearch на запрос.
+
+    python -m benchmarks.run --films 10000 --output baseline.json
+    python -m benchmarks.run --films 10000 --compare baseline.json
+    python -m benchmarks.run --backend local --seed-local --films 1000000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import subprocess
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest import mock
+
+import httpx
+import orjson
+
+from core.logger import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+# строка лога на каждый запрос клиента заметно искажала бы замер
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+from benchmarks.catalog import (BASE_GENRES, FIRST_NAMES, LAST_NAMES, CatalogSpec, build_vocabulary, generate_catalog,
+                                genre_docs, iter_films, person_refs)
+from benchmarks.fakes import FakeElasticsearch, FakeRedis
+from db.elasticsearch import init_elastic
+from db.indexes import FILMS_SUGGEST_INDEX, GENRES_INDEX, MOVIES_INDEX, PERSONS_INDEX
+from db.redis import init_redis
+
+# Запрос сценария: метод, путь и тело (для POST)
+RequestSpec = Tuple[str, str, Optional[Any]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    make_request: Callable[[random.Random], RequestSpec]
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    statuses: Dict[str, int]
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    es_calls_per_request: float
+    es_calls: Dict[str, int]
+
+
+@dataclass
+class KeySpace:
+    """Множество id и слов, из которых сценарии выбирают параметры запросов."""
+    film_ids: List[str]
+    genre_ids: List[str]
+    person_ids: List[str]
+    words: List[str]
+
+
+class CountingElasticsearch:
+    """Считает обращения к Elasticsearch (любого бэкенда) по операциям."""
+
+    _counted = ("get", "mget", "search", "msearch", "count", "open_point_in_time", "close_point_in_time")
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.calls: Counter = Counter()
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._client, name)
+        if name not in self._counted:
+            return attribute
+
+        async def counted(*args: Any, **kwargs: Any) -> Any:
+            self.calls[name] += 1
+            return await attribute(*args, **kwargs)
+
+        return counted
+
+
+def build_scenarios(keys: KeySpace, page_size: int) -> List[Scenario]:
+    def pick(values: List[str]) -> Callable[[random.Random], str]:
+        return lambda rng: rng.choice(values)
+
+    film, genre, person, word = pick(keys.film_ids), pick(keys.genre_ids), pick(keys.person_ids), pick(keys.words)
+    pages = lambda rng: rng.randint(1, 5)  # noqa: E731
+
+    def typed(values: List[str]) -> Callable[[random.Random], str]:
+        """Начало слова, как его набирают в строке поиска: от одной буквы до слова целиком."""
+        def prefix(rng: random.Random) -> str:
+            value = rng.choice(values)
+            return value[:rng.randint(1, len(value))]
+        return prefix
+
+    film_prefix, genre_prefix, person_prefix = typed(keys.words), typed(BASE_GENRES), typed(FIRST_NAMES + LAST_NAMES)
+    return [
+        Scenario("films:list", lambda rng: ("GET", f"/api/v1/films/?page_number={pages(rng)}&page_size={page_size}", None)),
+        Scenario(
+            "films:list:genre",
+            lambda rng: ("GET", f"/api/v1/films/?genre={genre(rng)}&page_number={pages(rng)}&page_size={page_size}", None),
+        ),
+        Scenario(
+            "films:list:facets",
+            lambda rng: (
+                "GET",
+                f"/api/v1/films/?genre={genre(rng)}&rating_min={rng.randint(0, 8)}&facets=true"
+                f"&page_number={pages(rng)}&page_size={page_size}",
+                None,
+            ),
+        ),
+        Scenario("films:search", lambda rng: ("GET", f"/api/v1/films/search?query={word(rng)}&page_size={page_size}", None)),
+        Scenario("films:suggest", lambda rng: ("GET", f"/api/v1/films/suggest?prefix={film_prefix(rng)}", None)),
+        Scenario("films:detail", lambda rng: ("GET", f"/api/v1/films/{film(rng)}", None)),
+        Scenario("films:similar", lambda rng: ("GET", f"/api/v1/films/{film(rng)}/similar", None)),
+        Scenario("films:batch", lambda rng: ("POST", "/api/v1/films/batch", {"ids": [film(rng) for _ in range(20)]})),
+        Scenario("genres:list", lambda rng: ("GET", "/api/v1/genres/", None)),
+        Scenario("genres:search", lambda rng: ("GET", f"/api/v1/genres/search?query={rng.choice(keys.words[:50])}", None)),
+        Scenario("genres:suggest", lambda rng: ("GET", f"/api/v1/genres/suggest?prefix={genre_prefix(rng)}", None)),
+        Scenario("genres:detail", lambda rng: ("GET", f"/api/v1/genres/{genre(rng)}", None)),
+        Scenario("genres:batch", lambda rng: ("POST", "/api/v1/genres/batch", {"ids": [genre(rng) for _ in range(5)]})),
+        Scenario("persons:search", lambda rng: ("GET", f"/api/v1/persons/search?query={word(rng)}&page_size={page_size}", None)),
+        Scenario("persons:suggest", lambda rng: ("GET", f"/api/v1/persons/suggest?prefix={person_prefix(rng)}", None)),
+        Scenario("persons:detail", lambda rng: ("GET", f"/api/v1/persons/{person(rng)}", None)),
+        Scenario("persons:films", lambda rng: ("GET", f"/api/v1/persons/{person(rng)}/film", None)),
+        Scenario("persons:batch", lambda rng: ("POST", "/api/v1/persons/batch", {"ids": [person(rng) for _ in range(20)]})),
+    ]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    es: CountingElasticsearch,
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> ScenarioResult:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    plan = [scenario.make_request(rng) for _ in range(requests)]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    position = iter(range(requests))
+    es.calls.clear()
+
+    async def worker() -> None:
+        for number in position:
+            method, path, payload = plan[number]
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    es_calls = dict(es.calls)
+    return ScenarioResult(
+        requests=requests,
+        errors=errors,
+        statuses=dict(statuses),
+        rps=round(requests / elapsed, 1),
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 0.95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+        es_calls_per_request=round(sum(es_calls.values()) / requests, 3),
+        es_calls=es_calls,
+    )
+
+
+def fake_backend(spec: CatalogSpec, key_space: int, es_latency: float, redis_latency: float):
+    catalog = generate_catalog(spec)
+    es = FakeElasticsearch(
+        {
+            MOVIES_INDEX: catalog.films,
+            GENRES_INDEX: catalog.genres,
+            PERSONS_INDEX: catalog.persons,
+            FILMS_SUGGEST_INDEX: catalog.films_suggest,
+        },
+        latency=es_latency,
+    )
+    keys = KeySpace(
+        film_ids=list(islice(catalog.films, key_space)),
+        genre_ids=list(catalog.genres),
+        person_ids=list(islice(catalog.persons, key_space)),
+        words=catalog.vocabulary,
+    )
+    return es, FakeRedis(latency=redis_latency), keys
+
+
+def local_keys(spec: CatalogSpec, key_space: int) -> KeySpace:
+    """Id первых документов каталога без его построения целиком."""
+    vocabulary = build_vocabulary(spec)
+    genres = genre_docs(spec)
+    persons = person_refs(spec)
+    films = islice(iter_films(spec, [genre["name"] for genre in genres.values()], persons, vocabulary), key_space)
+    person_ids = {}
+    film_ids = []
+    for film_doc in films:
+        film_ids.append(film_doc["id"])
+        person_ids.update(dict.fromkeys(person["id"] for person in film_doc["actors"]))
+    return KeySpace(film_ids, list(genres), list(person_ids)[:key_space], vocabulary)
+
+
+async def wait_for_similar_index(app: Any, film_id: str, timeout: float) -> None:
+    """Ждёт, пока фоновая задача рассчитает похожие фильмы, иначе меряется запасной путь."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await app.state.similar_films_index.get_ids(film_id) is not None:
+            return
+        await asyncio.sleep(0.5)
+    logger.warning("Similar films index is not ready after %.0fs, /similar measures the fallback", timeout)
+
+
+async def wait_for_ranking_index(app: Any, timeout: float) -> None:
+    """Ждёт загрузки индекса ранжирования, если он включён, иначе списки фильмов меряют запасной путь."""
+    index = app.state.film_ranking_index
+    deadline = time.monotonic() + timeout
+    while index is not None and not index.loaded:
+        if time.monotonic() >= deadline:
+            logger.warning("Film ranking index is not ready after %.0fs, /films/ measures the fallback", timeout)
+            return
+        await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import main
+
+    spec = CatalogSpec(films=args.films, persons=args.persons, genres=args.genres, seed=args.seed)
+    if args.backend == "fake":
+        started = time.perf_counter()
+        raw_es, redis, keys = fake_backend(spec, args.key_space, args.es_latency, args.redis_latency)
+        logger.info("Fake catalog of %d films generated in %.1fs", spec.films, time.perf_counter() - started)
+    else:
+        raw_es, redis = await init_elastic(), await init_redis()
+        if args.seed_local:
+            from benchmarks.seed import seed_local
+
+            await seed_local(raw_es, redis, spec)
+        keys = local_keys(spec, args.key_space)
+
+    es = CountingElasticsearch(raw_es)
+
+    async def init_es() -> Any:
+        return es
+
+    async def init_cache() -> Any:
+        return redis
+
+    scenarios = [
+        scenario
+        for scenario in build_scenarios(keys, args.page_size)
+        if not args.only or any(scenario.name.startswith(prefix) for prefix in args.only)
+    ]
+    results: Dict[str, dict] = {}
+    patches = {"init_elastic": init_es, "init_redis": init_cache}
+    if args.backend == "fake":
+        # заменитель без пула: подписчикам хватает того же экземпляра
+        patches["init_redis_subscriber"] = init_cache
+    with mock.patch.multiple(main, **patches):
+        async with main.app.router.lifespan_context(main.app):
+            await wait_for_similar_index(main.app, keys.film_ids[0], args.ready_timeout)
+            await wait_for_ranking_index(main.app, args.ready_timeout)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for scenario in scenarios:
+                    if args.warmup:
+                        await run_scenario(client, scenario, es, args.warmup, args.concurrency, args.seed + 1)
+                    result = await run_scenario(client, scenario, es, args.requests, args.concurrency, args.seed)
+                    results[scenario.name] = asdict(result)
+                    logger.info("%s: %s", scenario.name, format_result(result))
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "backend": args.backend,
+            "catalog": asdict(spec),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "key_space": args.key_space,
+            "es_latency": args.es_latency if args.backend == "fake" else None,
+            "redis_latency": args.redis_latency if args.backend == "fake" else None,
+        },
+        "scenarios": results,
+    }
+
+
+def format_result(result: ScenarioResult) -> str:
+    return (
+        f"{result.rps} rps, p50 {result.p50_ms}ms, p95 {result.p95_ms}ms, p99 {result.p99_ms}ms, "
+        f"{result.es_calls_per_request} ES calls/req, {result.errors} errors"
+    )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> str:
+    """Таблица изменений относительно сохранённого базового прогона."""
+    metrics = ("rps", "p50_ms", "p95_ms", "p99_ms", "es_calls_per_request")
+    lines = [f"{'scenario':<20}" + "".join(f"{metric:>24}" for metric in metrics)]
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        cells = []
+        for metric in metrics:
+            old, new = base[metric], result[metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            cells.append(f"{old:>9} -> {new:<9}{change:>5}")
+        lines.append(f"{name:<20}" + "".join(f"{cell:>24}" for cell in cells))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк API на синтетическом каталоге")
+    parser.add_argument("--backend", choices=["fake", "local"], default="fake")
+    parser.add_argument("--seed-local", action="store_true", help="загрузить каталог в локальные ES и Redis")
+    parser.add_argument("--films", type=int, default=10_000)
+    parser.add_argument("--persons", type=int, default=2_000)
+    parser.add_argument("--genres", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2_000, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=0, help="прогревочных запросов на сценарий (не входят в замер)")
+    parser.add_argument("--key-space", type=int, default=1_000, help="сколько разных id участвуют в запросах")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--es-latency", type=float, default=0.002, help="задержка заменителя ES, с")
+    parser.add_argument("--redis-latency", type=float, default=0.0002, help="задержка заменителя Redis, с")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--only", nargs="*", help="префиксы имён сценариев, например films: persons:detail")
+    parser.add_argument("--output", type=Path, help="сохранить отчёт в JSON")
+    parser.add_argument("--compare", type=Path, help="сравнить с сохранённым отчётом")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        args.output.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    if args.compare:
+        print(compare(report, orjson.loads(args.compare.read_bytes())))
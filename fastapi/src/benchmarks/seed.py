@@ -0,0 +1,49 @@
+"""Загрузка синтетического каталога в локальные Elasticsearch и Redis."""
+import logging
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+from redis.asyncio import Redis
+
+from benchmarks.catalog import MOVIES_INDEX_BODY, CatalogSpec, build_vocabulary, genre_docs, iter_films, person_refs
+from core.config import config
+from db.index_manager import IndexManager
+from db.indexes import MOVIES_INDEX
+from etl.pipelines import FilmsSuggestPipeline, GenresPipeline, PersonsPipeline
+from services.cache_service import RedisCacheService
+from services.similar_films_index import SimilarFilmsIndex
+
+logger = logging.getLogger(__name__)
+
+
+async def seed_local(es: AsyncElasticsearch, redis: Redis, spec: CatalogSpec) -> None:
+    """
+    Перестраивает индекс фильмов из синтетического каталога, затем строит индексы
+    жанров, персон и подсказок фильмов настоящими ETL-пайплайнами. Каталог генерируется потоково,
+    поэтому загрузка 1M фильмов не требует держать его в памяти.
+    """
+    vocabulary = build_vocabulary(spec)
+    genre_names = [genre["name"] for genre in genre_docs(spec).values()]
+    persons = person_refs(spec)
+
+    async def load(index: str) -> None:
+        actions = (
+            {"_op_type": "index", "_id": film["id"], "_source": film}
+            for film in iter_films(spec, genre_names, persons, vocabulary)
+        )
+        loaded = 0
+        async for ok, item in async_streaming_bulk(
+            es, actions, index=index, chunk_size=config.ETL_BULK_CHUNK_SIZE, raise_on_error=True
+        ):
+            loaded += 1
+            if loaded % 100_000 == 0:
+                logger.info("Seeded %d films", loaded)
+
+    await IndexManager(es).rebuild(MOVIES_INDEX, MOVIES_INDEX_BODY, load)
+    cache = RedisCacheService(redis)
+    # без водяного знака ETL прочитал бы только изменения, а каталог целиком новый
+    for pipeline_class in (GenresPipeline, PersonsPipeline, FilmsSuggestPipeline):
+        await pipeline_class(es, redis, cache).run(full=True)
+    # предрассчитанные похожие фильмы относятся к старому каталогу
+    similar_films_index = SimilarFilmsIndex(es, redis)
+    await redis.delete(similar_films_index.key, similar_films_index.lock_key)
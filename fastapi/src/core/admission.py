@@ -0,0 +1,166 @@
+"""
+Контроль допуска запросов API: ограничение одновременных запросов по классам
+стоимости и сброс нагрузки, начиная с дорогих запросов.
+
+Маршрут относится к классу по ADMISSION_ROUTE_CLASSES. У каждого класса свой
+лимит одновременных запросов и своя очередь: запрос, не получивший места за
+queue_timeout (и не позже срока запроса, см. db.resilience), получает 503
+с Retry-After. Лимиты классов, у которых min_limit < max_limit, подстраиваются
+по AIMD под время ответа Elasticsearch на чтениях запросов API (фоновые задачи
+не учитываются, см. ResilientElasticsearch.latency): пока оно выше ADMISSION_LATENCY_TARGET,
+лимит умножается на ADMISSION_DECREASE_FACTOR (не чаще раза в
+ADMISSION_ADJUST_INTERVAL), иначе растёт примерно на единицу за лимит
+завершившихся запросов. Лимиты дешёвых классов постоянны, поэтому при перегрузке
+Elasticsearch сбрасываются в первую очередь поиск и подборки, а карточки из кеша
+продолжают отдаваться быстро. Состояние своё у каждого воркера.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from core.config import AdmissionClass, config
+from core.metrics import ADMISSION_LIMIT, ADMISSION_REJECTED
+from db.resilience import remaining_budget
+
+
+class OverloadedError(Exception):
+    """Запрос не допущен: класс его маршрута перегружен."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов класса с очередью ожидания в порядке поступления."""
+
+    def __init__(
+        self,
+        name: str,
+        settings: AdmissionClass,
+        latency_target: float,
+        decrease_factor: float,
+        adjust_interval: float,
+    ):
+        """
+        Args:
+            name: Имя класса для метрик
+            settings: Лимиты и время ожидания класса
+            latency_target: Время ответа Elasticsearch, выше которого лимит уменьшается
+            decrease_factor: Во сколько раз уменьшается лимит
+            adjust_interval: Не чаще чем раз во сколько секунд лимит уменьшается
+        """
+        self.name = name
+        self.min_limit = settings.min_limit
+        self.max_limit = settings.max_limit
+        self.queue_timeout = settings.queue_timeout
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.adjust_interval = adjust_interval
+        self.limit = float(min(max(settings.limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._decreased_at = 0.0
+        ADMISSION_LIMIT.labels(name).set(self.limit)
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_limit < self.max_limit
+
+    async def acquire(self) -> None:
+        """
+        Занимает место, ожидая его не дольше queue_timeout и оставшегося срока запроса.
+
+        Raises:
+            OverloadedError: Место не освободилось вовремя.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        timeout = self.queue_timeout
+        budget = remaining_budget()
+        if budget is not None:
+            timeout = min(timeout, budget)
+        if timeout <= 0:
+            self._reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self._reject()
+
+    def release(self, latency: Optional[float]) -> None:
+        """
+        Освобождает место и подстраивает лимит.
+
+        Args:
+            latency: Текущее время ответа Elasticsearch; None — замеров ещё нет
+        """
+        self.in_flight -= 1
+        if self.adaptive and latency is not None:
+            self._adjust(latency)
+        self._wake()
+
+    def _adjust(self, latency: float) -> None:
+        if latency > self.latency_target:
+            now = time.monotonic()
+            if now - self._decreased_at < self.adjust_interval:
+                return
+            self._decreased_at = now
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # место выдали одновременно с отказом от ожидания: возвращаем его
+            self.in_flight -= 1
+            self._wake()
+            return
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def _reject(self) -> None:
+        ADMISSION_REJECTED.labels(self.name).inc()
+        raise OverloadedError(f"{self.name} requests are over capacity", retry_after=max(1.0, self.queue_timeout))
+
+
+class AdmissionController:
+    """Лимитеры классов стоимости и сопоставление маршрутов классам."""
+
+    def __init__(self, latency: Callable[[], Optional[float]]):
+        """
+        Args:
+            latency: Текущее время ответа Elasticsearch (None — замеров ещё нет)
+        """
+        self.limiters: Dict[str, AdaptiveLimiter] = {
+            name: AdaptiveLimiter(
+                name,
+                settings,
+                config.ADMISSION_LATENCY_TARGET,
+                config.ADMISSION_DECREASE_FACTOR,
+                config.ADMISSION_ADJUST_INTERVAL,
+            )
+            for name, settings in config.ADMISSION_CLASSES.items()
+        }
+        self.route_classes = config.ADMISSION_ROUTE_CLASSES
+        self.default_class = config.ADMISSION_DEFAULT_CLASS
+        self.latency = latency
+
+    def limiter_for(self, route: Optional[str]) -> AdaptiveLimiter:
+        return self.limiters[self.route_classes.get(route, self.default_class)]
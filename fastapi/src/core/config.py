@@ -1,10 +1,28 @@
 from pathlib import Path
 import logging
+from typing import Dict
 
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings
 
 logger = logging.getLogger(__name__)
 
+# Сколько запросов воркер обслуживает одновременно, если UVICORN_LIMIT_CONCURRENCY не задан
+DEFAULT_WORKER_CONCURRENCY = 64
+# Соединения Redis для коротких команд фоновых задач (прогрев, пересчёт индексов); подписки
+# pub/sub и чтение потоков держат соединения отдельного пула (см. db.redis.init_redis_subscriber)
+REDIS_RESERVED_CONNECTIONS = 5
+
+
+class AdmissionClass(BaseModel):
+    """Класс стоимости запросов API для контроля допуска (см. core.admission)."""
+    # Начальный лимит одновременных запросов; при min_limit < max_limit подстраивается в этих пределах
+    limit: int
+    min_limit: int
+    max_limit: int
+    # Сколько секунд запрос ждёт места, прежде чем получить 503
+    queue_timeout: float
+
 
 class Config(BaseSettings):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
@@ -17,22 +35,226 @@ class Config(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0 
     REDIS_PASSWORD: str | None = None
+    # None — по конкурентности воркера плюс соединения подписок
+    REDIS_MAX_CONNECTIONS: int | None = None
+    # Сколько ждать свободного соединения пула, прежде чем вернуть ошибку
+    REDIS_POOL_TIMEOUT: float = 5.0
+
+    # Cache (TTL в секундах)
+    CACHE_PREFIX: str = "cache"
+    CACHE_FILM_TTL: int = 300
+    # Списки, поиск и фасеты фильмов инвалидируются только по фильмам на странице и жанрам
+    # фильтра; новый или переоценённый фильм появляется на них по истечении этих TTL
+    CACHE_FILMS_LIST_TTL: int = 60
+    CACHE_FILMS_FACETS_TTL: int = 60
+    CACHE_FILMS_SEARCH_TTL: int = 60
+    CACHE_FILMS_SIMILAR_TTL: int = 600
+    CACHE_GENRE_TTL: int = 3600
+    CACHE_GENRES_LIST_TTL: int = 3600
+    CACHE_GENRES_SEARCH_TTL: int = 600
+    CACHE_PERSON_TTL: int = 600
+    CACHE_PERSONS_SEARCH_TTL: int = 300
+    CACHE_PERSON_FILMS_TTL: int = 600
+    CACHE_NOT_FOUND_TTL: int = 30
+    CACHE_LOCK_TTL_MS: int = 5000
+    CACHE_LOCK_WAIT_TIMEOUT: float = 3.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05
+    CACHE_LOCAL_MAXSIZE: int = 2048
+    CACHE_LOCAL_TTL: int = 60
+    # Сколько устаревшая копия значения переживает само значение (отдаётся, пока Elasticsearch недоступен)
+    CACHE_STALE_TTL: int = 86400
+    # Множество тега живёт не меньше самого долгого TTL помеченных им значений
+    CACHE_DEPENDENCY_TTL: int = 86400
+    CACHE_EVENTS_STREAM: str = "cache:events"
+    CACHE_EVENTS_GROUP: str = "api-cache-invalidation"
+    CACHE_EVENTS_MAXLEN: int = 100000
+    CACHE_EVENTS_BATCH_SIZE: int = 100
+    CACHE_EVENTS_BLOCK_MS: int = 5000
+    CACHE_EVENTS_CLAIM_IDLE_MS: int = 60000
+
+    # HTTP-кеширование: ETag, 304 и Cache-Control по шаблону пути маршрута.
+    # max-age короче TTL кеша API: ответ в CDN не инвалидируется событиями изменений
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_POLICIES: Dict[str, str] = {
+        "/api/v1/films/": "public, max-age=30, stale-while-revalidate=60",
+        "/api/v1/films/search": "public, max-age=30, stale-while-revalidate=60",
+        "/api/v1/films/suggest": "public, max-age=300, stale-while-revalidate=600",
+        "/api/v1/films/{film_id}": "public, max-age=60, stale-while-revalidate=300",
+        "/api/v1/films/{film_id}/similar": "public, max-age=300, stale-while-revalidate=600",
+        "/api/v1/genres/": "public, max-age=600, stale-while-revalidate=3600",
+        "/api/v1/genres/search": "public, max-age=300, stale-while-revalidate=600",
+        "/api/v1/genres/suggest": "public, max-age=300, stale-while-revalidate=600",
+        "/api/v1/genres/{genre_id}": "public, max-age=600, stale-while-revalidate=3600",
+    }
+
+    # Сжатие JSON-ответов по Accept-Encoding; сжатое тело запоминается по ETag и кодировке
+    HTTP_COMPRESSION_ENABLED: bool = True
+    HTTP_COMPRESSION_MIN_SIZE: int = 1024
+    HTTP_COMPRESSION_GZIP_LEVEL: int = 6
+    HTTP_COMPRESSION_BROTLI_QUALITY: int = 5
+    HTTP_COMPRESSION_MEMO_MAXSIZE: int = 2048
+    HTTP_COMPRESSION_MEMO_TTL: int = 3600
+
+    # Genres
+    GENRE_REGISTRY_REFRESH_INTERVAL: int = 300
+    GENRES_CHANGED_CHANNEL: str = "genres:changed"
+
+    # Фасеты списка фильмов
+    FILMS_FACET_GENRES_SIZE: int = 50
+    FILMS_FACET_RATING_INTERVAL: float = 1.0
+
+    # Подсказки поиска: короткие префиксы отдаются из памяти процесса
+    SUGGEST_PREFIX_CACHE_MAX_LENGTH: int = 3
+    SUGGEST_PREFIX_CACHE_MAXSIZE: int = 10000
+    SUGGEST_PREFIX_CACHE_TTL: int = 300
+
+    # Индекс ранжирования в памяти воркера для списка фильмов по рейтингу (см. services.ranking_index)
+    FILMS_RANKING_INDEX_ENABLED: bool = False
+    FILMS_RANKING_INDEX_BATCH_SIZE: int = 1000
+    FILMS_RANKING_INDEX_REFRESH_INTERVAL: int = 3600
+    # Сколько наборов фильтров помнить с готовыми фасетами для текущего снимка индекса
+    FILMS_RANKING_INDEX_FACETS_MEMO_SIZE: int = 1024
+
+    # Similar films
+    SIMILAR_FILMS_TOP_N: int = 50
+    SIMILAR_FILMS_BATCH_SIZE: int = 100
+    SIMILAR_FILMS_REFRESH_INTERVAL: int = 86400
 
     # Elasticsearch
     ELASTIC_SCHEMA: str = "http://"
     ELASTIC_HOST: str = "127.0.0.1"
     ELASTIC_PORT: int = 9200
-    ELASTIC_MAXSIZE: int = 5
+    # Соединений на узел; None — по конкурентности воркера
+    ELASTIC_MAXSIZE: int | None = None
+    # Сколько держать простаивающее соединение открытым (у aiohttp по умолчанию 15 с)
+    ELASTIC_KEEPALIVE_TIMEOUT: float = 60.0
+    # gzip тел запросов и ответов: выгоден при медленной сети, в ЦОДе обычно дороже по CPU
+    ELASTIC_HTTP_COMPRESS: bool = False
     ELASTIC_TIMEOUT: int = 10
     ELASTIC_RETRIES: int = 3
+    ELASTIC_PIT_KEEP_ALIVE: str = "1m"
+    # Бюджет времени чтений Elasticsearch на запрос API, по шаблону пути маршрута
+    ELASTIC_DEADLINE: float = 2.0
+    ELASTIC_DEADLINES: Dict[str, float] = {
+        "/api/v1/films/suggest": 0.3,
+        "/api/v1/genres/suggest": 0.3,
+        "/api/v1/persons/suggest": 0.3,
+        "/api/v1/films/{film_id}": 1.0,
+        "/api/v1/genres/{genre_id}": 1.0,
+        "/api/v1/persons/{person_id}": 1.0,
+    }
+    ELASTIC_BREAKER_FAILURE_THRESHOLD: int = 5
+    ELASTIC_BREAKER_RECOVERY_TIMEOUT: float = 10.0
+    # Через сколько секунд без ответа дублировать чтение на другую копию шардов; None — не дублировать
+    ELASTIC_HEDGE_DELAY: float | None = None
+    ELASTIC_COALESCE_REQUESTS: bool = True
+    ELASTIC_COALESCE_TRACKED_KEYS: int = 1024
+    # Имена индексов — алиасы чтения, за которыми стоят версионные индексы
+    ELASTIC_MOVIES_INDEX: str = "movies"
+    ELASTIC_GENRES_INDEX: str = "genres"
+    ELASTIC_PERSONS_INDEX: str = "persons"
+    ELASTIC_FILMS_SUGGEST_INDEX: str = "films_suggest"
+    ELASTIC_INDEX_REPLICAS: int = 1
+    ELASTIC_FORCEMERGE_TIMEOUT: int = 600
+    ELASTIC_REINDEX_MIN_DOCS_RATIO: float = 0.9
+    ELASTIC_REINDEX_KEEP_VERSIONS: int = 1
+
+    # ETL
+    ETL_STATE_KEY: str = "etl:state"
+    ETL_MODIFIED_FIELD: str = "modified"
+    ETL_EXTRACT_BATCH_SIZE: int = 1000
+    ETL_BULK_CHUNK_SIZE: int = 500
+    ETL_BULK_MAX_CHUNK_BYTES: int = 10 * 1024 * 1024
+    ETL_BULK_CONCURRENCY: int = 4
+    ETL_BULK_MAX_RETRIES: int = 3
+    ETL_BULK_REFRESH: str = "wait_for"
+
+    # Metrics
+    METRICS_ENABLED: bool = True
+    # Каталог для счётчиков воркеров в режиме нескольких процессов (PROMETHEUS_MULTIPROC_DIR)
+    METRICS_MULTIPROC_DIR: str | None = None
 
     # Environment
     ENV: str = "dev"
     LOG_LEVEL: str = "DEBUG"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+    # Строка JSON на запись вместо текстового формата
+    LOG_JSON: bool = False
+    # Запись в stdout из фонового потока через ограниченную очередь; переполнение — отброс записей
+    LOG_QUEUE_ENABLED: bool = True
+    LOG_QUEUE_MAXSIZE: int = 10000
+    # Логгер -> доля записей ниже WARNING, которые пишутся (например, {"uvicorn.access": 0.01})
+    LOG_SAMPLING: Dict[str, float] = {}
 
     # Uvicorn
     UVICORN_HOST: str = "0.0.0.0"
     UVICORN_PORT: int = 8000
-    UVICORN_RELOAD: bool = True
+    UVICORN_RELOAD: bool = True  # только для ENV=dev
+    # Production-режим (ENV != dev): несколько воркеров, uvloop и httptools
+    UVICORN_WORKERS: int = 0  # 0 — по числу доступных процессу ядер
+    UVICORN_LOOP: str = "uvloop"
+    UVICORN_HTTP: str = "httptools"
+    UVICORN_BACKLOG: int = 2048
+    # Больше idle-таймаута балансировщика, чтобы соединение закрывал он, а не мы
+    UVICORN_TIMEOUT_KEEP_ALIVE: int = 75
+    UVICORN_TIMEOUT_GRACEFUL_SHUTDOWN: int = 30
+    UVICORN_LIMIT_CONCURRENCY: int | None = None
+    UVICORN_ACCESS_LOG: bool = True
+
+    # Контроль допуска: одновременные запросы по классам стоимости маршрутов (см. core.admission)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CLASSES: Dict[str, AdmissionClass] = {
+        "cheap": AdmissionClass(limit=128, min_limit=128, max_limit=128, queue_timeout=2.0),
+        "standard": AdmissionClass(limit=64, min_limit=8, max_limit=128, queue_timeout=2.0),
+        "expensive": AdmissionClass(limit=16, min_limit=2, max_limit=64, queue_timeout=1.0),
+    }
+    ADMISSION_DEFAULT_CLASS: str = "standard"
+    ADMISSION_ROUTE_CLASSES: Dict[str, str] = {
+        "/api/v1/films/{film_id}": "cheap",
+        "/api/v1/films/suggest": "cheap",
+        "/api/v1/genres/": "cheap",
+        "/api/v1/genres/{genre_id}": "cheap",
+        "/api/v1/genres/suggest": "cheap",
+        "/api/v1/persons/{person_id}": "cheap",
+        "/api/v1/persons/suggest": "cheap",
+        "/api/v1/films/search": "expensive",
+        "/api/v1/films/{film_id}/similar": "expensive",
+        "/api/v1/persons/search": "expensive",
+        "/api/v1/genres/search": "expensive",
+    }
+    # Время ответа Elasticsearch (скользящее среднее), выше которого адаптивные лимиты уменьшаются
+    ADMISSION_LATENCY_TARGET: float = 0.2
+    ADMISSION_DECREASE_FACTOR: float = 0.7
+    ADMISSION_ADJUST_INTERVAL: float = 1.0
+
+    # Прогрев при старте воркера, до приёма трафика
+    PREWARM_ENABLED: bool = True
+    PREWARM_TIMEOUT: float = 10.0
+    # Прогрев кеша по наблюдаемому трафику (см. services.warmup)
+    WARMUP_ENABLED: bool = True
+    WARMUP_KEY: str = "warmup:traffic"
+    WARMUP_TOP_N: int = 500
+    WARMUP_TRACKED_KEYS: int = 10000
+    WARMUP_CONCURRENCY: int = 8
+    WARMUP_FLUSH_INTERVAL: float = 10.0
+    WARMUP_INTERVAL: int = 300
+    WARMUP_DECAY_HALF_LIFE: int = 3600
+    # Воркер готов (/ready), когда прогретые запросы покрывают эту долю трафика
+    WARMUP_READY_HIT_RATIO: float = 0.9
+    WARMUP_RETRY_INTERVAL: float = 5.0
+    # Через сколько секунд после старта воркер готов, даже если доля не достигнута; None — не раньше доли
+    WARMUP_READY_TIMEOUT: float | None = 120.0
+
+    @model_validator(mode="after")
+    def size_connection_pools(self) -> "Config":
+        """
+        Размеры пулов по умолчанию следуют конкурентности воркера: иначе запросы
+        выстраиваются в очередь за соединениями задолго до загрузки самих хранилищ.
+        """
+        concurrency = self.UVICORN_LIMIT_CONCURRENCY or DEFAULT_WORKER_CONCURRENCY
+        if self.ELASTIC_MAXSIZE is None:
+            self.ELASTIC_MAXSIZE = concurrency
+        if self.REDIS_MAX_CONNECTIONS is None:
+            self.REDIS_MAX_CONNECTIONS = concurrency + REDIS_RESERVED_CONNECTIONS
+        return self
 
 config = Config()
@@ -1,17 +1,130 @@
-import os
-import logging
+"""
+Настройка логирования.
+
+По умолчанию (LOG_QUEUE_ENABLED) записи не пишутся в stdout из потока, который
+их создал: обработчик кладёт запись в ограниченную очередь, а форматирование
+и запись выполняет отдельный поток QueueListener. Событийный цикл не ждёт ни
+вывода, ни форматирования; если поток записи не успевает и очередь заполнена,
+записи отбрасываются и считаются в метрике log_records_dropped_total.
+
+LOG_JSON включает вывод по строке JSON на запись, LOG_SAMPLING — выборку
+записей ниже WARNING для шумных логгеров (например, журнала доступа uvicorn).
+"""
+import atexit
+import logging.config
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
+
+import orjson
 
 from core.config import config
+from core.metrics import LOG_RECORDS_DROPPED
 
 LOG_LEVEL = config.LOG_LEVEL
 
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DEFAULT_HANDLERS = ["console"]
 
-LOGGING = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
+# Поля, которые uvicorn передаёт записи журнала доступа в args
+ACCESS_LOG_FIELDS = ("client_addr", "method", "path", "http_version", "status")
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Обработчик, пишущий в поток через ограниченную очередь и фоновый поток.
+
+    Запись кладётся в очередь как есть: подстановка аргументов, форматирование
+    и трейсбек исключения вычисляются уже в фоновом потоке. Поэтому аргументы
+    записи не должны меняться после вызова логгера — для значений, которые
+    передаются в логи в этом проекте (строки, числа, исключения), это так.
+    """
+
+    def __init__(self, stream: Optional[IO] = None, maxsize: int = config.LOG_QUEUE_MAXSIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        # форматирует поток записи, а не поток, создавший запись
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(self.name or "").inc()
+
+    def close(self) -> None:
+        # при повторной настройке логирования и при выходе: дописываем очередь
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей ниже WARNING; предупреждения и ошибки — всегда."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(self.extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+    def extra_fields(self, record: logging.LogRecord) -> dict:
+        return {}
+
+
+class JsonAccessFormatter(JsonFormatter):
+    """JSON журнала доступа uvicorn: поля запроса отдельными ключами."""
+
+    def extra_fields(self, record: logging.LogRecord) -> dict:
+        if isinstance(record.args, tuple) and len(record.args) == len(ACCESS_LOG_FIELDS):
+            return dict(zip(ACCESS_LOG_FIELDS, record.args))
+        return {}
+
+
+def _stream_handler(formatter: str, stream: str = "ext://sys.stderr") -> dict:
+    if config.LOG_QUEUE_ENABLED:
+        # фабрика "()", а не "class": с Python 3.12 dictConfig сам собирает QueueListener для подклассов QueueHandler
+        return {"()": "core.logger.QueueStreamHandler", "formatter": formatter, "stream": stream}
+    return {"class": "logging.StreamHandler", "formatter": formatter, "stream": stream}
+
+
+if config.LOG_JSON:
+    FORMATTERS = {
+        "verbose": {"()": "core.logger.JsonFormatter"},
+        "default": {"()": "core.logger.JsonFormatter"},
+        "access": {"()": "core.logger.JsonAccessFormatter"},
+    }
+else:
+    FORMATTERS = {
         "verbose": {
             "format": LOG_FORMAT
         },
@@ -24,23 +137,18 @@ LOGGING = {
             "()": "uvicorn.logging.AccessFormatter",
             "fmt": "%(levelprefix)s %(client_addr)s - '%(request_line)s' %(status_code)s",
         },
+    }
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": FORMATTERS,
+    "filters": {
+        f"sample:{name}": {"()": "core.logger.SamplingFilter", "rate": rate}
+        for name, rate in config.LOG_SAMPLING.items()
     },
     "handlers": {
-        "console": {
-            "level": LOG_LEVEL,
-            "class": "logging.StreamHandler",
-            "formatter": "verbose",
-        },
-        "default": {
-            "formatter": "default",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
-        },
-        "access": {
-            "formatter": "access",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
-        },
+        "console": {**_stream_handler("verbose"), "level": LOG_LEVEL},
     },
     "loggers": {
         "": {
@@ -51,7 +159,7 @@ LOGGING = {
             "level": LOG_LEVEL,
         },
         "uvicorn.access": {
-            "handlers": ["access"],
+            "handlers": [],
             "level": LOG_LEVEL,
             "propagate": False,
         },
@@ -62,7 +170,24 @@ LOGGING = {
         "handlers": LOG_DEFAULT_HANDLERS,
     },
 }
+if config.UVICORN_ACCESS_LOG:
+    # иначе поток записи журнала доступа простаивал бы впустую
+    LOGGING["handlers"]["access"] = _stream_handler("access", "ext://sys.stdout")
+    LOGGING["loggers"]["uvicorn.access"]["handlers"] = ["access"]
+for _name in config.LOG_SAMPLING:
+    LOGGING["loggers"].setdefault(_name, {})["filters"] = [f"sample:{_name}"]
+
+_configured = False
+
 
-logging.config.dictConfig(LOGGING)
-logger = logging.getLogger(__name__)
-logger.info(f"Logger initialized with level: {LOG_LEVEL}")
+def setup_logging() -> None:
+    """
+    Применяет LOGGING один раз на процесс. Вызывается точками входа
+    (API, ETL, бенчмарк); uvicorn логирование не перенастраивает.
+    """
+    global _configured
+    if _configured:
+        return
+    logging.config.dictConfig(LOGGING)
+    _configured = True
+    logging.getLogger(__name__).info("Logger initialized with level: %s", LOG_LEVEL)
@@ -0,0 +1,169 @@
+"""
+Метрики Prometheus горячего пути: время запросов API, обращений к Elasticsearch
+и Redis, попадания в кеш. Отдаются эндпоинтом /metrics.
+"""
+import os
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.requests import Request
+from starlette.responses import Response
+
+# От единиц миллисекунд (L1, Redis) до секунд (тяжёлые поиски)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса API",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ES_REQUEST_DURATION = Histogram(
+    "elasticsearch_request_duration_seconds",
+    "Время запроса к Elasticsearch на стороне клиента",
+    ["operation", "index"],
+    buckets=LATENCY_BUCKETS,
+)
+ES_TOOK = Histogram(
+    "elasticsearch_took_seconds",
+    "Время выполнения запроса по данным Elasticsearch (took)",
+    ["operation", "index"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Время команды Redis",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Обращения к кешу ответов по уровню (local, redis) и результату (hit, miss)",
+    ["layer", "namespace", "result"],
+)
+CACHE_INVALIDATION_EVENTS = Counter(
+    "cache_invalidation_events_total",
+    "Обработанные события изменений документов по типу документа",
+    ["entity"],
+)
+CACHE_INVALIDATED_KEYS = Counter(
+    "cache_invalidated_keys_total",
+    "Ключи кеша, удалённые по событиям изменений",
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Состояние выключателя: 0 — замкнут, 1 — пробные запросы, 2 — разомкнут",
+    ["name"],
+    multiprocess_mode="livemax",
+)
+ELASTIC_HEDGED_REQUESTS = Counter(
+    "elasticsearch_hedged_requests_total",
+    "Хеджированные чтения Elasticsearch по тому, чей ответ пришёл первым (primary, hedge)",
+    ["winner"],
+)
+DEGRADED_RESPONSES = Counter(
+    "degraded_responses_total",
+    "Ответы API, отданные в деградированном режиме, по причине",
+    ["reason"],
+)
+ADMISSION_LIMIT = Gauge(
+    "admission_limit",
+    "Текущий лимит одновременных запросов класса стоимости",
+    ["cost_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Запросы, отклонённые контролем допуска (503), по классу стоимости",
+    ["cost_class"],
+)
+WARMUP_HIT_RATIO = Gauge(
+    "cache_warmup_hit_ratio",
+    "Доля трафика, покрытая последним прогревом кеша",
+    multiprocess_mode="livemin",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Записи лога, отброшенные из-за переполненной очереди обработчика",
+    ["handler"],
+)
+# Пулы соединений (pool: elasticsearch, redis). Насыщение — in_use / max,
+# рост waiting и connection_pool_wait_seconds — очередь за соединениями.
+CONNECTION_POOL_MAX = Gauge(
+    "connection_pool_max",
+    "Размер пула соединений",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CONNECTION_POOL_IN_USE = Gauge(
+    "connection_pool_in_use",
+    "Соединения пула, занятые запросами",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CONNECTION_POOL_WAITING = Gauge(
+    "connection_pool_waiting",
+    "Запросы, ожидающие соединение пула (включая установку нового соединения)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CONNECTION_POOL_WAIT = Histogram(
+    "connection_pool_wait_seconds",
+    "Время получения соединения из пула",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class RuntimeStatsCollector:
+    """
+    Экспортирует счётчики, которые объекты приложения и так ведут сами:
+    статистику SingleFlight и локального кеша. Значения читаются только
+    в момент запроса /metrics, на горячем пути ничего не добавляется.
+    """
+
+    def __init__(self, single_flights: Dict[str, object], local_cache: Optional[object] = None):
+        """
+        Args:
+            single_flights: Имя -> SingleFlight
+            local_cache: MemoryCache процесса
+        """
+        self.single_flights = single_flights
+        self.local_cache = local_cache
+
+    def collect(self) -> Iterator:
+        calls = CounterMetricFamily("single_flight_calls", "Вызовы через SingleFlight", labels=["name"])
+        executions = CounterMetricFamily(
+            "single_flight_executions", "Реально выполненные вызовы SingleFlight", labels=["name"]
+        )
+        for name, single_flight in self.single_flights.items():
+            calls.add_metric([name], single_flight.total.calls)
+            executions.add_metric([name], single_flight.total.executions)
+        yield calls
+        yield executions
+
+        if self.local_cache is not None:
+            stats = self.local_cache.stats()
+            yield GaugeMetricFamily("local_cache_size", "Записей в локальном кеше", value=stats["size"])
+            yield CounterMetricFamily("local_cache_hits", "Попадания в локальный кеш", value=stats["hits"])
+            yield CounterMetricFamily("local_cache_misses", "Промахи локального кеша", value=stats["misses"])
+            yield CounterMetricFamily(
+                "local_cache_evictions", "Вытеснения из локального кеша", value=stats["evictions"]
+            )
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Метрики в текстовом формате Prometheus.
+
+    При нескольких воркерах (задан PROMETHEUS_MULTIPROC_DIR) гистограммы и счётчики
+    агрегируются по файлам всех процессов; RuntimeStatsCollector описывает только
+    свой процесс и в этом режиме не отдаётся.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
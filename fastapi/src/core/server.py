@@ -0,0 +1,71 @@
+import glob
+import logging
+import os
+
+import uvicorn
+
+from core.config import config
+from core.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    """Число воркеров: из настроек либо по числу ядер, доступных процессу (учитывает cpuset контейнера)."""
+    if config.UVICORN_WORKERS > 0:
+        return config.UVICORN_WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def prepare_multiprocess_metrics(directory: str) -> None:
+    """
+    Включает сбор метрик со всех воркеров: каждый процесс пишет счётчики в файлы
+    каталога, /metrics любого воркера агрегирует их. Переменная окружения должна
+    быть задана до импорта prometheus_client в воркерах, а файлы прошлого запуска удалены.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+
+
+def serve(app: str) -> None:
+    """
+    Запускает uvicorn.
+
+    В dev — один процесс с автоперезагрузкой. Иначе — несколько воркеров с uvloop
+    и httptools, без перезагрузки. По SIGTERM сервер перестаёт принимать соединения
+    и до UVICORN_TIMEOUT_GRACEFUL_SHUTDOWN секунд дожидается текущих запросов.
+    """
+    setup_logging()
+    common = {
+        "host": config.UVICORN_HOST,
+        "port": config.UVICORN_PORT,
+        # логирование настраивает setup_logging в каждом процессе, uvicorn его не трогает
+        "log_config": None,
+        "log_level": config.LOG_LEVEL.lower(),
+        "access_log": config.UVICORN_ACCESS_LOG,
+    }
+    if config.ENV == "dev":
+        uvicorn.run(app, reload=config.UVICORN_RELOAD, **common)
+        return
+
+    workers = worker_count()
+    if workers > 1 and config.METRICS_ENABLED and config.METRICS_MULTIPROC_DIR:
+        prepare_multiprocess_metrics(config.METRICS_MULTIPROC_DIR)
+    logger.info("Starting %d workers (%s, %s)", workers, config.UVICORN_LOOP, config.UVICORN_HTTP)
+    uvicorn.run(
+        app,
+        workers=workers,
+        loop=config.UVICORN_LOOP,
+        http=config.UVICORN_HTTP,
+        backlog=config.UVICORN_BACKLOG,
+        timeout_keep_alive=config.UVICORN_TIMEOUT_KEEP_ALIVE,
+        timeout_graceful_shutdown=config.UVICORN_TIMEOUT_GRACEFUL_SHUTDOWN,
+        limit_concurrency=config.UVICORN_LIMIT_CONCURRENCY,
+        server_header=False,
+        **common,
+    )
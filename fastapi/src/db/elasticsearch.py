@@ -1,21 +1,156 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+import aiohttp
+import elastic_transport
+import orjson
+from elastic_transport import AiohttpHttpNode, NodeConfig
 from elasticsearch import AsyncElasticsearch
 from fastapi import Request
 
 from core.config import config
+from core.metrics import (CONNECTION_POOL_IN_USE, CONNECTION_POOL_MAX, CONNECTION_POOL_WAIT,
+                          CONNECTION_POOL_WAITING, ES_REQUEST_DURATION, ES_TOOK)
+from db.resilience import DeadlineExceededError, remaining_budget
+from db.single_flight import SingleFlight
+
+try:
+    from elastic_transport._node._http_aiohttp import _NEEDS_CLEANUP_CLOSED
+except ImportError:
+    _NEEDS_CLEANUP_CLOSED = None
+
+logger = logging.getLogger(__name__)
+
+# Версия elastic-transport, с реализацией которой сверен PooledAiohttpNode._create_aiohttp_session.
+# При обновлении elastic-transport сверить метод с исходником и поднять версию
+_VERIFIED_TRANSPORT_VERSION = (8, 17)
+_SESSION_OVERRIDE_SUPPORTED = (
+    _NEEDS_CLEANUP_CLOSED is not None
+    and tuple(int(part) for part in elastic_transport.__version__.split(".")[:2]) == _VERIFIED_TRANSPORT_VERSION
+)
+
+# Получил ли текущий запрос к узлу соединение из пула (для учёта занятых соединений)
+_lease: ContextVar[Optional[List[bool]]] = ContextVar("elastic_connection_lease", default=None)
 
 
 async def init_elastic() -> AsyncElasticsearch:
     """Создаёт подключение к Elasticsearch."""
     
+    if not _SESSION_OVERRIDE_SUPPORTED:
+        logger.warning(
+            "elastic-transport %s is not verified for the pooled node: "
+            "ELASTIC_KEEPALIVE_TIMEOUT and connection wait metrics are disabled",
+            elastic_transport.__version__,
+        )
     return AsyncElasticsearch(
         hosts=[f"{config.ELASTIC_SCHEMA}{config.ELASTIC_HOST}:{config.ELASTIC_PORT}"],
-        maxsize=config.ELASTIC_MAXSIZE,
+        connections_per_node=config.ELASTIC_MAXSIZE,
+        http_compress=config.ELASTIC_HTTP_COMPRESS,
+        node_class=InstrumentedAiohttpNode if config.METRICS_ENABLED else PooledAiohttpNode,
         timeout=config.ELASTIC_TIMEOUT,
         retry_on_timeout=True,
         max_retries=config.ELASTIC_RETRIES,
     )
     
     
+class PooledAiohttpNode(AiohttpHttpNode):
+    """
+    Узел Elasticsearch на aiohttp с настраиваемым keep-alive: по умолчанию aiohttp
+    закрывает простаивающие соединения через 15 секунд, и после паузы в трафике
+    запросы снова платят за установку TCP-соединений.
+
+    Публичной настройки коннектора у узла нет, поэтому создание сессии повторяет
+    закрытый метод elastic-transport. С непроверенной версией elastic-transport
+    (см. _VERIFIED_TRANSPORT_VERSION) сессия создаётся штатно, без своего коннектора.
+    """
+
+    connector_class = aiohttp.TCPConnector
+
+    def _create_aiohttp_session(self) -> None:
+        if not _SESSION_OVERRIDE_SUPPORTED:
+            super()._create_aiohttp_session()
+            return
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            skip_auto_headers=("accept", "accept-encoding", "user-agent"),
+            auto_decompress=True,
+            loop=self._loop,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            connector=self.connector_class(
+                limit_per_host=self._connections_per_node,
+                keepalive_timeout=config.ELASTIC_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                enable_cleanup_closed=_NEEDS_CLEANUP_CLOSED,
+                ssl=self._ssl_context or False,
+            ),
+        )
+
+
+class InstrumentedTCPConnector(aiohttp.TCPConnector):
+    """Коннектор aiohttp, замеряющий ожидание соединения из пула."""
+
+    async def connect(self, req: aiohttp.ClientRequest, traces: list, timeout: aiohttp.ClientTimeout) -> Any:
+        CONNECTION_POOL_WAITING.labels("elasticsearch").inc()
+        start = time.perf_counter()
+        try:
+            connection = await super().connect(req, traces, timeout)
+        finally:
+            CONNECTION_POOL_WAITING.labels("elasticsearch").dec()
+            CONNECTION_POOL_WAIT.labels("elasticsearch").observe(time.perf_counter() - start)
+        lease = _lease.get()
+        if lease is not None and not lease:
+            lease.append(True)
+            CONNECTION_POOL_IN_USE.labels("elasticsearch").inc()
+        return connection
+
+
+class InstrumentedAiohttpNode(PooledAiohttpNode):
+    """
+    Узел Elasticsearch, отдающий метрики пула соединений. Соединение считается занятым
+    с момента получения из пула до конца запроса: ответ читается внутри perform_request.
+    """
+
+    connector_class = InstrumentedTCPConnector
+
+    def __init__(self, node_config: NodeConfig):
+        super().__init__(node_config)
+        CONNECTION_POOL_MAX.labels("elasticsearch").inc(self._connections_per_node)
+        self._pool_registered = True
+
+    async def perform_request(self, *args: Any, **kwargs: Any) -> Any:
+        lease: List[bool] = []
+        token = _lease.set(lease)
+        try:
+            return await super().perform_request(*args, **kwargs)
+        finally:
+            _lease.reset(token)
+            if lease:
+                CONNECTION_POOL_IN_USE.labels("elasticsearch").dec()
+
+    async def close(self) -> None:
+        if self._pool_registered:
+            CONNECTION_POOL_MAX.labels("elasticsearch").dec(self._connections_per_node)
+            self._pool_registered = False
+        await super().close()
+
+
+async def warm_elastic(es: AsyncElasticsearch, connections: int = config.ELASTIC_MAXSIZE) -> bool:
+    """
+    Открывает соединения пула заранее параллельными ping, чтобы первые запросы
+    после старта не платили за установку TCP-соединений.
+
+    Returns:
+        bool: Ответил ли Elasticsearch.
+    """
+    results = await asyncio.gather(*(es.ping() for _ in range(connections)))
+    return all(results)
+
+
 def get_elastic(request: Request) -> AsyncElasticsearch:
     """
     Получает подключение к Elasticsearch из состояния приложения.
@@ -28,4 +163,104 @@ def get_elastic(request: Request) -> AsyncElasticsearch:
     """
     
     return request.app.state.es
-    
\ No newline at end of file
+
+
+class InstrumentedElasticsearch:
+    """
+    Обёртка над AsyncElasticsearch, замеряющая время чтений по операции и индексу.
+
+    Кроме времени на стороне клиента записывает took из ответа: разница между ними —
+    это сеть, очередь пула соединений и разбор ответа.
+    """
+
+    def __init__(self, client: AsyncElasticsearch):
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def get(self, **kwargs: Any) -> Any:
+        return await self._observe("get", kwargs)
+
+    async def mget(self, **kwargs: Any) -> Any:
+        return await self._observe("mget", kwargs)
+
+    async def search(self, **kwargs: Any) -> Any:
+        return await self._observe("search", kwargs)
+
+    async def msearch(self, **kwargs: Any) -> Any:
+        return await self._observe("msearch", kwargs)
+
+    async def count(self, **kwargs: Any) -> Any:
+        return await self._observe("count", kwargs)
+
+    async def _observe(self, operation: str, kwargs: dict) -> Any:
+        index = self._index_label(kwargs)
+        start = time.perf_counter()
+        try:
+            response = await getattr(self._client, operation)(**kwargs)
+        finally:
+            ES_REQUEST_DURATION.labels(operation, index).observe(time.perf_counter() - start)
+        took = response.get("took")
+        if isinstance(took, int):
+            ES_TOOK.labels(operation, index).observe(took / 1000)
+        return response
+
+    @staticmethod
+    def _index_label(kwargs: dict) -> str:
+        index = kwargs.get("index")
+        if index is None:
+            # поиск по point-in-time идёт без индекса в URL
+            return "_pit" if "pit" in (kwargs.get("body") or kwargs) else "_all"
+        return index if isinstance(index, str) else ",".join(index)
+
+
+class CoalescingElasticsearch:
+    """
+    Обёртка над AsyncElasticsearch, объединяющая одновременные одинаковые чтения.
+
+    Запросы get, mget, search, msearch и count с одинаковыми индексом и телом,
+    пришедшие, пока такой же запрос уже выполняется, получают его результат.
+    Скролл-запросы и все прочие методы передаются клиенту без изменений.
+
+    Общий вызов выполняется в контексте первого запроса и с его сроком (см.
+    db.resilience): присоединившиеся получают его результат, в том числе
+    DeadlineExceededError, если у первого бюджет кончился раньше, чем у них.
+    Ждёт общий вызов каждый не дольше собственного срока. Ключ не включает срок
+    намеренно: иначе запросы с разными бюджетами маршрутов не объединялись бы вовсе.
+    """
+
+    def __init__(self, client: AsyncElasticsearch, single_flight: SingleFlight):
+        self._client = client
+        self.single_flight = single_flight
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def get(self, **kwargs: Any) -> Any:
+        return await self._coalesce("get", kwargs)
+
+    async def mget(self, **kwargs: Any) -> Any:
+        return await self._coalesce("mget", kwargs)
+
+    async def search(self, **kwargs: Any) -> Any:
+        return await self._coalesce("search", kwargs)
+
+    async def msearch(self, **kwargs: Any) -> Any:
+        return await self._coalesce("msearch", kwargs)
+
+    async def count(self, **kwargs: Any) -> Any:
+        return await self._coalesce("count", kwargs)
+
+    async def _coalesce(self, operation: str, kwargs: dict) -> Any:
+        method = getattr(self._client, operation)
+        if "scroll" in kwargs:
+            # у каждого скролла своё состояние на стороне Elasticsearch
+            return await method(**kwargs)
+        key = (operation, orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS, default=str))
+        budget = remaining_budget()
+        try:
+            # отмена ожидания по сроку не отменяет общий вызов (см. SingleFlight.do)
+            return await asyncio.wait_for(self.single_flight.do(key, lambda: method(**kwargs)), budget)
+        except asyncio.TimeoutError as exc:
+            raise DeadlineExceededError(f"elasticsearch {operation} exceeded the deadline") from exc
@@ -0,0 +1,186 @@
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Настройки на время массовой загрузки: без обновлений поиска и без реплик
+BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+class IndexManagementError(Exception):
+    """Версионный индекс нельзя безопасно подключить к алиасу."""
+
+
+class IndexManager:
+    """
+    Версионные индексы за алиасами чтения (blue/green).
+
+    Сервисы обращаются к индексам только по имени алиаса. Перестройка создаёт
+    новый индекс <alias>_<время> с настройками массовой загрузки, заполняет его,
+    возвращает рабочие настройки, сливает сегменты, сверяет число документов
+    с текущим индексом и одним атомарным update_aliases переключает алиас.
+    Живой трафик до переключения читает старый индекс и не замечает перестройку.
+
+    Так перестраиваются только индексы, которыми владеет сервис (жанры, персоны,
+    подсказки фильмов). Индекс фильмов загружает внешний ETL, и его маппинга в
+    сервисе нет: сервис лишь читает его по имени ELASTIC_MOVIES_INDEX, поэтому за
+    этим именем загрузчик может держать алиас и переключать его сам.
+    """
+
+    def __init__(self, es: AsyncElasticsearch):
+        self.es = es
+
+    @staticmethod
+    def _versions_pattern(alias: str) -> re.Pattern:
+        return re.compile(rf"^{re.escape(alias)}_\d{{20}}$")
+
+    async def resolve(self, alias: str) -> List[str]:
+        """
+        Физические индексы за именем.
+
+        Returns:
+            Индексы алиаса; [alias], если это обычный индекс без алиаса; [], если имени нет.
+        """
+        try:
+            return sorted(await self.es.indices.get_alias(name=alias))
+        except NotFoundError:
+            pass
+        if await self.es.indices.exists(index=alias):
+            return [alias]
+        return []
+
+    async def resolve_all(self, aliases: List[str]) -> Dict[str, List[str]]:
+        """Физические индексы за каждым из имён, например для лога при старте."""
+        return {alias: await self.resolve(alias) for alias in aliases}
+
+    async def create_versioned(self, alias: str, body: dict) -> str:
+        """Создаёт новый версионный индекс для алиаса с настройками массовой загрузки."""
+        index = f"{alias}_{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"
+        settings = {**body.get("settings", {}), **BULK_LOAD_SETTINGS}
+        await self.es.indices.create(index=index, settings=settings, mappings=body["mappings"])
+        logger.info("Created index %s for alias %s", index, alias)
+        return index
+
+    async def ensure(self, alias: str, body: dict) -> None:
+        """Создаёт пустой версионный индекс за алиасом, если под этим именем ещё ничего нет."""
+        if await self.resolve(alias):
+            return
+        index = await self.create_versioned(alias, body)
+        await self.finalize(index, body, force_merge=False)
+        await self.swap(alias, index)
+
+    async def finalize(self, index: str, body: dict, force_merge: bool = True) -> None:
+        """
+        Возвращает индексу рабочие настройки после загрузки.
+
+        Сегменты сливаются до добавления реплик, чтобы реплики сразу копировали
+        итоговые сегменты, а не повторяли слияние у себя.
+        """
+        await self.es.indices.refresh(index=index)
+        if force_merge:
+            await self.es.options(request_timeout=config.ELASTIC_FORCEMERGE_TIMEOUT).indices.forcemerge(
+                index=index, max_num_segments=1
+            )
+        await self.es.indices.put_settings(
+            index=index,
+            settings={
+                "refresh_interval": body.get("settings", {}).get("refresh_interval", "1s"),
+                "number_of_replicas": config.ELASTIC_INDEX_REPLICAS,
+            },
+        )
+
+    async def validate(self, index: str, alias: str, min_ratio: float = config.ELASTIC_REINDEX_MIN_DOCS_RATIO) -> int:
+        """
+        Сверяет число документов нового индекса с индексом, который сейчас за алиасом.
+
+        Raises:
+            IndexManagementError: Новый индекс пуст или заметно меньше текущего.
+        """
+        count = (await self.es.count(index=index))["count"]
+        current = (await self.es.count(index=alias))["count"] if await self.resolve(alias) else 0
+        if count == 0 or count < current * min_ratio:
+            raise IndexManagementError(
+                f"Index {index} has {count} documents, {alias} has {current} (min ratio {min_ratio})"
+            )
+        logger.info("Index %s validated: %d documents, %s has %d", index, count, alias, current)
+        return count
+
+    async def swap(self, alias: str, index: str, replace_concrete: bool = False) -> None:
+        """
+        Атомарно переключает алиас на index.
+
+        Args:
+            replace_concrete: Разрешить удалить обычный индекс с именем алиаса
+                (однократный переход со старой схемы без алиасов)
+        """
+        current = await self.resolve(alias)
+        actions = []
+        if current == [alias]:
+            if not replace_concrete:
+                raise IndexManagementError(
+                    f"{alias} is a concrete index, not an alias; rerun with replace_concrete to migrate it"
+                )
+            actions.append({"remove_index": {"index": alias}})
+        else:
+            actions.extend({"remove": {"index": old, "alias": alias}} for old in current)
+        actions.append({"add": {"index": index, "alias": alias}})
+        await self.es.indices.update_aliases(actions=actions)
+        logger.info("Alias %s switched %s -> %s", alias, current, index)
+
+    async def cleanup(self, alias: str, keep: int = config.ELASTIC_REINDEX_KEEP_VERSIONS) -> List[str]:
+        """
+        Удаляет старые версии алиаса, кроме keep последних (для быстрого отката).
+
+        Returns:
+            Удалённые индексы.
+        """
+        live = set(await self.resolve(alias))
+        pattern = self._versions_pattern(alias)
+        indices = await self.es.indices.get(index=f"{alias}_*", expand_wildcards="open,closed")
+        stale = sorted((name for name in indices if pattern.match(name) and name not in live), reverse=True)
+        deleted = stale[keep:]
+        if deleted:
+            await self.es.indices.delete(index=",".join(deleted))
+            logger.info("Deleted old versions of %s: %s", alias, deleted)
+        return deleted
+
+    async def rebuild(
+        self,
+        alias: str,
+        body: dict,
+        load: Callable[[str], Awaitable[None]],
+        replace_concrete: bool = False,
+    ) -> str:
+        """
+        Полная перестройка индекса за алиасом.
+
+        Args:
+            alias: Алиас чтения
+            body: Настройки и маппинги индекса
+            load: Заполняет индекс с переданным именем
+            replace_concrete: См. swap
+
+        Returns:
+            Имя нового индекса.
+        """
+        if not replace_concrete and await self.resolve(alias) == [alias]:
+            # проверяем до загрузки, а не после неё в swap
+            raise IndexManagementError(f"{alias} is a concrete index, not an alias; rerun with replace_concrete")
+        index = await self.create_versioned(alias, body)
+        try:
+            await load(index)
+            await self.finalize(index, body)
+            await self.validate(index, alias)
+        except BaseException:
+            logger.warning("Rebuild of %s failed, dropping %s", alias, index)
+            await self.es.indices.delete(index=index, ignore_unavailable=True)
+            raise
+        await self.swap(alias, index, replace_concrete)
+        await self.cleanup(alias)
+        return index
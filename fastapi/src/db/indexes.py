@@ -0,0 +1,95 @@
+"""Настройки и маппинги индексов Elasticsearch, которыми владеет этот сервис."""
+from typing import List, Optional
+
+from core.config import config
+
+# Алиасы чтения: сервисы не знают имён физических индексов (см. db.index_manager)
+# Индекс фильмов загружается внешним ETL: сервис читает его, но не перестраивает
+MOVIES_INDEX = config.ELASTIC_MOVIES_INDEX
+GENRES_INDEX = config.ELASTIC_GENRES_INDEX
+PERSONS_INDEX = config.ELASTIC_PERSONS_INDEX
+FILMS_SUGGEST_INDEX = config.ELASTIC_FILMS_SUGGEST_INDEX
+
+# Nested-поля состава в индексе фильмов
+PERSON_ROLE_FIELDS = ("actors", "writers", "directors")
+
+# Поле подсказок для completion suggester: префиксы ищутся по FST в памяти узла,
+# без обхода инвертированного индекса. standard, в отличие от анализатора
+# по умолчанию (simple), не выбрасывает цифры.
+SUGGEST_FIELD = "suggest"
+SUGGEST_FIELD_MAPPING = {"type": "completion", "analyzer": "standard"}
+# Сколько слов названия могут начинать подсказку ("wars" находит "Star Wars")
+SUGGEST_MAX_INPUTS = 5
+
+
+def suggest_field(text: str, weight: Optional[int] = None) -> dict:
+    """
+    Значение поля подсказок: текст целиком и его окончания с каждого следующего слова,
+    поскольку completion suggester находит только совпадения с начала входа.
+    """
+    words = text.split()
+    inputs: List[str] = [" ".join(words[position:]) for position in range(min(len(words), SUGGEST_MAX_INPUTS))]
+    value = {"input": inputs or [text]}
+    if weight is not None:
+        value["weight"] = weight
+    return value
+
+
+GENRES_INDEX_BODY = {
+    "settings": {
+        "refresh_interval": "1s",
+    },
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "name": {
+                "type": "text",
+                "fields": {"raw": {"type": "keyword"}},
+            },
+            SUGGEST_FIELD: SUGGEST_FIELD_MAPPING,
+        },
+    },
+}
+
+# Денормализованный индекс персон: у каждой персоны хранятся id её фильмов с ролями,
+# поэтому фильмография персоны — это один GET персоны и один mget фильмов.
+PERSONS_INDEX_BODY = {
+    "settings": {
+        "refresh_interval": "1s",
+    },
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "full_name": {
+                "type": "text",
+                "fields": {"raw": {"type": "keyword"}},
+            },
+            SUGGEST_FIELD: SUGGEST_FIELD_MAPPING,
+            "films": {
+                "type": "nested",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "roles": {"type": "keyword"},
+                },
+            },
+        },
+    },
+}
+
+# Подсказки по названиям фильмов. Индексом фильмов сервис не владеет, поэтому
+# подсказки строятся ETL в отдельный производный индекс; вес — рейтинг фильма.
+FILMS_SUGGEST_INDEX_BODY = {
+    "settings": {
+        "refresh_interval": "1s",
+    },
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "title": {"type": "keyword", "index": False},
+            SUGGEST_FIELD: SUGGEST_FIELD_MAPPING,
+        },
+    },
+}
@@ -1,18 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional, Set
+
 from fastapi import Request
-from redis.asyncio import Redis, ConnectionPool
+from redis.asyncio import BlockingConnectionPool, ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.connection import AbstractConnection
+from redis.exceptions import RedisError
 
 from core.config import config
+from core.metrics import (CONNECTION_POOL_IN_USE, CONNECTION_POOL_MAX, CONNECTION_POOL_WAIT,
+                          CONNECTION_POOL_WAITING, REDIS_COMMAND_DURATION)
+
+logger = logging.getLogger(__name__)
 
 
 async def init_redis() -> Redis:
-    """Создаёт подключение к Redis с логином и паролем."""
+    """
+    Создаёт подключение к Redis с логином и паролем.
+
+    Пул блокирующий: при нехватке соединений запрос ждёт освобождения
+    до REDIS_POOL_TIMEOUT, а не получает ошибку сразу.
+    """
     
+    pool_class = InstrumentedConnectionPool if config.METRICS_ENABLED else BlockingConnectionPool
+    pool = pool_class.from_url(f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}/{config.REDIS_DB}",
+                               max_connections=config.REDIS_MAX_CONNECTIONS,
+                               timeout=config.REDIS_POOL_TIMEOUT,
+                               password=config.REDIS_PASSWORD or None,)
+    redis_class = InstrumentedRedis if config.METRICS_ENABLED else Redis
+    return redis_class(connection_pool=pool)
+
+
+async def init_redis_subscriber() -> Redis:
+    """
+    Создаёт отдельное подключение к Redis для долгоживущих подписчиков: pub/sub
+    и блокирующего чтения потоков событий изменений.
+
+    Каждый из них держит соединение постоянно, поэтому у них свой пул без
+    ограничения размера: соединений в нём столько, сколько подписчиков, и они
+    не отнимают места у запросов API в пуле init_redis.
+    """
+
     pool = ConnectionPool.from_url(f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}/{config.REDIS_DB}",
-                                   max_connections=10,
                                    password=config.REDIS_PASSWORD or None,)
     return Redis(connection_pool=pool)
 
 
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Пул соединений Redis, отдающий метрики занятости и ожидания соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._leased: Set[int] = set()
+        CONNECTION_POOL_MAX.labels("redis").set(self.max_connections)
+
+    async def get_connection(self, command_name, *keys, **options) -> AbstractConnection:
+        CONNECTION_POOL_WAITING.labels("redis").inc()
+        start = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        finally:
+            CONNECTION_POOL_WAITING.labels("redis").dec()
+            CONNECTION_POOL_WAIT.labels("redis").observe(time.perf_counter() - start)
+        self._leased.add(id(connection))
+        CONNECTION_POOL_IN_USE.labels("redis").inc()
+        return connection
+
+    async def release(self, connection: AbstractConnection) -> None:
+        await super().release(connection)
+        # соединение, не прошедшее проверку в get_connection, возвращается, не будучи выданным
+        if id(connection) in self._leased:
+            self._leased.discard(id(connection))
+            CONNECTION_POOL_IN_USE.labels("redis").dec()
+
+
+class InstrumentedPipeline(Pipeline):
+    """Пайплайн Redis, замеряющий время выполнения всей пачки команд."""
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(Redis):
+    """Клиент Redis, замеряющий время каждой команды (включая ожидание соединения из пула)."""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+async def warm_redis(redis: Redis, connections: int = config.REDIS_MAX_CONNECTIONS) -> None:
+    """Открывает соединения пула заранее параллельными PING."""
+    await asyncio.gather(*(redis.ping() for _ in range(connections)))
+
+
 async def get_redis(request: Request) -> Redis:
     """
     Получает подключение к Redis из состояния приложения.
@@ -24,4 +117,42 @@ async def get_redis(request: Request) -> Redis:
         Redis: Подключение к Redis.
     """
     
-    return request.app.state.redis
\ No newline at end of file
+    return request.app.state.redis
+
+
+async def listen_channel(
+    redis: Redis,
+    channel: str,
+    handler: Callable[[bytes], None],
+    on_subscribe: Optional[Callable[[], None]] = None,
+    reconnect_delay: float = 1.0,
+) -> None:
+    """
+    Слушает канал Redis pub/sub и передаёт данные сообщений обработчику.
+
+    При обрыве соединения переподписывается. Сообщения, опубликованные во время
+    обрыва, теряются, поэтому после каждой (пере)подписки вызывается on_subscribe,
+    чтобы подписчик мог сбросить своё локальное состояние.
+
+    Args:
+        redis (Redis): Подключение к Redis.
+        channel (str): Имя канала.
+        handler: Обработчик данных сообщения.
+        on_subscribe: Вызывается после успешной подписки.
+        reconnect_delay (float): Пауза перед переподключением в секундах.
+    """
+
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            if on_subscribe is not None:
+                on_subscribe()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    handler(message["data"])
+        except RedisError as exc:
+            logger.warning("Pub/sub listener for %s failed: %s", channel, exc)
+            await asyncio.sleep(reconnect_delay)
+        finally:
+            await pubsub.aclose()
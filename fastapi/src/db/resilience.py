@@ -0,0 +1,283 @@
+"""
+Устойчивость чтений из Elasticsearch: бюджет времени запроса API, автоматический
+выключатель (circuit breaker) и хеджированные запросы, а также отметки
+о деградации ответа для заголовка X-Degraded.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional, Set, TypeVar
+
+from elastic_transport import ApiError, TransportError
+
+from core.metrics import CIRCUIT_BREAKER_STATE, ELASTIC_HEDGED_REQUESTS
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Абсолютный срок (time.monotonic) текущего запроса API
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# Причины деградации ответа текущего запроса API
+_degradations: ContextVar[Optional[Set[str]]] = ContextVar("response_degradations", default=None)
+
+
+class UnavailableError(Exception):
+    """Хранилище недоступно или не уложилось в бюджет времени запроса."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UnavailableError):
+    """Выключатель разомкнут: запросы к хранилищу не отправляются."""
+
+
+class DeadlineExceededError(UnavailableError):
+    """Бюджет времени запроса API исчерпан."""
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """
+    Говорит ли ошибка о недоступности Elasticsearch, а не о проблеме самого запроса:
+    такие ошибки размыкают выключатель и позволяют отдать устаревший кеш.
+    """
+    if isinstance(exc, (UnavailableError, TransportError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, ApiError) and (exc.meta.status >= 500 or exc.meta.status == 429)
+
+
+def set_deadline(budget: float) -> None:
+    """Задаёт бюджет времени текущего запроса, отсчитывая его от текущего момента."""
+    _deadline.set(time.monotonic() + budget)
+
+
+def remaining_budget() -> Optional[float]:
+    """Сколько секунд осталось до срока текущего запроса; None — срок не задан."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def track_degradations() -> Set[str]:
+    """Начинает учёт деградаций для текущего запроса и возвращает множество причин."""
+    reasons: Set[str] = set()
+    _degradations.set(reasons)
+    return reasons
+
+
+def mark_degraded(reason: str) -> None:
+    """Отмечает, что ответ текущего запроса деградирован (например, отдан устаревший кеш)."""
+    reasons = _degradations.get()
+    if reasons is not None:
+        reasons.add(reason)
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель по числу подряд идущих отказов: ошибок транспорта,
+    ответов 5xx и 429. Истёкший срок запроса API отказом не считается — это бюджет
+    вызывающего, а не состояние Elasticsearch.
+
+    После failure_threshold отказов размыкается на recovery_timeout секунд:
+    запросы сразу получают CircuitOpenError и не занимают соединения и воркеры
+    ожиданием таймаутов. Затем пропускает пробные запросы (half-open): успех
+    замыкает выключатель, отказ снова размыкает. Состояние своё у каждого процесса.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        """
+        Args:
+            name: Имя для метрик и логов
+            failure_threshold: Отказов подряд до размыкания
+            recovery_timeout: Сколько секунд выключатель разомкнут
+            half_open_max_calls: Сколько пробных запросов одновременно пропускается
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trials = 0
+        CIRCUIT_BREAKER_STATE.labels(name).set(self.state)
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет fn, если выключатель его пропускает, и учитывает исход.
+
+        Raises:
+            CircuitOpenError: Выключатель разомкнут.
+        """
+        trial = self._before_call()
+        try:
+            result = await fn()
+        except (asyncio.CancelledError, DeadlineExceededError):
+            # запрос отменил вызывающий или кончился его собственный бюджет (у подсказок
+            # он короче секунды): об Elasticsearch это ничего не говорит
+            if trial:
+                self._trials -= 1
+            raise
+        except Exception as exc:
+            if is_unavailable(exc):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        self._on_success()
+        return result
+
+    def _before_call(self) -> bool:
+        if self.state == self.OPEN:
+            retry_after = self.opened_at + self.recovery_timeout - time.monotonic()
+            if retry_after > 0:
+                raise CircuitOpenError(f"{self.name} circuit is open", retry_after=retry_after)
+            self._set_state(self.HALF_OPEN)
+            self._trials = 0
+        if self.state == self.HALF_OPEN:
+            if self._trials >= self.half_open_max_calls:
+                raise CircuitOpenError(f"{self.name} circuit is half-open", retry_after=1.0)
+            self._trials += 1
+            return True
+        return False
+
+    def _on_success(self) -> None:
+        self.failures = 0
+        if self.state != self.CLOSED:
+            logger.info("Circuit %s closed", self.name)
+            self._set_state(self.CLOSED)
+
+    def _on_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit %s opened after %d failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(state)
+
+
+class ResilientElasticsearch:
+    """
+    Обёртка над AsyncElasticsearch для чтений get, mget, search, msearch и count.
+
+    Каждое чтение ограничено оставшимся бюджетом запроса API (см. set_deadline)
+    и проходит через CircuitBreaker. С hedge_delay чтение, не получившее ответа
+    за это время, дублируется с другим preference — так повтор обычно уходит
+    на другую копию шардов, и побеждает первый ответ. Прочие методы передаются
+    клиенту без изменений.
+
+    latency — экспоненциальное скользящее среднее времени чтений, дошедших
+    до Elasticsearch, для сигнала перегрузки (см. core.admission). В него попадают
+    только чтения запросов API, то есть со сроком: фоновые пересчёты индексов
+    и прогрев медленнее по природе и не должны урезать лимиты живого трафика.
+    Без новых замеров значение затухает вдвое за LATENCY_HALF_LIFE секунд:
+    пока ответы идут из кеша, прошедший всплеск не продолжает снижать лимиты.
+    """
+
+    # Вес нового замера в скользящем среднем
+    LATENCY_SMOOTHING = 0.1
+    # За сколько секунд без замеров среднее уменьшается вдвое
+    LATENCY_HALF_LIFE = 5.0
+
+    def __init__(self, client: Any, breaker: CircuitBreaker, hedge_delay: Optional[float] = None):
+        self._client = client
+        self.breaker = breaker
+        self.hedge_delay = hedge_delay
+        self._latency: Optional[float] = None
+        self._latency_at = 0.0
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Среднее время чтения с учётом затухания; None — замеров ещё не было."""
+        if self._latency is None:
+            return None
+        idle = time.monotonic() - self._latency_at
+        return self._latency * 0.5 ** (idle / self.LATENCY_HALF_LIFE)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def get(self, **kwargs: Any) -> Any:
+        return await self._read("get", kwargs)
+
+    async def mget(self, **kwargs: Any) -> Any:
+        return await self._read("mget", kwargs)
+
+    async def search(self, **kwargs: Any) -> Any:
+        return await self._read("search", kwargs)
+
+    async def msearch(self, **kwargs: Any) -> Any:
+        return await self._read("msearch", kwargs)
+
+    async def count(self, **kwargs: Any) -> Any:
+        return await self._read("count", kwargs)
+
+    async def _read(self, operation: str, kwargs: dict) -> Any:
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            raise DeadlineExceededError(f"no time left for elasticsearch {operation}")
+
+        async def call() -> Any:
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(self._hedged(operation, kwargs), budget)
+            except asyncio.TimeoutError as exc:
+                raise DeadlineExceededError(f"elasticsearch {operation} exceeded the deadline") from exc
+            finally:
+                if budget is not None:
+                    self._observe_latency(time.perf_counter() - start)
+
+        return await self.breaker.call(call)
+
+    def _observe_latency(self, elapsed: float) -> None:
+        latency = self.latency
+        self._latency = elapsed if latency is None else latency + self.LATENCY_SMOOTHING * (elapsed - latency)
+        self._latency_at = time.monotonic()
+
+    async def _hedged(self, operation: str, kwargs: dict) -> Any:
+        method = getattr(self._client, operation)
+        if self.hedge_delay is None or not self._can_hedge(operation, kwargs):
+            return await method(**kwargs)
+
+        primary = asyncio.ensure_future(method(**kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if done:
+                return primary.result()
+            hedge = asyncio.ensure_future(method(**kwargs, preference=f"hedge-{uuid.uuid4().hex}"))
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        ELASTIC_HEDGED_REQUESTS.labels("hedge" if task is hedge else "primary").inc()
+                        return task.result()
+            # оба запроса завершились ошибкой: отдаём ошибку основного
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _can_hedge(operation: str, kwargs: dict) -> bool:
+        # msearch задаёт preference в заголовках отдельных запросов,
+        # а у поиска по point-in-time и скролла копии шардов уже выбраны
+        body = kwargs.get("body") or {}
+        return (
+            operation != "msearch"
+            and "preference" not in kwargs
+            and "scroll" not in kwargs
+            and "pit" not in kwargs
+            and "pit" not in body
+        )
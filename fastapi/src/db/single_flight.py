@@ -0,0 +1,82 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class FlightStats:
+    """Счётчики одного ключа: сколько было вызовов и сколько из них реально выполнено."""
+    calls: int = 0
+    executions: int = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self.calls - self.executions
+
+    @property
+    def coalescing_ratio(self) -> float:
+        return self.coalesced / self.calls if self.calls else 0.0
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вызовов (single-flight).
+
+    Пока вызов с некоторым ключом выполняется, все остальные вызовы с тем же ключом
+    ждут его результат (или исключение), а не запускают свой. Результат не кешируется:
+    как только вызов завершился, следующий вызов снова выполняется.
+    """
+
+    def __init__(self, max_tracked_keys: int = 1024):
+        """
+        Args:
+            max_tracked_keys: Сколько последних ключей хранить в поключевой статистике
+        """
+        self.max_tracked_keys = max_tracked_keys
+        self.total = FlightStats()
+        self._key_stats: "OrderedDict[Hashable, FlightStats]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет fn либо присоединяется к уже выполняющемуся вызову с тем же ключом.
+
+        Args:
+            key: Ключ идентичности вызова
+            fn: Фабрика корутины
+        """
+        stats = self._stats_for(key)
+        stats.calls += 1
+        self.total.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            stats.executions += 1
+            self.total.executions += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+        # shield: отмена одного из ожидающих не должна отменять общий вызов
+        return await asyncio.shield(future)
+
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # исключение считается полученным, даже если все ожидающие уже отменены
+        if not future.cancelled():
+            future.exception()
+
+    def top_keys(self, limit: int = 20) -> List[Tuple[Hashable, FlightStats]]:
+        """Ключи с наибольшим числом объединённых вызовов."""
+        return sorted(self._key_stats.items(), key=lambda item: item[1].coalesced, reverse=True)[:limit]
+
+    def _stats_for(self, key: Hashable) -> FlightStats:
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = FlightStats()
+            if len(self._key_stats) > self.max_tracked_keys:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        return stats
@@ -0,0 +1,95 @@
+import contextlib
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from core.config import config
+from db.indexes import MOVIES_INDEX
+
+logger = logging.getLogger(__name__)
+
+
+# Поле с уникальным значением, которым упорядочиваются фильмы с одинаковым modified
+TIEBREAKER_FIELD = "id"
+
+
+@dataclass
+class SourceBatch:
+    """Пачка документов источника и водяной знак её последнего документа."""
+    seq: int
+    hits: List[dict]
+    watermark: Optional[str]
+
+
+def _resume_point(since: str) -> Optional[list]:
+    """
+    Значения сортировки (modified, id), строго после которых продолжается чтение.
+    Водяной знак прежнего формата — одно значение modified — точки не даёт:
+    такой запуск один раз перечитает фильмы с этим modified.
+    """
+    if not since.startswith("["):
+        return None
+    return orjson.loads(since)
+
+
+async def extract_films(
+    es: AsyncElasticsearch,
+    source_fields: List[str],
+    since: Optional[str],
+    batch_size: int,
+) -> AsyncIterator[SourceBatch]:
+    """
+    Потоково читает фильмы, изменённые после водяного знака, пачками по batch_size.
+
+    Фильмы читаются в порядке (modified, id) через point-in-time и search_after.
+    Водяной знак пачки — значения сортировки её последнего фильма в JSON: он
+    монотонен, и следующий запуск начинает строго после него, не перечитывая
+    последнюю пачку. В памяти одновременно находится одна пачка.
+
+    Args:
+        es: Клиент Elasticsearch
+        source_fields: Поля документа фильма, нужные пайплайну
+        since: Водяной знак предыдущего запуска; None — читать всё
+        batch_size: Размер пачки
+    """
+    modified = config.ETL_MODIFIED_FIELD
+    search_after = _resume_point(since) if since else None
+    if since:
+        query = {"range": {modified: {"gte": search_after[0] if search_after is not None else since}}}
+    else:
+        query = {"match_all": {}}
+    pit = await es.open_point_in_time(index=MOVIES_INDEX, keep_alive="5m")
+    pit_id = pit["id"]
+    try:
+        seq = 0
+        while True:
+            body = {
+                "query": query,
+                "_source": [*source_fields, modified],
+                "sort": [
+                    {modified: {"order": "asc", "missing": "_first", "unmapped_type": "date"}},
+                    {TIEBREAKER_FIELD: {"order": "asc"}},
+                ],
+                "size": batch_size,
+                "track_total_hits": False,
+                "pit": {"id": pit_id, "keep_alive": "5m"},
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            res = await es.search(body=body)
+            pit_id = res.get("pit_id", pit_id)
+            hits = res["hits"]["hits"]
+            if not hits:
+                return
+            last = hits[-1]
+            # у фильма без modified точки продолжения нет: такие читаются первыми
+            watermark = orjson.dumps(last["sort"]).decode() if last["_source"].get(modified) is not None else None
+            yield SourceBatch(seq=seq, hits=hits, watermark=watermark)
+            search_after = hits[-1]["sort"]
+            seq += 1
+    finally:
+        with contextlib.suppress(NotFoundError):
+            await es.close_point_in_time(id=pit_id)
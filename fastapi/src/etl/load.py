@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadJob:
+    """Bulk-действия одной пачки источника и всё, что нужно сделать после её записи."""
+    seq: int
+    actions: List[dict]
+    watermark: Optional[str]
+    affected_keys: List[str] = field(default_factory=list)
+    errors: int = 0
+
+
+class BulkLoader:
+    """
+    Загрузка пачек в Elasticsearch через async_streaming_bulk с ограниченной параллельностью.
+
+    Одновременно пишется не более concurrency пачек, и не больше стольких же ждут
+    в очереди, поэтому потребление памяти не зависит от объёма данных. Пачки могут
+    завершаться не по порядку: on_loaded вызывается сразу после записи пачки,
+    а on_checkpoint — только когда записаны все пачки до неё включительно, чтобы
+    сохранённый водяной знак никогда не обгонял реально загруженные данные.
+    """
+
+    def __init__(
+        self,
+        es: AsyncElasticsearch,
+        index: str,
+        concurrency: int = config.ETL_BULK_CONCURRENCY,
+        chunk_size: int = config.ETL_BULK_CHUNK_SIZE,
+        max_chunk_bytes: int = config.ETL_BULK_MAX_CHUNK_BYTES,
+        refresh: str = config.ETL_BULK_REFRESH,
+    ):
+        self.es = es
+        self.index = index
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.refresh = refresh
+        self.loaded = 0
+        self.failed = 0
+
+    async def run(
+        self,
+        jobs: AsyncIterator[LoadJob],
+        on_loaded: Callable[[LoadJob], Awaitable[None]],
+        on_checkpoint: Callable[[LoadJob], Awaitable[None]],
+    ) -> None:
+        """
+        Загружает все пачки из потока jobs.
+
+        Args:
+            jobs: Асинхронный поток пачек с последовательными номерами seq, начиная с 0
+            on_loaded: Вызывается после записи пачки (например, для инвалидации кеша)
+            on_checkpoint: Вызывается по порядку seq для непрерывного префикса записанных пачек
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        done: Dict[int, LoadJob] = {}
+        next_seq = 0
+        checkpoint_lock = asyncio.Lock()
+
+        async def checkpoint(job: LoadJob) -> None:
+            nonlocal next_seq
+            async with checkpoint_lock:
+                done[job.seq] = job
+                while next_seq in done:
+                    await on_checkpoint(done.pop(next_seq))
+                    next_seq += 1
+
+        failures: List[BaseException] = []
+
+        async def worker() -> None:
+            while True:
+                job = await queue.get()
+                try:
+                    # после первой ошибки оставшиеся пачки только вычитываются из очереди
+                    if not failures:
+                        await self._load(job)
+                        await on_loaded(job)
+                        if job.errors:
+                            # водяной знак остановится перед этой пачкой, и следующий запуск её повторит
+                            logger.warning("Batch %d has %d failed items, checkpoint is held", job.seq, job.errors)
+                        else:
+                            await checkpoint(job)
+                except Exception as exc:
+                    failures.append(exc)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for job in jobs:
+                if failures:
+                    break
+                await queue.put(job)
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        if failures:
+            raise failures[0]
+
+    async def _load(self, job: LoadJob) -> None:
+        async for ok, item in async_streaming_bulk(
+            self.es,
+            job.actions,
+            chunk_size=self.chunk_size,
+            max_chunk_bytes=self.max_chunk_bytes,
+            max_retries=config.ETL_BULK_MAX_RETRIES,
+            raise_on_error=False,
+            index=self.index,
+            refresh=self.refresh,
+        ):
+            if ok:
+                self.loaded += 1
+            else:
+                job.errors += 1
+                self.failed += 1
+                logger.warning("Bulk item failed: %s", item)
@@ -0,0 +1,62 @@
+"""
+Запуск ETL производных индексов из каталога src:
+
+    python -m etl.main genres
+    python -m etl.main persons --full
+    python -m etl.main films_suggest --full
+    python -m etl.main film_events
+
+Полный запуск (--full) строит новый версионный индекс и атомарно переключает
+на него алиас; --replace-concrete нужен один раз, если под именем алиаса ещё
+лежит обычный индекс. После изменения маппинга индекса (например, добавления
+поля подсказок) его нужно перестроить с --full.
+
+Индекс фильмов здесь не перестраивается: его загружает внешний ETL, а сервис
+только читает его по имени (см. db.index_manager.IndexManager).
+
+film_events индекс не строит, а публикует изменения фильмов в поток
+инвалидации кеша API; его стоит запускать после каждой загрузки фильмов.
+"""
+import argparse
+import asyncio
+import logging
+
+from core.logger import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+from db.elasticsearch import init_elastic
+from db.redis import init_redis
+from etl.pipelines import FilmEventsPublisher, FilmsSuggestPipeline, GenresPipeline, PersonsPipeline
+from services.cache_service import RedisCacheService
+
+PIPELINES = {
+    GenresPipeline.name: GenresPipeline,
+    PersonsPipeline.name: PersonsPipeline,
+    FilmsSuggestPipeline.name: FilmsSuggestPipeline,
+    FilmEventsPublisher.name: FilmEventsPublisher,
+}
+
+
+async def main(pipeline_names: list, full: bool, replace_concrete: bool) -> None:
+    redis = await init_redis()
+    es = await init_elastic()
+    cache = RedisCacheService(redis)
+    try:
+        for name in pipeline_names:
+            await PIPELINES[name](es, redis, cache).run(full=full, replace_concrete=replace_concrete)
+    finally:
+        await redis.close()
+        await es.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL индексов, производных от индекса фильмов")
+    parser.add_argument("pipelines", nargs="+", choices=sorted(PIPELINES))
+    parser.add_argument("--full", action="store_true", help="перестроить индекс целиком в новой версии")
+    parser.add_argument(
+        "--replace-concrete", action="store_true", help="заменить обычный индекс с именем алиаса при --full"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.pipelines, args.full, args.replace_concrete))
@@ -0,0 +1,298 @@
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+
+from core.config import config
+from db.index_manager import IndexManager
+from db.indexes import (FILMS_SUGGEST_INDEX, FILMS_SUGGEST_INDEX_BODY, GENRES_INDEX, GENRES_INDEX_BODY,
+                        PERSONS_INDEX, PERSONS_INDEX_BODY, SUGGEST_FIELD, suggest_field)
+from etl.extract import SourceBatch, extract_films
+from etl.load import BulkLoader, LoadJob
+from etl.state import ETLState
+from services.cache_invalidation import ChangeEvent, publish_changes
+from services.cache_service import RedisCacheService, build_cache_key
+from services.genre_registry import GenreRegistry
+
+logger = logging.getLogger(__name__)
+
+# Пространство имён для детерминированных id жанров, известных только по названию
+GENRE_ID_NAMESPACE = uuid.UUID("6f1c3c52-8d1e-4f0c-9a55-0d6b8f8a3e21")
+
+PERSON_ROLES = {"actors": "actor", "writers": "writer", "directors": "director"}
+
+# Заменяет запись о фильме у персоны, не трогая её остальные фильмы
+UPSERT_PERSON_FILM_SCRIPT = """
+ctx._source.full_name = params.full_name;
+ctx._source.suggest = params.suggest;
+ctx._source.films.removeIf(f -> f.id == params.film.id);
+ctx._source.films.add(params.film);
+"""
+
+
+class FilmsDerivedPipeline(ABC):
+    """
+    Пайплайн индекса, производного от индекса фильмов: extract -> transform -> load.
+
+    Стадии — асинхронные генераторы, поэтому в памяти находятся только пачки,
+    которые сейчас читаются или пишутся. После записи каждой пачки инвалидируются
+    затронутые ключи кеша API, а водяной знак сохраняется по непрерывному префиксу
+    записанных пачек, так что повторный запуск переносит только изменённые фильмы.
+
+    Полный запуск пишет в новый версионный индекс и переключает на него алиас
+    (см. IndexManager): до переключения API читает прежний индекс, а кеш
+    и водяной знак обновляются только после него.
+    """
+
+    name: str
+    index: str
+    index_body: dict
+    source_fields: List[str]
+    # Пространства имён кеша API, которые целиком устаревают после загрузки
+    invalidated_namespaces: Tuple[str, ...] = ()
+    # Все пространства имён кеша API, построенные на этом индексе
+    cache_namespaces: Tuple[str, ...] = ()
+
+    def __init__(self, es: AsyncElasticsearch, redis: Redis, cache: RedisCacheService):
+        self.es = es
+        self.redis = redis
+        self.cache = cache
+        self.state = ETLState(redis, self.name)
+        self.indexes = IndexManager(es)
+        self._full = False
+        self._watermark: Optional[str] = None
+
+    @abstractmethod
+    def transform(self, hits: List[dict]) -> Tuple[List[dict], List[str]]:
+        """
+        Превращает пачку фильмов в bulk-действия.
+
+        Returns:
+            Bulk-действия и ключи кеша API, которые они делают устаревшими.
+        """
+        raise NotImplementedError
+
+    async def run(self, full: bool = False, replace_concrete: bool = False) -> None:
+        """
+        Запускает пайплайн.
+
+        Args:
+            full: Перестроить индекс целиком, игнорируя сохранённый водяной знак
+            replace_concrete: При полном запуске заменить обычный индекс с именем алиаса
+        """
+        self._full = full
+        if full:
+            loaded = await self._rebuild(replace_concrete)
+            namespaces = self.cache_namespaces
+        else:
+            await self.indexes.ensure(self.index, self.index_body)
+            loaded = await self._load(self.index, await self.state.get_watermark(), config.ETL_BULK_REFRESH)
+            namespaces = self.invalidated_namespaces
+
+        if loaded:
+            for namespace in namespaces:
+                await self.cache.invalidate_namespace(namespace)
+            await self.after_run()
+
+    async def _rebuild(self, replace_concrete: bool) -> int:
+        loaded = 0
+
+        async def load(index: str) -> None:
+            nonlocal loaded
+            # при refresh_interval -1 ожидание обновления (wait_for) не завершилось бы
+            loaded = await self._load(index, None, "false")
+
+        await self.indexes.rebuild(self.index, self.index_body, load, replace_concrete)
+        if self._watermark is not None:
+            await self.state.set_watermark(self._watermark)
+        else:
+            await self.state.reset()
+        return loaded
+
+    async def _load(self, index: str, since: Optional[str], refresh: str) -> int:
+        logger.info("ETL %s started: index=%s, since=%s", self.name, index, since)
+        loader = BulkLoader(self.es, index, refresh=refresh)
+        batches = extract_films(self.es, self.source_fields, since, config.ETL_EXTRACT_BATCH_SIZE)
+        await loader.run(self._transform_stage(batches), self._on_loaded, self._on_checkpoint)
+        logger.info("ETL %s finished: %d documents loaded, %d failed", self.name, loader.loaded, loader.failed)
+        return loader.loaded
+
+    async def after_run(self) -> None:
+        """Действия после загрузки, если что-то изменилось."""
+
+    async def _transform_stage(self, batches: AsyncIterator[SourceBatch]) -> AsyncIterator[LoadJob]:
+        async for batch in batches:
+            actions, affected_keys = self.transform(batch.hits)
+            yield LoadJob(seq=batch.seq, actions=actions, watermark=batch.watermark, affected_keys=affected_keys)
+
+    async def _on_loaded(self, job: LoadJob) -> None:
+        if not self._full:
+            await self.cache.invalidate(*dict.fromkeys(job.affected_keys))
+
+    async def _on_checkpoint(self, job: LoadJob) -> None:
+        if job.watermark is None:
+            return
+        if self._full:
+            # сохраняется только после переключения алиаса на новый индекс
+            self._watermark = job.watermark
+        else:
+            await self.state.set_watermark(job.watermark)
+
+
+class GenresPipeline(FilmsDerivedPipeline):
+    """Индекс жанров из всех жанров, встречающихся в фильмах."""
+
+    name = "genres"
+    index = GENRES_INDEX
+    index_body = GENRES_INDEX_BODY
+    source_fields = ["genres"]
+    invalidated_namespaces = ("genres:list", "genres:search")
+    cache_namespaces = ("genre", "genres:list", "genres:search")
+
+    def __init__(self, es: AsyncElasticsearch, redis: Redis, cache: RedisCacheService):
+        super().__init__(es, redis, cache)
+        # жанров мало, поэтому уже записанные за запуск можно помнить целиком
+        self._seen: Set[str] = set()
+
+    def transform(self, hits: List[dict]) -> Tuple[List[dict], List[str]]:
+        actions = []
+        affected_keys = []
+        for hit in hits:
+            for genre in hit["_source"].get("genres") or []:
+                genre_id, name = self._genre_identity(genre)
+                if genre_id in self._seen:
+                    continue
+                self._seen.add(genre_id)
+                actions.append({
+                    "_op_type": "index",
+                    "_id": genre_id,
+                    "_source": {"id": genre_id, "name": name, SUGGEST_FIELD: suggest_field(name)},
+                })
+                affected_keys.append(build_cache_key("genre", genre_id=genre_id))
+        return actions, affected_keys
+
+    @staticmethod
+    def _genre_identity(genre) -> Tuple[str, str]:
+        """Id и название жанра; для жанров, заданных только названием, id выводится из него."""
+        if isinstance(genre, dict):
+            return genre["id"], genre["name"]
+        return str(uuid.uuid5(GENRE_ID_NAMESPACE, genre.lower())), genre
+
+    async def after_run(self) -> None:
+        await GenreRegistry.notify_changed(self.redis)
+
+
+class PersonsPipeline(FilmsDerivedPipeline):
+    """
+    Денормализованный индекс персон с их фильмами и ролями.
+
+    Каждая пара (персона, фильм) записывается скриптовым upsert'ом, который
+    заменяет запись только об этом фильме. Группировать фильмы по персонам в памяти
+    не нужно, поэтому полная перезагрузка идёт в ограниченной памяти при любом
+    размере каталога. Удаление персоны из состава фильма так не отслеживается:
+    его исправляет полная перестройка индекса.
+    """
+
+    name = "persons"
+    index = PERSONS_INDEX
+    index_body = PERSONS_INDEX_BODY
+    source_fields = list(PERSON_ROLES)
+    invalidated_namespaces = ("persons:search",)
+    cache_namespaces = ("person", "person:films", "persons:search")
+
+    def transform(self, hits: List[dict]) -> Tuple[List[dict], List[str]]:
+        actions = []
+        affected_keys = []
+        for hit in hits:
+            film_id = hit["_id"]
+            persons: Dict[str, Tuple[str, List[str]]] = {}
+            for field, role in PERSON_ROLES.items():
+                for person in hit["_source"].get(field) or []:
+                    _, roles = persons.setdefault(person["id"], (person["name"], []))
+                    roles.append(role)
+            for person_id, (full_name, roles) in persons.items():
+                film = {"id": film_id, "roles": roles}
+                suggest = suggest_field(full_name)
+                actions.append({
+                    "_op_type": "update",
+                    "_id": person_id,
+                    "retry_on_conflict": 5,
+                    "script": {
+                        "source": UPSERT_PERSON_FILM_SCRIPT,
+                        "lang": "painless",
+                        "params": {"film": film, "full_name": full_name, "suggest": suggest},
+                    },
+                    "upsert": {"id": person_id, "full_name": full_name, "films": [film], SUGGEST_FIELD: suggest},
+                })
+                affected_keys.append(build_cache_key("person", person_id=person_id))
+                affected_keys.append(build_cache_key("person:films", person_id=person_id))
+        return actions, affected_keys
+
+
+def film_suggestion(film_id: str, source: dict) -> dict:
+    """Документ индекса подсказок фильмов; фильмы с большим рейтингом подсказываются первыми."""
+    rating = source.get("imdb_rating")
+    return {
+        "id": film_id,
+        "title": source["title"],
+        SUGGEST_FIELD: suggest_field(source["title"], weight=round(rating * 10) if rating else 0),
+    }
+
+
+class FilmsSuggestPipeline(FilmsDerivedPipeline):
+    """Индекс подсказок по названиям фильмов для /films/suggest."""
+
+    name = "films_suggest"
+    index = FILMS_SUGGEST_INDEX
+    index_body = FILMS_SUGGEST_INDEX_BODY
+    source_fields = ["title", "imdb_rating"]
+
+    def transform(self, hits: List[dict]) -> Tuple[List[dict], List[str]]:
+        actions = [
+            {"_op_type": "index", "_id": hit["_id"], "_source": film_suggestion(hit["_id"], hit["_source"])}
+            for hit in hits
+            if hit["_source"].get("title")
+        ]
+        # подсказки кешируются только в памяти воркеров, на короткий TTL
+        return actions, []
+
+
+class FilmEventsPublisher:
+    """
+    События изменений фильмов для инвалидации кеша API (см. services.cache_invalidation).
+
+    Индекс не пишет: читает фильмы, изменённые после водяного знака, и публикует
+    по событию на фильм с id его жанров. Воркеры API по ним удаляют карточку фильма,
+    страницы списков, поиска и похожих фильмов, где он есть, и страницы его жанров.
+    """
+
+    name = "film_events"
+
+    def __init__(self, es: AsyncElasticsearch, redis: Redis, cache: RedisCacheService):
+        self.es = es
+        self.redis = redis
+        self.state = ETLState(redis, self.name)
+
+    async def run(self, full: bool = False, replace_concrete: bool = False) -> None:
+        """
+        Args:
+            full: Опубликовать события для всех фильмов каталога
+            replace_concrete: Не используется, индекса у публикатора нет
+        """
+        since = None if full else await self.state.get_watermark()
+        published = 0
+        async for batch in extract_films(self.es, ["genres"], since, config.ETL_EXTRACT_BATCH_SIZE):
+            published += await publish_changes(self.redis, [
+                ChangeEvent(
+                    entity="film",
+                    id=hit["_id"],
+                    genres=[GenresPipeline._genre_identity(genre)[0] for genre in hit["_source"].get("genres") or []],
+                )
+                for hit in batch.hits
+            ])
+            if batch.watermark is not None:
+                await self.state.set_watermark(batch.watermark)
+        logger.info("ETL %s finished: %d events published, since=%s", self.name, published, since)
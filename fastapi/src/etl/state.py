@@ -0,0 +1,35 @@
+import logging
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ETLState:
+    """
+    Сохранённое состояние пайплайна: водяной знак modified-since.
+
+    Хранится в хеше Redis: поле — имя пайплайна, значение — значения сортировки
+    (modified, id) последнего загруженного документа источника в JSON
+    (см. etl.extract.extract_films).
+    """
+
+    def __init__(self, redis: Redis, pipeline: str):
+        self.redis = redis
+        self.pipeline = pipeline
+
+    async def get_watermark(self) -> Optional[str]:
+        """Водяной знак последней успешной загрузки либо None для полной перезагрузки."""
+        value = await self.redis.hget(config.ETL_STATE_KEY, self.pipeline)
+        return value.decode() if value is not None else None
+
+    async def set_watermark(self, value: str) -> None:
+        await self.redis.hset(config.ETL_STATE_KEY, self.pipeline, value)
+        logger.debug("ETL %s watermark -> %s", self.pipeline, value)
+
+    async def reset(self) -> None:
+        """Сбрасывает водяной знак: следующий запуск перезагрузит все данные."""
+        await self.redis.hdel(config.ETL_STATE_KEY, self.pipeline)
@@ -1,32 +1,185 @@
+import asyncio
+import contextlib
 import logging
+import time
 from typing import AsyncGenerator
 
-import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import ORJSONResponse
+from elastic_transport import ApiError, TransportError
+from prometheus_client import REGISTRY
 
-from core.logger import LOGGING
+from core.logger import setup_logging
 
-logging.config.dictConfig(LOGGING)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+from core.admission import AdmissionController, OverloadedError
 from core.config import config
-from db.elasticsearch import init_elastic
-from db.redis import init_redis
-from api.v1 import films_api, genres_api
+from core.metrics import RuntimeStatsCollector, metrics_endpoint
+from db.elasticsearch import CoalescingElasticsearch, InstrumentedElasticsearch, init_elastic, warm_elastic
+from db.index_manager import IndexManager
+from db.indexes import GENRES_INDEX, MOVIES_INDEX, PERSONS_INDEX
+from db.single_flight import SingleFlight
+from db.redis import init_redis, init_redis_subscriber, warm_redis
+from db.resilience import CircuitBreaker, ResilientElasticsearch, UnavailableError, is_unavailable
+from services.cache_invalidation import CacheInvalidationConsumer
+from services.cache_service import RedisCacheService
+from models.film_model import FilmFilters
+from services.film_service import FilmService
+from services.genre_registry import GenreRegistry
+from services.genre_service import GenreService
+from services.person_service import PersonService
+from services.similar_films_index import SimilarFilmsIndex
+from services.ranking_index import FilmRankingIndex
+from services.warmup import TrafficRecorder, TrafficWarmup, readiness_endpoint
+from services.memory_cache import MemoryCache
+from api.middleware.compression import CompressionMiddleware
+from api.middleware.conditional import ConditionalRequestMiddleware
+from api.middleware.degradation import DegradationMiddleware
+from api.middleware.timing import TimingMiddleware
+from api.middleware.traffic import TrafficRecorderMiddleware
+from api.v1 import films_api, genres_api, persons_api
+from api.v1.admission import admission_control
+from api.v1.deadline import request_deadline
+
+
+async def log_indexes(es) -> None:
+    """Логирует, какие физические индексы сейчас стоят за алиасами чтения."""
+    try:
+        resolved = await IndexManager(es).resolve_all([MOVIES_INDEX, GENRES_INDEX, PERSONS_INDEX])
+    except Exception:
+        logger.exception("Index aliases resolution failed")
+        return
+    for alias, indices in resolved.items():
+        if indices:
+            logger.info("Index %s -> %s", alias, ", ".join(indices))
+        else:
+            logger.warning("Index %s does not exist", alias)
+
+
+async def prewarm(app: FastAPI) -> None:
+    """
+    Прогрев воркера до приёма трафика: соединения пулов Elasticsearch и Redis
+    и первые страницы списков фильмов и жанров, чтобы первые запросы после
+    деплоя не платили за подключения и промахи кеша. Ошибки прогрева не мешают старту.
+    """
+    started = time.perf_counter()
+
+    async def warm() -> None:
+        await asyncio.gather(warm_elastic(app.state.es), warm_redis(app.state.redis))
+        await asyncio.gather(
+            app.state.film_service.get_films_list("-imdb_rating", FilmFilters(), 1, 50),
+            app.state.genre_service.get_genres_list(1, 50),
+        )
+
+    try:
+        await asyncio.wait_for(warm(), timeout=config.PREWARM_TIMEOUT)
+    except Exception:
+        logger.exception("Prewarm failed, starting cold")
+        return
+    logger.info("Prewarm finished in %.2fs", time.perf_counter() - started)
 
 
 async def lifespan(app: FastAPI) -> AsyncGenerator[dict, None]:
     """Контекстный менеджер для управления ресурсами."""
     
     redis = await init_redis()
+    # подписки и чтение потоков держат соединения постоянно: у них свой пул
+    subscriber = await init_redis_subscriber()
     es = await init_elastic()
+    if config.METRICS_ENABLED:
+        # внутри объединения запросов: замеряются только реально ушедшие в Elasticsearch
+        es = InstrumentedElasticsearch(es)
+    # снаружи замеров (каждый хеджированный запрос замеряется отдельно),
+    # но внутри объединения: выключатель учитывает только реальные запросы
+    es = resilient_es = ResilientElasticsearch(
+        es,
+        CircuitBreaker(
+            "elasticsearch", config.ELASTIC_BREAKER_FAILURE_THRESHOLD, config.ELASTIC_BREAKER_RECOVERY_TIMEOUT
+        ),
+        hedge_delay=config.ELASTIC_HEDGE_DELAY,
+    )
+    if config.ELASTIC_COALESCE_REQUESTS:
+        es = CoalescingElasticsearch(es, SingleFlight(config.ELASTIC_COALESCE_TRACKED_KEYS))
 
     app.state.redis = redis
     app.state.es = es
+    app.state.admission = None
+    if config.ADMISSION_ENABLED:
+        app.state.admission = AdmissionController(lambda: resilient_es.latency)
+    await log_indexes(es)
+    app.state.cache = RedisCacheService(
+        redis,
+        local_cache=MemoryCache(maxsize=config.CACHE_LOCAL_MAXSIZE, ttl=config.CACHE_LOCAL_TTL),
+        serve_stale_on=is_unavailable,
+    )
+    app.state.genre_registry = GenreRegistry(es)
+    try:
+        await app.state.genre_registry.load()
+    except Exception:
+        logger.exception("Genre registry preload failed, falling back to Elasticsearch lookups")
+
+    app.state.similar_films_index = SimilarFilmsIndex(es, redis)
+    # загружается в фоне: пока индекс не готов, списки фильмов читаются из Elasticsearch
+    app.state.film_ranking_index = FilmRankingIndex(es) if config.FILMS_RANKING_INDEX_ENABLED else None
+
+    # Сервисы без состояния запроса: один экземпляр на процесс
+    app.state.genre_service = GenreService(es, app.state.cache)
+    app.state.film_service = FilmService(
+        es,
+        app.state.genre_service,
+        app.state.cache,
+        app.state.genre_registry,
+        app.state.similar_films_index,
+        app.state.film_ranking_index,
+    )
+    app.state.person_service = PersonService(es, app.state.cache, app.state.film_service)
+    app.state.warmup = None
+    if config.WARMUP_ENABLED:
+        app.state.warmup = TrafficWarmup(redis, traffic_recorder, app.state.film_service, app.state.genre_service)
+
+    stats_collector = None
+    if config.METRICS_ENABLED:
+        single_flights = {"cache": app.state.cache.single_flight}
+        if isinstance(es, CoalescingElasticsearch):
+            single_flights["elasticsearch"] = es.single_flight
+        stats_collector = RuntimeStatsCollector(single_flights, app.state.cache.local_cache)
+        REGISTRY.register(stats_collector)
+
+    if config.PREWARM_ENABLED:
+        await prewarm(app)
+
+    background_tasks = [
+        asyncio.create_task(app.state.cache.listen_invalidations(subscriber)),
+        asyncio.create_task(CacheInvalidationConsumer(subscriber, app.state.cache).run()),
+        asyncio.create_task(
+            app.state.genre_registry.refresh_periodically(config.GENRE_REGISTRY_REFRESH_INTERVAL)
+        ),
+        asyncio.create_task(app.state.genre_registry.listen_changes(subscriber)),
+        asyncio.create_task(
+            app.state.similar_films_index.refresh_periodically(config.SIMILAR_FILMS_REFRESH_INTERVAL)
+        ),
+    ]
+    if app.state.film_ranking_index is not None:
+        background_tasks.append(asyncio.create_task(app.state.film_ranking_index.run(subscriber)))
+    if app.state.warmup is not None:
+        # воркер принимает соединения сразу, а /ready отвечает 503 до конца прогрева
+        background_tasks.append(asyncio.create_task(app.state.warmup.run_startup()))
+        background_tasks.append(asyncio.create_task(app.state.warmup.run_schedule()))
 
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    # перезагрузку по уведомлению запускает слушатель канала, её нужно отменить отдельно
+    await app.state.genre_registry.close()
+    if stats_collector is not None:
+        REGISTRY.unregister(stats_collector)
+    await subscriber.close()
     await redis.close()
     await es.close()
 
@@ -40,16 +193,66 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-app.include_router(films_api.router, prefix='/api/v1/films', tags=['films']) 
-app.include_router(genres_api.router, prefix='/api/v1/genres', tags=['genres'])
+# Запросы для прогрева кеша копятся в памяти и сбрасываются в Redis задачей TrafficWarmup
+traffic_recorder = TrafficRecorder()
+
+# Добавленное позже оборачивает добавленное раньше: время меряется и для ответов 304,
+# а no-store деградированного ответа перекрывает политику кеширования маршрута;
+# статистика трафика видит исходный статус 200 и до превращения ответа в 304,
+# а сжатие — уже окончательное тело с ETag
+if config.WARMUP_ENABLED:
+    app.add_middleware(TrafficRecorderMiddleware, recorder=traffic_recorder)
+if config.HTTP_CACHE_ENABLED:
+    app.add_middleware(ConditionalRequestMiddleware, policies=config.HTTP_CACHE_POLICIES)
+if config.HTTP_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.HTTP_COMPRESSION_MIN_SIZE,
+        gzip_level=config.HTTP_COMPRESSION_GZIP_LEVEL,
+        brotli_quality=config.HTTP_COMPRESSION_BROTLI_QUALITY,
+        memo=MemoryCache(maxsize=config.HTTP_COMPRESSION_MEMO_MAXSIZE, ttl=config.HTTP_COMPRESSION_MEMO_TTL),
+    )
+app.add_middleware(DegradationMiddleware)
+if config.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+app.add_route("/ready", readiness_endpoint, include_in_schema=False)
+
+
+@app.exception_handler(UnavailableError)
+@app.exception_handler(TransportError)
+@app.exception_handler(OverloadedError)
+async def elastic_unavailable_handler(request: Request, exc: Exception) -> ORJSONResponse:
+    """
+    Elasticsearch недоступен, а устаревшей копии ответа нет, либо запрос не допущен
+    контролем допуска: 503 вместо 500.
+    """
+    retry_after = getattr(exc, "retry_after", 1.0)
+    return ORJSONResponse(
+        {"detail": "service temporarily unavailable"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(retry_after)))},
+    )
+
+
+@app.exception_handler(ApiError)
+async def elastic_api_error_handler(request: Request, exc: ApiError) -> ORJSONResponse:
+    """
+    Ответ Elasticsearch с ошибкой: 5xx и 429 — это недоступность, как и в
+    is_unavailable, поэтому 503; остальные ошибки — проблема самого запроса.
+    """
+    if not is_unavailable(exc):
+        raise exc
+    return await elastic_unavailable_handler(request, exc)
+
+
+api_dependencies = [Depends(request_deadline), Depends(admission_control)]
+app.include_router(films_api.router, prefix='/api/v1/films', tags=['films'], dependencies=api_dependencies)
+app.include_router(genres_api.router, prefix='/api/v1/genres', tags=['genres'], dependencies=api_dependencies)
+app.include_router(persons_api.router, prefix='/api/v1/persons', tags=['persons'], dependencies=api_dependencies)
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host=config.UVICORN_HOST,
-        port=config.UVICORN_PORT,
-        log_config=LOGGING,
-        log_level=config.LOG_LEVEL.lower(),
-        reload=config.UVICORN_RELOAD,
-    )
\ No newline at end of file
+    from core.server import serve
+
+    serve("main:app")
\ No newline at end of file
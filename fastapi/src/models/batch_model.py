@@ -0,0 +1,10 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+BATCH_MAX_SIZE = 100
+
+
+class BatchRequestModel(BaseModel):
+    """Модель запроса пакетного получения объектов по ID."""
+    ids: List[str] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
@@ -21,3 +21,41 @@ class FilmSearchResponseModel(BaseModel):
     uuid: str
     title: str
     imdb_rating: Optional[float]
+
+
+class FilmFilters(BaseModel):
+    """Фильтры списка фильмов; жанры объединяются по ИЛИ, разные фильтры — по И."""
+    genres: List[str] = []
+    rating_min: Optional[float] = None
+    rating_max: Optional[float] = None
+    person: Optional[str] = None
+
+
+class GenreFacet(BaseModel):
+    """Количество фильмов жанра среди отфильтрованных."""
+    id: str
+    name: str
+    count: int
+
+
+class RatingFacet(BaseModel):
+    """Количество фильмов с рейтингом в интервале [min, max)."""
+    min: float
+    max: float
+    count: int
+
+
+class FilmFacets(BaseModel):
+    """
+    Агрегации списка фильмов. Каждый фасет считается без собственного фильтра,
+    чтобы интерфейс мог показать, сколько фильмов даст выбор другого значения.
+    """
+    total: int
+    genres: List[GenreFacet]
+    rating: List[RatingFacet]
+
+
+class FilmsPageWithFacets(BaseModel):
+    """Страница списка фильмов вместе с агрегациями."""
+    films: List[FilmSearchResponseModel]
+    facets: FilmFacets
@@ -1,7 +1,22 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
 class Person(BaseModel):
     """Модель персоны (актёра, режиссёра, сценариста)."""
     uuid: str = Field(alias="id")
-    full_name: str = Field(alias="name")
\ No newline at end of file
+    full_name: str = Field(alias="name")
+
+
+class PersonFilm(BaseModel):
+    """Фильм персоны с её ролями в нём."""
+    uuid: str = Field(alias="id")
+    roles: List[str]
+
+
+class PersonResponseModel(BaseModel):
+    """Модель ответа API для персоны."""
+    uuid: str = Field(alias="id")
+    full_name: str
+    films: List[PersonFilm]
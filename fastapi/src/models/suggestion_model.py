@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class Suggestion(BaseModel):
+    """Подсказка поиска: только то, что нужно выпадающему списку."""
+    uuid: str
+    title: str
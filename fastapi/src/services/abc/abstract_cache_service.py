@@ -0,0 +1,40 @@
+from abc import ABC, abstractmethod
+from typing import Generic, TypeVar, Optional
+
+C = TypeVar("C")
+
+
+class AbstractCacheService(ABC, Generic[C]):
+    """
+    Абстрактный сервис кеширования ответов.
+
+    Args:
+        C: Тип клиента хранилища кеша
+    """
+
+    def __init__(self, cache_client: C):
+        """
+        Инициализация клиента кеша.
+
+        Args:
+            cache_client: Клиент для подключения к хранилищу кеша
+        """
+        self.cache_client = cache_client
+
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Получение сериализованного значения по ключу."""
+        raise NotImplementedError
+
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        """Сохранение сериализованного значения с временем жизни в секундах."""
+        raise NotImplementedError
+
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Удаление значений по ключам."""
+        raise NotImplementedError
@@ -32,4 +32,10 @@ class AbstractDBService(ABC, Generic[T, DB]):
     @abstractmethod
     async def search(self, query: str, page_number: int, page_size: int) -> List[T]:
         """Поиск объектов по заданному запросу."""
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+        
+        
+    @abstractmethod
+    async def get_many(self, object_ids: List[str]) -> List[T]:
+        """Получение объектов по списку ID; несуществующие пропускаются."""
+        raise NotImplementedError
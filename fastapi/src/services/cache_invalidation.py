@@ -0,0 +1,211 @@
+"""
+Инвалидация кеша API по событиям изменения документов.
+
+Значения кеша помечаются тегами документов, из которых собраны
+(см. RedisCacheService, параметр dependencies):
+
+    film:<id>           — данные фильма: карточка, строки списков, поиска,
+                          похожих фильмов и фильмов персоны
+    genre:<id>          — данные жанра: карточка, списки и поиск жанров
+    films:genre:<id>    — состав жанра: страницы списка фильмов с фильтром по нему
+
+Фильм, получивший новый рейтинг или только добавленный, может попасть на любую
+страницу списка или поиска, а не только на те, где он уже есть. Такие страницы
+не сбрасываются целиком на каждое изменение каталога: их догоняет короткий TTL
+(CACHE_FILMS_LIST_TTL, CACHE_FILMS_SEARCH_TTL, CACHE_FILMS_FACETS_TTL).
+
+Источники изменений пишут события в поток Redis CACHE_EVENTS_STREAM
+(см. publish_changes), а воркеры API читают его общей группой потребителей:
+каждое событие обрабатывает один воркер, локальные кеши остальных очищаются
+через pub/sub инвалидации. Событие подтверждается только после удаления
+ключей, поэтому при сбое воркера его дообработает другой.
+"""
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from core.config import config
+from core.metrics import CACHE_INVALIDATED_KEYS, CACHE_INVALIDATION_EVENTS
+from services.cache_service import RedisCacheService
+
+logger = logging.getLogger(__name__)
+
+
+def film_tag(film_id: str) -> str:
+    return f"film:{film_id}"
+
+
+def genre_tag(genre_id: str) -> str:
+    return f"genre:{genre_id}"
+
+
+def genre_films_tag(genre_id: str) -> str:
+    return f"films:genre:{genre_id}"
+
+
+def film_rows_dependencies(raw: bytes) -> List[str]:
+    """Теги тела списочного ответа из строк фильмов (форма FilmSearchResponseModel)."""
+    return [film_tag(row["uuid"]) for row in orjson.loads(raw)]
+
+
+@dataclass
+class ChangeEvent:
+    """
+    Изменение документа.
+
+    Для фильма в genres передаются id жанров, в которые он входил или вошёл:
+    по ним инвалидируются страницы списков с фильтром по этим жанрам.
+    """
+    entity: str
+    id: str
+    genres: List[str] = field(default_factory=list)
+
+    def tags(self) -> List[str]:
+        return [f"{self.entity}:{self.id}", *(genre_films_tag(genre_id) for genre_id in self.genres)]
+
+    def to_fields(self) -> Dict[str, str]:
+        return {"entity": self.entity, "id": self.id, "genres": ",".join(self.genres)}
+
+    @classmethod
+    def from_fields(cls, fields: Dict[bytes, bytes]) -> "ChangeEvent":
+        """
+        Raises:
+            KeyError: В событии нет entity или id.
+        """
+        fields = {
+            (name.decode() if isinstance(name, bytes) else name): (value.decode() if isinstance(value, bytes) else value)
+            for name, value in fields.items()
+        }
+        genres = fields.get("genres", "")
+        return cls(entity=fields["entity"], id=fields["id"], genres=genres.split(",") if genres else [])
+
+
+async def publish_changes(redis: Redis, events: Iterable[ChangeEvent]) -> int:
+    """
+    Пишет события изменений в поток инвалидации одним пайплайном.
+
+    Поток ограничен примерно CACHE_EVENTS_MAXLEN последними событиями.
+
+    Returns:
+        int: Количество записанных событий.
+    """
+    published = 0
+    async with redis.pipeline(transaction=False) as pipe:
+        for event in events:
+            pipe.xadd(config.CACHE_EVENTS_STREAM, event.to_fields(), maxlen=config.CACHE_EVENTS_MAXLEN, approximate=True)
+            published += 1
+        if published:
+            await pipe.execute()
+    return published
+
+
+class CacheInvalidationConsumer:
+    """
+    Потребитель потока событий изменений: удаляет значения кеша, зависящие
+    от изменённых документов.
+
+    Все воркеры читают поток одной группой. События, которые взял и не
+    подтвердил упавший воркер, забираются через XAUTOCLAIM после
+    CACHE_EVENTS_CLAIM_IDLE_MS простоя.
+    """
+
+    def __init__(self, redis: Redis, cache: RedisCacheService, consumer: Optional[str] = None):
+        """
+        Args:
+            redis: Подключение к Redis для чтения потока (см. db.redis.init_redis_subscriber)
+            cache: Кеш ответов API
+            consumer: Имя потребителя в группе; по умолчанию хост и pid процесса
+        """
+        self.redis = redis
+        self.cache = cache
+        self.stream = config.CACHE_EVENTS_STREAM
+        self.group = config.CACHE_EVENTS_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+
+    async def run(self, retry_delay: float = 1.0) -> None:
+        """Фоновая задача: читает поток и инвалидирует кеш до отмены."""
+        loop = asyncio.get_running_loop()
+        group_ready = False
+        next_claim = 0.0
+        while True:
+            try:
+                if not group_ready:
+                    await self._ensure_group()
+                    group_ready = True
+                if loop.time() >= next_claim:
+                    await self._claim_stale()
+                    next_claim = loop.time() + config.CACHE_EVENTS_CLAIM_IDLE_MS / 1000
+                response = await self.redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {self.stream: ">"},
+                    count=config.CACHE_EVENTS_BATCH_SIZE,
+                    block=config.CACHE_EVENTS_BLOCK_MS,
+                )
+                for _, messages in response or []:
+                    await self._handle(messages)
+            except RedisError as exc:
+                logger.warning("Cache invalidation consumer failed: %s", exc)
+                # группу могли удалить вместе с потоком
+                group_ready = False
+                await asyncio.sleep(retry_delay)
+            except Exception:
+                # неподтверждённые события дообработаются через XAUTOCLAIM;
+                # задача же должна жить, иначе воркер перестанет инвалидировать кеш
+                logger.exception("Cache invalidation consumer failed")
+                await asyncio.sleep(retry_delay)
+
+    async def _ensure_group(self) -> None:
+        try:
+            # новая группа начинает с текущего конца потока: старые события
+            # относятся к значениям, которые давно истекли бы или уже удалены
+            await self.redis.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def _claim_stale(self) -> None:
+        """Дообрабатывает события, зависшие у упавших потребителей группы."""
+        start_id = "0-0"
+        while True:
+            response = await self.redis.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=config.CACHE_EVENTS_CLAIM_IDLE_MS,
+                start_id=start_id,
+                count=config.CACHE_EVENTS_BATCH_SIZE,
+            )
+            start_id, messages = response[0], response[1]
+            if messages:
+                await self._handle(messages)
+            if start_id in (b"0-0", "0-0"):
+                return
+
+    async def _handle(self, messages: List[tuple]) -> None:
+        tags: Dict[str, None] = {}
+        for message_id, fields in messages:
+            if not fields:
+                # событие удалено из потока раньше, чем его обработали
+                continue
+            try:
+                event = ChangeEvent.from_fields(fields)
+                event_tags = event.tags()
+            except Exception:
+                # битое событие подтверждается вместе с остальными: повтор его не исправит
+                logger.exception("Malformed cache invalidation event %s: %r", message_id, fields)
+                continue
+            CACHE_INVALIDATION_EVENTS.labels(event.entity).inc()
+            tags.update(dict.fromkeys(event_tags))
+
+        invalidated = await self.cache.invalidate_tags(*tags)
+        CACHE_INVALIDATED_KEYS.inc(invalidated)
+        await self.redis.xack(self.stream, self.group, *(message_id for message_id, _ in messages))
+        logger.debug("Cache invalidation: %d events, %d keys", len(messages), invalidated)
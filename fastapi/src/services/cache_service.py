@@ -0,0 +1,603 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from uuid import uuid4
+
+import orjson
+from fastapi import Request
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import config
+from core.metrics import CACHE_REQUESTS
+from db.redis import listen_channel
+from db.resilience import mark_degraded
+from db.single_flight import SingleFlight
+from services.abc.abstract_cache_service import AbstractCacheService
+from services.memory_cache import MISSING, MemoryCache
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Снимаем блокировку только если она всё ещё принадлежит нам.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_MAX_KEY_PARAMS_LENGTH = 200
+
+# Параметры со свободным текстом: поиск по ним не зависит от регистра и пробелов.
+# Идентификаторы, сортировки и названия жанров сравниваются в Elasticsearch
+# точно, поэтому попадают в ключ как есть.
+_FREE_TEXT_PARAMS = frozenset({"query", "prefix"})
+
+
+def _identity(value: bytes) -> bytes:
+    return value
+
+
+def compute_etag(body: bytes) -> str:
+    """Сильный ETag по телу ответа (или по закешированному значению, из которого оно строится)."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _payload_etag(raw: bytes) -> Optional[str]:
+    # у закешированного «не найдено» ETag нет: на него отвечают 404
+    return compute_etag(raw) if raw != b"null" else None
+
+
+def _normalize_text(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def _normalize_param(value: Any) -> str:
+    """Приводит значение параметра эндпоинта к каноническому строковому виду."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return ",".join(sorted(_normalize_param(item) for item in value))
+    return str(value)
+
+
+def build_cache_key(namespace: str, **params: Any) -> str:
+    """
+    Строит ключ кеша по пространству имён эндпоинта и его параметрам.
+
+    Параметры со значением None отбрасываются, порядок параметров не влияет на ключ,
+    свободный текст (query, prefix) приводится к нижнему регистру со схлопнутыми
+    пробелами, остальные строки не меняются. Слишком длинная
+    часть с параметрами (например, длинный поисковый запрос) заменяется её хешем.
+
+    Args:
+        namespace: Пространство имён эндпоинта, например "films:list"
+        **params: Параметры запроса
+
+    Returns:
+        str: Ключ кеша.
+    """
+    parts = [
+        f"{name}={_normalize_text(value) if name in _FREE_TEXT_PARAMS else _normalize_param(value)}"
+        for name, value in sorted(params.items())
+        if value is not None
+    ]
+    params_part = ":".join(parts)
+    if len(params_part) > _MAX_KEY_PARAMS_LENGTH:
+        params_part = hashlib.blake2b(params_part.encode(), digest_size=16).hexdigest()
+    return f"{config.CACHE_PREFIX}:{namespace}:{params_part}"
+
+
+def cache_key_namespace(key: str) -> str:
+    """Пространство имён эндпоинта по ключу, построенному build_cache_key."""
+    parts = key.split(":")[1:]
+    for position, part in enumerate(parts):
+        if "=" in part:
+            return ":".join(parts[:position])
+    # параметров нет либо они заменены хешем
+    return ":".join(parts[:-1])
+
+
+def _stale_key(key: str) -> str:
+    return f"{key}:stale"
+
+
+def dependency_tag_key(tag: str) -> str:
+    """
+    Ключ сортированного множества Redis с ключами кеша, зависящими от тега
+    (например, "film:<id>"); вес ключа — время истечения его значения.
+    """
+    return f"{config.CACHE_PREFIX}:tags:{tag}"
+
+
+def _record_lookup(layer: str, key: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(layer, cache_key_namespace(key), "hit" if hit else "miss").inc()
+
+
+class RedisCacheService(AbstractCacheService[Redis]):
+    """
+    Кеш ответов эндпоинтов в Redis.
+
+    Значения хранятся в виде orjson-байтов. При промахе загрузка защищена от
+    «эффекта толпы»: внутри процесса одинаковые промахи ожидают одну загрузку,
+    между процессами загрузку выполняет только владелец блокировки в Redis,
+    остальные дожидаются появления значения в кеше.
+
+    Для самых горячих ключей перед Redis может стоять локальный кеш процесса
+    (L1) с уже провалидированными объектами и ETag их сериализованного значения. Согласованность L1 между воркерами
+    поддерживается через канал инвалидации Redis pub/sub.
+
+    Значение можно пометить тегами документов, из которых оно собрано
+    (параметр dependencies): ключ добавляется в сортированное множество Redis
+    каждого тега с временем истечения значения, и invalidate_tags удаляет ровно
+    те ещё живые значения, которые от них зависят.
+
+    С serve_stale_on рядом с каждым загруженным значением хранится его копия,
+    живущая на CACHE_STALE_TTL дольше. Если загрузчик упал с ошибкой, для которой
+    serve_stale_on истинно (хранилище недоступно), отдаётся эта копия, а ответ
+    помечается как деградированный.
+    """
+
+    def __init__(
+        self,
+        cache_client: Redis,
+        local_cache: Optional[MemoryCache] = None,
+        serve_stale_on: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        super().__init__(cache_client)
+        self.local_cache = local_cache
+        self.serve_stale_on = serve_stale_on
+        self.invalidation_channel = f"{config.CACHE_PREFIX}:invalidate"
+        self.single_flight = SingleFlight()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Получает значение из Redis. Ошибки Redis трактуются как промах."""
+        try:
+            return await self.cache_client.get(key)
+        except RedisError as exc:
+            logger.warning("Cache get failed for %s: %s", key, exc)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        """Сохраняет значение в Redis. Ошибки Redis только логируются."""
+        try:
+            await self.cache_client.set(key, value, ex=ttl)
+        except RedisError as exc:
+            logger.warning("Cache set failed for %s: %s", key, exc)
+
+    async def delete(self, *keys: str) -> None:
+        """Удаляет значения из Redis."""
+        if not keys:
+            return
+        try:
+            await self.cache_client.delete(*keys)
+        except RedisError as exc:
+            logger.warning("Cache delete failed for %s: %s", keys, exc)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Получает значения из Redis одним MGET. Ошибки Redis трактуются как промахи."""
+        if not keys:
+            return []
+        try:
+            return await self.cache_client.mget(keys)
+        except RedisError as exc:
+            logger.warning("Cache mget failed for %d keys: %s", len(keys), exc)
+            return [None] * len(keys)
+
+    async def set_many(
+        self,
+        items: Dict[str, bytes],
+        ttls: Dict[str, int],
+        tags: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> None:
+        """
+        Сохраняет несколько значений одним пайплайном Redis.
+
+        Args:
+            items: Ключ -> значение
+            ttls: Ключ -> время жизни в секундах
+            tags: Ключ -> теги документов, от которых зависит значение
+        """
+        if not items:
+            return
+        tags = tags or {}
+        now = time.time()
+        try:
+            async with self.cache_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, value, ex=ttls[key])
+                    # теги пишутся тем же пайплайном: инвалидация не проскочит между ними
+                    for tag in tags.get(key, ()):
+                        tag_key = dependency_tag_key(tag)
+                        pipe.zadd(tag_key, {key: now + ttls[key]})
+                        # истёкшие ключи вычищаются при каждой записи: множество горячего
+                        # тега не растёт с числом когда-либо закешированных под ним значений
+                        pipe.zremrangebyscore(tag_key, "-inf", now)
+                        pipe.expire(tag_key, config.CACHE_DEPENDENCY_TTL)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning("Cache pipeline set failed for %d keys: %s", len(items), exc)
+
+    async def invalidate(self, *keys: str) -> None:
+        """
+        Удаляет значения из Redis и из локальных кешей всех воркеров.
+
+        Args:
+            *keys: Ключи кеша
+        """
+        if not keys:
+            return
+        await self.delete(*keys)
+        if self.local_cache is not None:
+            self.local_cache.delete(*keys)
+        try:
+            await self.cache_client.publish(self.invalidation_channel, orjson.dumps(keys))
+        except RedisError as exc:
+            logger.warning("Cache invalidation publish failed for %s: %s", keys, exc)
+
+    async def invalidate_namespace(self, namespace: str, batch_size: int = 1000) -> int:
+        """
+        Удаляет все значения пространства имён эндпоинта (например, все страницы списка).
+
+        Ключи перебираются через SCAN, поэтому Redis не блокируется, но стоимость
+        пропорциональна размеру keyspace: вызывать стоит редко, а не на каждый запрос.
+
+        Returns:
+            int: Количество удалённых ключей.
+        """
+        deleted = 0
+        batch: List[str] = []
+        try:
+            async for key in self.cache_client.scan_iter(
+                match=f"{config.CACHE_PREFIX}:{namespace}:*", count=batch_size
+            ):
+                batch.append(key.decode() if isinstance(key, bytes) else key)
+                if len(batch) >= batch_size:
+                    await self.invalidate(*batch)
+                    deleted += len(batch)
+                    batch = []
+        except RedisError as exc:
+            logger.warning("Cache namespace scan failed for %s: %s", namespace, exc)
+        await self.invalidate(*batch)
+        return deleted + len(batch)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Удаляет значения, помеченные любым из тегов, и сами множества тегов.
+
+        Чтение и удаление множеств выполняются транзакцией: ключ, добавленный
+        к тегу параллельной загрузкой, либо попадёт в эту инвалидацию,
+        либо останется в множестве до следующей.
+
+        Returns:
+            int: Количество инвалидированных ключей.
+
+        Raises:
+            RedisError: Множества тегов не удалось прочитать; событие стоит повторить.
+        """
+        if not tags:
+            return 0
+        tag_keys = [dependency_tag_key(tag) for tag in dict.fromkeys(tags)]
+        now = time.time()
+        async with self.cache_client.pipeline(transaction=True) as pipe:
+            for tag_key in tag_keys:
+                # истёкшие значения удалять незачем
+                pipe.zrangebyscore(tag_key, now, "+inf")
+            pipe.delete(*tag_keys)
+            *members, _ = await pipe.execute()
+        keys = list(dict.fromkeys(
+            key.decode() if isinstance(key, bytes) else key for tag_members in members for key in tag_members
+        ))
+        await self.invalidate(*keys)
+        return len(keys)
+
+    async def listen_invalidations(self, redis: Optional[Redis] = None) -> None:
+        """
+        Фоновая задача: применяет к локальному кешу инвалидации из других воркеров.
+
+        Args:
+            redis: Подключение для подписки (см. db.redis.init_redis_subscriber); по умолчанию — кеша
+        """
+        if self.local_cache is None:
+            return
+        await listen_channel(
+            redis or self.cache_client,
+            self.invalidation_channel,
+            self._on_invalidation,
+            # пока подписки не было, сообщения могли потеряться
+            on_subscribe=self.local_cache.clear,
+        )
+
+    def _on_invalidation(self, data: bytes) -> None:
+        try:
+            keys = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            logger.warning("Malformed cache invalidation message: %r", data)
+            return
+        self.local_cache.delete(*keys)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: int,
+        adapter: TypeAdapter,
+        local: bool = False,
+        dependencies: Optional[Callable[[T], Iterable[str]]] = None,
+    ) -> T:
+        """
+        Возвращает значение из кеша либо загружает его и кладёт в кеш.
+
+        Args:
+            key: Ключ кеша, см. build_cache_key
+            loader: Корутина-загрузчик значения из основного хранилища
+            ttl: Время жизни значения в секундах
+            adapter: TypeAdapter для (де)сериализации значения
+            local: Использовать ли локальный кеш процесса перед Redis
+            dependencies: Теги документов, из которых собрано загруженное значение
+
+        Returns:
+            T: Значение из кеша или результат загрузчика.
+        """
+        value, _ = await self.get_or_set_with_etag(key, loader, ttl, adapter, local, dependencies)
+        return value
+
+    async def get_or_set_with_etag(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: int,
+        adapter: TypeAdapter,
+        local: bool = False,
+        dependencies: Optional[Callable[[T], Iterable[str]]] = None,
+    ) -> Tuple[T, Optional[str]]:
+        """
+        Как get_or_set, но вместе с ETag сериализованного значения (None для «не найдено»).
+        ETag вычисляется при заполнении и хранится в локальном кеше рядом со значением.
+        """
+        local_cache = self.local_cache if local else None
+        if local_cache is not None:
+            entry = local_cache.get(key)
+            _record_lookup("local", key, entry is not MISSING)
+            if entry is not MISSING:
+                return entry
+
+        value, raw, stale = await self._get_or_fill(
+            key,
+            loader,
+            ttl,
+            encode=lambda value: orjson.dumps(adapter.dump_python(value, mode="json", by_alias=True)),
+            decode=lambda raw: adapter.validate_python(orjson.loads(raw)),
+            dependencies=dependencies,
+        )
+        entry = (value, _payload_etag(raw))
+        if local_cache is not None and not stale:
+            local_cache.set(key, entry, ttl if value is not None else config.CACHE_NOT_FOUND_TTL)
+        return entry
+
+    async def get_etag(self, key: str, local: bool = False) -> Optional[str]:
+        """
+        ETag закешированного значения без его декодирования: для ответа 304 не нужно
+        собирать модели. None — значения нет в кеше или это «не найдено».
+
+        Args:
+            key: Ключ кеша, см. build_cache_key
+            local: Смотреть ли сначала в локальный кеш процесса
+        """
+        if local and self.local_cache is not None:
+            entry = self.local_cache.get(key)
+            if entry is not MISSING:
+                return entry[1]
+        raw = await self.get(key)
+        return _payload_etag(raw) if raw is not None else None
+
+    async def get_many_or_set(
+        self,
+        keys: Dict[str, str],
+        loader: Callable[[List[str]], Awaitable[Dict[str, Optional[T]]]],
+        ttl: int,
+        adapter: TypeAdapter,
+        local: bool = False,
+        dependencies: Optional[Callable[[str, Optional[T]], Iterable[str]]] = None,
+    ) -> Dict[str, Optional[T]]:
+        """
+        Пакетный вариант get_or_set: опрашивает уровни кеша по очереди и загружает
+        из основного хранилища только то, чего нет ни в одном из них, одним вызовом.
+
+        Args:
+            keys: Отображение id объекта -> ключ кеша
+            loader: Корутина, загружающая объекты по списку id; отсутствующие id можно не возвращать
+            ttl: Время жизни значений в секундах
+            adapter: TypeAdapter для (де)сериализации одного значения
+            local: Использовать ли локальный кеш процесса перед Redis
+            dependencies: Теги документов загруженного объекта по его id и значению
+
+        Returns:
+            Отображение id -> объект (None для несуществующих объектов).
+        """
+        local_cache = self.local_cache if local else None
+        result: Dict[str, Optional[T]] = {}
+        pending: List[str] = []
+        for object_id, key in keys.items():
+            value = MISSING
+            if local_cache is not None:
+                entry = local_cache.get(key)
+                _record_lookup("local", key, entry is not MISSING)
+                if entry is not MISSING:
+                    value = entry[0]
+            if value is MISSING:
+                pending.append(object_id)
+            else:
+                result[object_id] = value
+
+        missing: List[str] = []
+        for object_id, raw in zip(pending, await self.get_many([keys[object_id] for object_id in pending])):
+            _record_lookup("redis", keys[object_id], raw is not None)
+            if raw is None:
+                missing.append(object_id)
+                continue
+            value = adapter.validate_python(orjson.loads(raw))
+            result[object_id] = value
+            if local_cache is not None:
+                local_cache.set(
+                    keys[object_id], (value, _payload_etag(raw)), ttl if value is not None else config.CACHE_NOT_FOUND_TTL
+                )
+
+        if missing:
+            loaded = await loader(missing)
+            payloads: Dict[str, bytes] = {}
+            ttls: Dict[str, int] = {}
+            tags: Dict[str, Iterable[str]] = {}
+            for object_id in missing:
+                value = loaded.get(object_id)
+                result[object_id] = value
+                key = keys[object_id]
+                payloads[key] = orjson.dumps(adapter.dump_python(value, mode="json", by_alias=True))
+                ttls[key] = ttl if value is not None else min(ttl, config.CACHE_NOT_FOUND_TTL)
+                if dependencies is not None:
+                    tags[key] = dependencies(object_id, value)
+                if local_cache is not None:
+                    local_cache.set(key, (value, _payload_etag(payloads[key])), ttls[key])
+            await self.set_many(payloads, ttls, tags)
+        return result
+
+    async def get_or_set_raw(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[bytes]],
+        ttl: int,
+        dependencies: Optional[Callable[[bytes], Iterable[str]]] = None,
+    ) -> bytes:
+        """
+        Как get_or_set, но для уже сериализованных ответов: загрузчик возвращает
+        готовые JSON-байты, попадание отдаётся без десериализации.
+
+        Args:
+            key: Ключ кеша, см. build_cache_key
+            loader: Корутина, возвращающая тело ответа в виде JSON-байтов
+            ttl: Время жизни значения в секундах
+            dependencies: Теги документов, из которых собрано загруженное тело
+
+        Returns:
+            bytes: Тело ответа.
+        """
+        raw, _, _ = await self._get_or_fill(
+            key, loader, ttl, encode=_identity, decode=_identity, dependencies=dependencies
+        )
+        return raw
+
+    async def _get_or_fill(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: int,
+        encode: Callable[[T], bytes],
+        decode: Callable[[bytes], T],
+        dependencies: Optional[Callable[[T], Iterable[str]]] = None,
+    ) -> Tuple[T, bytes, bool]:
+        """
+        Читает значение из Redis, при промахе запускает одну загрузку на ключ.
+        Возвращает значение, его сериализованный вид и признак того, что это устаревшая копия.
+        """
+        raw = await self.get(key)
+        _record_lookup("redis", key, raw is not None)
+        if raw is not None:
+            return decode(raw), raw, False
+
+        value, raw, stale = await self.single_flight.do(
+            key, lambda: self._fill(key, loader, ttl, encode, decode, dependencies)
+        )
+        if stale:
+            # отмечаем в контексте каждого ожидавшего, а не только загружавшего
+            mark_degraded("stale-cache")
+        return value, raw, stale
+
+    async def _fill(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: int,
+        encode: Callable[[T], bytes],
+        decode: Callable[[bytes], T],
+        dependencies: Optional[Callable[[T], Iterable[str]]] = None,
+    ) -> Tuple[T, bytes, bool]:
+        """Загружает значение под распределённой блокировкой и сохраняет его в кеш."""
+        lock_key = f"{key}:lock"
+        token = uuid4().hex
+        if not await self._acquire_lock(lock_key, token):
+            raw = await self._wait_for(key)
+            if raw is not None:
+                return decode(raw), raw, False
+            logger.debug("Cache lock wait timed out for %s, loading directly", key)
+
+        try:
+            try:
+                value = await loader()
+            except Exception as exc:
+                if self.serve_stale_on is None or not self.serve_stale_on(exc):
+                    raise
+                raw = await self.get(_stale_key(key))
+                if raw is None:
+                    raise
+                logger.warning("Serving stale cache for %s: %r", key, exc)
+                return decode(raw), raw, True
+
+            raw = encode(value)
+            items, ttls = {key: raw}, {key: ttl}
+            if value is None:
+                ttls[key] = min(ttl, config.CACHE_NOT_FOUND_TTL)
+            elif self.serve_stale_on is not None:
+                items[_stale_key(key)] = raw
+                ttls[_stale_key(key)] = ttl + config.CACHE_STALE_TTL
+            await self.set_many(items, ttls, {key: dependencies(value)} if dependencies is not None else None)
+            return value, raw, False
+        finally:
+            await self._release_lock(lock_key, token)
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> bool:
+        """Пытается захватить блокировку на загрузку ключа. Без Redis загружаем сами."""
+        try:
+            return bool(
+                await self.cache_client.set(lock_key, token, nx=True, px=config.CACHE_LOCK_TTL_MS)
+            )
+        except RedisError as exc:
+            logger.warning("Cache lock failed for %s: %s", lock_key, exc)
+            return True
+
+    async def _release_lock(self, lock_key: str, token: str) -> None:
+        try:
+            await self.cache_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except RedisError as exc:
+            logger.warning("Cache unlock failed for %s: %s", lock_key, exc)
+
+    async def _wait_for(self, key: str) -> Optional[bytes]:
+        """Ждёт, пока владелец блокировки положит значение в кеш."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.CACHE_LOCK_WAIT_TIMEOUT
+        while loop.time() < deadline:
+            await asyncio.sleep(config.CACHE_LOCK_POLL_INTERVAL)
+            raw = await self.get(key)
+            if raw is not None:
+                return raw
+        return None
+
+
+def get_cache_service(request: Request) -> RedisCacheService:
+    """
+    Получает сервис кеширования из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        RedisCacheService: Сервис кеширования.
+    """
+
+    return request.app.state.cache
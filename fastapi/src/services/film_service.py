@@ -1,163 +1,631 @@
-from typing import Optional, List
-from functools import lru_cache
+import contextlib
+from typing import Any, Callable, Dict, Optional, List, Tuple
 
 
+import orjson
 from elasticsearch import AsyncElasticsearch, NotFoundError
-from fastapi import Depends
+from fastapi import Request
+from pydantic import TypeAdapter
 
-from db.elasticsearch import get_elastic
-from models.film_model import (FilmResponseModel,
-                               FilmSearchResponseModel)
+from core.config import config
+from db.indexes import FILMS_SUGGEST_INDEX, MOVIES_INDEX, PERSON_ROLE_FIELDS
+from models.film_model import FilmFilters, FilmResponseModel
+from models.genre_model import Genre
 from services.abc.abstract_db_service import AbstractDBService
-from db.elasticsearch import get_elastic
-from services.genre_service import GenreService, get_genre_service
+from services.cache_invalidation import film_rows_dependencies, film_tag, genre_films_tag, genre_tag
+from services.cache_service import RedisCacheService, build_cache_key
+from services.genre_registry import GenreRegistry
+from services.genre_service import GenreService
+from services.pagination import (Cursor, InvalidCursorError, decode_cursor,
+                                 encode_cursor, query_fingerprint)
+from services.ranking_index import FilmRankingIndex
+from services.similar_films_index import SIMILAR_FILMS_SORT, SimilarFilmsIndex, similar_films_query
+from services.suggester import Suggester
 
+_film_adapter = TypeAdapter(Optional[FilmResponseModel])
+
+# Поля, которые нужны списочным эндпоинтам (форма FilmSearchResponseModel)
+LIST_SOURCE_FIELDS = ["title", "imdb_rating"]
+
+# Агрегации фасетов списка фильмов по имени фасета
+FACET_AGGREGATIONS = {
+    "genres": {"terms": {"field": "genres", "size": config.FILMS_FACET_GENRES_SIZE}},
+    "rating": {
+        "histogram": {
+            "field": "imdb_rating",
+            "interval": config.FILMS_FACET_RATING_INTERVAL,
+            "min_doc_count": 0,
+            "extended_bounds": {"min": 0, "max": 10 - config.FILMS_FACET_RATING_INTERVAL},
+        }
+    },
+}
 
-@lru_cache(maxsize=1)
-def get_film_service(
-    elastic: AsyncElasticsearch = Depends(get_elastic),
-    genre_service: GenreService = Depends(get_genre_service)
-) -> "FilmService":
-    return FilmService(elastic, genre_service)
 
 class FilmService(AbstractDBService[FilmResponseModel, AsyncElasticsearch]):
-    film_index = "movies"
+    film_index = MOVIES_INDEX
     
-    def __init__(self, db_client: AsyncElasticsearch, genre_service: GenreService):
+    def __init__(
+        self,
+        db_client: AsyncElasticsearch,
+        genre_service: GenreService,
+        cache: RedisCacheService,
+        genre_registry: GenreRegistry,
+        similar_films_index: SimilarFilmsIndex,
+        ranking_index: Optional[FilmRankingIndex] = None,
+    ):
         super().__init__(db_client)
         self.genre_service = genre_service
+        self.cache = cache
+        self.genre_registry = genre_registry
+        self.similar_films_index = similar_films_index
+        self.ranking_index = ranking_index
+        self.suggester = Suggester(db_client, FILMS_SUGGEST_INDEX, "title", "films:suggest")
+
+    async def _resolve_genres(self, genre_names: List[str]) -> List[Genre]:
+        """Жанры по названиям: из словаря жанров, а пока он не загружен — из Elasticsearch."""
+        if self.genre_registry.loaded:
+            return self.genre_registry.get_by_names(genre_names)
+        return await self.genre_service.get_genres_by_names(genre_names)
+
+    async def _resolve_genre_name(self, genre_id: str) -> Optional[str]:
+        """Название жанра по UUID: из словаря жанров, а пока он не загружен — из Elasticsearch."""
+        if self.genre_registry.loaded:
+            return self.genre_registry.get_name(genre_id)
+        return await self.genre_service.get_genre_name_by_id(genre_id)
 
     async def get_by_id(self, film_id: str) -> Optional[FilmResponseModel]:
+        """Получает фильм по ID (из кеша или Elasticsearch)."""
+        film, _ = await self.get_by_id_with_etag(film_id)
+        return film
+
+    async def get_etag(self, film_id: str) -> Optional[str]:
+        """ETag закешированной карточки фильма без её сборки; None — карточки нет в кеше."""
+        return await self.cache.get_etag(build_cache_key("film", film_id=film_id), local=True)
+
+    async def get_by_id_with_etag(self, film_id: str) -> Tuple[Optional[FilmResponseModel], Optional[str]]:
+        """Получает фильм по ID вместе с ETag его закешированного значения."""
+        return await self.cache.get_or_set_with_etag(
+            build_cache_key("film", film_id=film_id),
+            lambda: self._get_by_id_from_elastic(film_id),
+            config.CACHE_FILM_TTL,
+            _film_adapter,
+            local=True,
+            dependencies=lambda film: self._film_dependencies(film_id, film),
+        )
+
+    async def _get_by_id_from_elastic(self, film_id: str) -> Optional[FilmResponseModel]:
         """Получает фильм по ID из Elasticsearch."""
         
         try:
             doc = await self.db_client.get(index=self.film_index, id=film_id)
             film_data = doc["_source"]
-            genre_names = film_data.get("genres", [])
-            genres = await self.genre_service.get_genres_by_names(genre_names)
-            film_response_data = {
-                **film_data,
-                "genre": [{"id": genre.id, "name": genre.name} for genre in genres]
-            }
-            film_response = FilmResponseModel(**film_response_data)
-            return film_response
+            genres = await self._resolve_genres(film_data.get("genres", []))
+            return self._build_film(film_data, genres)
         except NotFoundError:
             return None
+
+    async def get_many(self, film_ids: List[str]) -> List[FilmResponseModel]:
+        """
+        Получает фильмы по списку ID: сначала из кешей, недостающие — одним mget.
+        Порядок ответа совпадает с порядком запроса, повторы и несуществующие id пропускаются.
+        """
+        film_ids = list(dict.fromkeys(film_ids))
+        films = await self.cache.get_many_or_set(
+            {film_id: build_cache_key("film", film_id=film_id) for film_id in film_ids},
+            self._get_many_from_elastic,
+            config.CACHE_FILM_TTL,
+            _film_adapter,
+            local=True,
+            dependencies=self._film_dependencies,
+        )
+        return [films[film_id] for film_id in film_ids if films.get(film_id) is not None]
+
+    async def _get_many_from_elastic(self, film_ids: List[str]) -> Dict[str, FilmResponseModel]:
+        """Получает фильмы одним mget; жанры всех фильмов разрешаются одним общим поиском."""
+        res = await self.db_client.mget(index=self.film_index, ids=film_ids)
+        docs = [doc for doc in res["docs"] if doc.get("found")]
+        genre_names = list(dict.fromkeys(name for doc in docs for name in doc["_source"].get("genres", [])))
+        genres_by_name = {genre.name.lower(): genre for genre in await self._resolve_genres(genre_names)}
+        films = {}
+        for doc in docs:
+            film_data = doc["_source"]
+            genres = [
+                genres_by_name[name.lower()]
+                for name in film_data.get("genres", [])
+                if name.lower() in genres_by_name
+            ]
+            films[doc["_id"]] = self._build_film(film_data, genres)
+        return films
+
+    @staticmethod
+    def _film_dependencies(film_id: str, film: Optional[FilmResponseModel]) -> List[str]:
+        """Теги карточки фильма: сам фильм (в том числе ещё не созданный) и названия его жанров."""
+        if film is None:
+            return [film_tag(film_id)]
+        return [film_tag(film_id), *(genre_tag(genre.id) for genre in film.genre)]
+
+    @staticmethod
+    def _build_film(film_data: dict, genres: List[Genre]) -> FilmResponseModel:
+        return FilmResponseModel(**{
+            **film_data,
+            "genre": [{"id": genre.id, "name": genre.name} for genre in genres]
+        })
     
     
-    async def search(self, query: str, page_number: int, page_size: int) -> List[FilmSearchResponseModel]:
-        """Поиск фильмов по запросу."""
+    async def suggest(self, prefix: str, size: int) -> bytes:
+        """Подсказки по началу названия фильма. Возвращает готовое JSON-тело ответа."""
+        return await self.suggester.suggest(prefix, size)
+
+    async def search(self, query: str, page_number: int, page_size: int) -> bytes:
+        """Поиск фильмов по запросу (с кешированием). Возвращает готовое JSON-тело ответа."""
+        return await self.cache.get_or_set_raw(
+            build_cache_key("films:search", query=query, page_number=page_number, page_size=page_size),
+            lambda: self._search_in_elastic(query, page_number, page_size),
+            config.CACHE_FILMS_SEARCH_TTL,
+            # фильм, добавленный под запрос, появится на странице по истечении TTL
+            dependencies=film_rows_dependencies,
+        )
+
+    async def _search_in_elastic(self, query: str, page_number: int, page_size: int) -> bytes:
+        """Поиск фильмов по запросу в Elasticsearch."""
         body = {
-            "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title", "description"],
-                    "type": "best_fields"
-                }
-            },
+            "query": self._search_query(query),
+            "_source": LIST_SOURCE_FIELDS,
+            "track_total_hits": False,
             "from": (page_number - 1) * page_size,
             "size": page_size
         }
         res = await self.db_client.search(index=self.film_index, body=body)
-        return [
-            FilmSearchResponseModel(
-                uuid=hit["_id"],
-                title=hit["_source"]["title"],
-                imdb_rating=hit["_source"].get("imdb_rating")
-            )
-            for hit in res["hits"]["hits"]
-        ]
+        return orjson.dumps(self._hits_to_rows(res["hits"]["hits"]))
+
+    async def search_by_cursor(
+        self, query: str, cursor: str, page_size: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Поиск фильмов по запросу с курсорной пагинацией."""
+        return await self._search_by_cursor(
+            self._search_query(query),
+            [{"_score": {"order": "desc"}}],
+            cursor,
+            page_size,
+            query_fingerprint(endpoint="films:search", query=" ".join(query.lower().split())),
+        )
+
+    @staticmethod
+    def _search_query(query: str) -> dict:
+        return {
+            "multi_match": {
+                "query": query,
+                "fields": ["title", "description"],
+                "type": "best_fields"
+            }
+        }
         
-    async def get_similar_films(self, film_id: str, page_number: int, page_size: int) -> List[FilmSearchResponseModel]:
-        """Поиск похожих фильмов с более гибкими критериями."""
-        film = await self.get_by_id(film_id)
-        if not film:
+    async def get_similar_films(self, film_id: str, page_number: int, page_size: int) -> bytes:
+        """Поиск похожих фильмов (с кешированием). Возвращает готовое JSON-тело ответа."""
+        return await self.cache.get_or_set_raw(
+            build_cache_key("films:similar", film_id=film_id, page_number=page_number, page_size=page_size),
+            lambda: self._get_similar_films_from_elastic(film_id, page_number, page_size),
+            config.CACHE_FILMS_SIMILAR_TTL,
+            # подборка зависит и от самого фильма: его названия, описания, жанров и состава
+            dependencies=lambda raw: [film_tag(film_id), *film_rows_dependencies(raw)],
+        )
+
+    async def _get_similar_films_from_elastic(self, film_id: str, page_number: int, page_size: int) -> bytes:
+        """
+        Похожие фильмы из предрассчитанного индекса: один HGET и один mget.
+        Если для фильма ещё ничего не рассчитано или страница выходит за обрезанный
+        до SIMILAR_FILMS_TOP_N список, выполняется тот же запрос similar_films_query.
+        """
+        similar_ids = await self.similar_films_index.get_ids(film_id)
+        start, end = (page_number - 1) * page_size, page_number * page_size
+        # список короче SIMILAR_FILMS_TOP_N — полный: за его концом похожих фильмов нет
+        if similar_ids is not None and (end <= len(similar_ids) or len(similar_ids) < config.SIMILAR_FILMS_TOP_N):
+            return orjson.dumps(await self.get_list_rows(similar_ids[start:end]))
+        return await self._search_similar_films(film_id, page_number, page_size)
+
+    async def get_list_rows(self, film_ids: List[str]) -> List[dict]:
+        """
+        Строки списочного ответа (форма FilmSearchResponseModel) для заданных id одним mget.
+        Порядок сохраняется, несуществующие фильмы пропускаются.
+        """
+        if not film_ids:
             return []
-        should_conditions = []
-        if film.genre:
-            genre_names = [genre.name.lower() for genre in film.genre]  # Elasticsearch чувствителен к регистру!
-            should_conditions.append({"terms": {"genres": genre_names}})
-        if film.actors:
-            should_conditions.append({
-                "nested": {
-                    "path": "actors",
-                    "query": {
-                        "terms": {"actors.name": [actor.full_name for actor in film.actors]}
-                    }
-                }
-            })
-        if film.directors:
-            should_conditions.append({
-                "nested": {
-                    "path": "directors",
-                    "query": {
-                        "terms": {"directors.name": [director.full_name for director in film.directors]}
-                    }
-                }
-            })
-        if film.writers:
-            should_conditions.append({
-                "nested": {
-                    "path": "writers",
-                    "query": {
-                        "terms": {"writers.name": [writer.full_name for writer in film.writers]}
-                    }
-                }
-            })
-        if film.title:
-            should_conditions.append({"match": {"title": {"query": film.title, "fuzziness": "AUTO"}}})
-        if film.description:
-            should_conditions.append({"match": {"description": {"query": film.description, "fuzziness": "AUTO"}}})
+        res = await self.db_client.mget(index=self.film_index, ids=film_ids, source_includes=LIST_SOURCE_FIELDS)
+        return self._hits_to_rows([doc for doc in res["docs"] if doc.get("found")])
+
+    async def _similar_films_query(self, film_id: str) -> Optional[dict]:
+        """Запрос похожих фильмов по составу фильма; None — фильма нет."""
+        try:
+            doc = await self.db_client.get(index=self.film_index, id=film_id, source_includes=list(PERSON_ROLE_FIELDS))
+        except NotFoundError:
+            return None
+        return similar_films_query(film_id, doc.get("_source") or {})
+
+    async def _search_similar_films(self, film_id: str, page_number: int, page_size: int) -> bytes:
+        """Поиск похожих фильмов в Elasticsearch в порядке SIMILAR_FILMS_SORT."""
+        query = await self._similar_films_query(film_id)
+        if query is None:
+            return orjson.dumps([])
         body = {
-            "query": {
-                "bool": {
-                    "should": should_conditions,
-                    "minimum_should_match": 1,
-                    "must_not": {"term": {"_id": film_id}}
-                }
-            },
-            "sort": [{"imdb_rating": {"order": "desc"}}],
+            "query": query,
+            "sort": SIMILAR_FILMS_SORT,
+            "_source": LIST_SOURCE_FIELDS,
+            "track_total_hits": False,
             "from": (page_number - 1) * page_size,
             "size": page_size
         }
         res = await self.db_client.search(index=self.film_index, body=body)
-        return [
-            FilmSearchResponseModel(
-                uuid=hit["_id"],
-                title=hit["_source"]["title"],
-                imdb_rating=hit["_source"].get("imdb_rating")
-            )
-            for hit in res["hits"]["hits"]
-        ]
+        return orjson.dumps(self._hits_to_rows(res["hits"]["hits"]))
 
+    async def get_similar_films_by_cursor(
+        self, film_id: str, cursor: str, page_size: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Поиск похожих фильмов с курсорной пагинацией в порядке SIMILAR_FILMS_SORT."""
+        query = await self._similar_films_query(film_id)
+        if query is None:
+            return [], None
+        return await self._search_by_cursor(
+            query,
+            SIMILAR_FILMS_SORT,
+            cursor,
+            page_size,
+            query_fingerprint(endpoint="films:similar", film_id=film_id),
+        )
 
     async def get_films_list(
-        self, sort: str, genre: Optional[str], page_number: int, page_size: int
-    ) -> List[FilmSearchResponseModel]:
-        """Получает список фильмов с фильтрацией по жанру и сортировкой по рейтингу."""
-        
-        sort_field = "imdb_rating"
-        sort_order = "desc" if sort == "-imdb_rating" else "asc"
-        query_conditions = {"match_all": {}}
-        if genre:
-            genre_name = await self.genre_service.get_genre_name_by_id(genre)
-            if genre_name:
-                query_conditions = {"term": {"genres": genre_name}}
-            else:
-                return []
+        self, sort: str, filters: FilmFilters, page_number: int, page_size: int, facets: bool = False
+    ) -> bytes:
+        """
+        Получает список фильмов с фильтрами и сортировкой по рейтингу (с кешированием).
+        Возвращает готовое JSON-тело ответа: список фильмов, а с facets — объект
+        с фильмами и агрегациями (см. FilmsPageWithFacets).
+
+        Страница и агрегации кешируются отдельно: агрегации не зависят от страницы
+        и сортировки и живут дольше. Если нет ни того, ни другого, оба загружаются
+        одним запросом к Elasticsearch. Если запрос может ответить индекс ранжирования
+        в памяти, страница и агрегации считаются по нему, минуя кеш и Elasticsearch.
+        """
+        sort = "-imdb_rating" if sort == "-imdb_rating" else "imdb_rating"
+        if self.ranking_index is not None and self.ranking_index.can_serve(filters):
+            films_raw = await self._get_films_list_from_ranking_index(sort, filters, page_number, page_size)
+            if not facets:
+                return films_raw
+            return b'{"films":' + films_raw + b',"facets":' + await self._get_facets_from_ranking_index(filters) + b"}"
+        list_key = build_cache_key(
+            "films:list", sort=sort, **self._filters_key_params(filters), page_number=page_number, page_size=page_size
+        )
+        dependencies = self._films_list_dependencies(filters)
+        if not facets:
+            return await self.cache.get_or_set_raw(
+                list_key,
+                lambda: self._get_films_list_from_elastic(sort, filters, page_number, page_size),
+                config.CACHE_FILMS_LIST_TTL,
+                dependencies=dependencies,
+            )
+
+        facets_key = build_cache_key("films:facets", **self._filters_key_params(filters))
+        facets_raw = await self.cache.get(facets_key)
+        loaded_facets: Dict[str, bytes] = {}
+
+        async def load_list() -> bytes:
+            if facets_raw is not None:
+                return await self._get_films_list_from_elastic(sort, filters, page_number, page_size)
+            films_raw, loaded_facets["facets"] = await self._get_films_list_from_elastic(
+                sort, filters, page_number, page_size, with_facets=True
+            )
+            return films_raw
+
+        films_raw = await self.cache.get_or_set_raw(
+            list_key, load_list, config.CACHE_FILMS_LIST_TTL, dependencies=dependencies
+        )
+        if facets_raw is None and "facets" in loaded_facets:
+            facets_raw = loaded_facets["facets"]
+            await self.cache.set_many(
+                {facets_key: facets_raw},
+                {facets_key: config.CACHE_FILMS_FACETS_TTL},
+                {facets_key: self._facets_dependencies(filters)},
+            )
+        elif facets_raw is None:
+            facets_raw = await self.get_facets(filters)
+        return b'{"films":' + films_raw + b',"facets":' + facets_raw + b"}"
+
+    async def _get_films_list_from_ranking_index(
+        self, sort: str, filters: FilmFilters, page_number: int, page_size: int
+    ) -> bytes:
+        """Страница списка фильмов из индекса ранжирования; жанры фильтруются по названиям, как в Elasticsearch."""
+        genre_names = await self._ranking_index_genre_names(filters)
+        if genre_names == []:
+            return orjson.dumps([])
+        return self.ranking_index.get_page(
+            genre_names, filters.rating_min, filters.rating_max, sort == "-imdb_rating", page_number, page_size
+        )
+
+    async def _get_facets_from_ranking_index(self, filters: FilmFilters) -> bytes:
+        """Фасеты списка фильмов по колонкам индекса ранжирования, без Elasticsearch."""
+        genre_names = await self._ranking_index_genre_names(filters)
+        if genre_names == []:
+            return self._empty_facets()
+        return await self._facets_from_buckets(
+            *self.ranking_index.get_facets(genre_names, filters.rating_min, filters.rating_max)
+        )
+
+    async def _ranking_index_genre_names(self, filters: FilmFilters) -> Optional[List[str]]:
+        """Названия жанров фильтра: None — фильтра нет, пустой список — ни одного из жанров не существует."""
+        if not filters.genres:
+            return None
+        return [name for name in [await self._resolve_genre_name(genre) for genre in filters.genres] if name]
+
+    async def _get_films_list_from_elastic(
+        self, sort: str, filters: FilmFilters, page_number: int, page_size: int, with_facets: bool = False
+    ) -> Any:
+        """
+        Получает страницу списка фильмов; с with_facets — вместе с агрегациями
+        тем же запросом и возвращает пару (страница, агрегации).
+        """
+        clauses = await self._films_list_filters(filters)
+        if clauses is None:
+            return (orjson.dumps([]), self._empty_facets()) if with_facets else orjson.dumps([])
         body = {
-            "query": query_conditions,
-            "sort": [{sort_field: {"order": sort_order}}],
+            "_source": LIST_SOURCE_FIELDS,
+            "track_total_hits": with_facets,
+            "sort": self._films_list_sort(sort),
             "from": (page_number - 1) * page_size,
-            "size": page_size
+            "size": page_size,
         }
+        if with_facets:
+            body.update(self._facets_body(clauses))
+        else:
+            body["query"] = self._filter_query(clauses)
         res = await self.db_client.search(index=self.film_index, body=body)
-        return [
-            FilmSearchResponseModel(
-                uuid=hit["_id"],
-                title=hit["_source"]["title"],
-                imdb_rating=hit["_source"].get("imdb_rating")
+        films_raw = orjson.dumps(self._hits_to_rows(res["hits"]["hits"]))
+        if not with_facets:
+            return films_raw
+        return films_raw, await self._facets_from_response(res)
+
+    async def _get_facets_from_elastic(self, filters: FilmFilters) -> bytes:
+        """Агрегации списка фильмов без самих фильмов."""
+        clauses = await self._films_list_filters(filters)
+        if clauses is None:
+            return self._empty_facets()
+        body = {"size": 0, "track_total_hits": True, **self._facets_body(clauses)}
+        res = await self.db_client.search(index=self.film_index, body=body)
+        return await self._facets_from_response(res)
+
+    async def get_films_list_by_cursor(
+        self, sort: str, filters: FilmFilters, cursor: str, page_size: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Получает список фильмов с фильтрами и курсорной пагинацией."""
+        sort = "-imdb_rating" if sort == "-imdb_rating" else "imdb_rating"
+        clauses = await self._films_list_filters(filters)
+        if clauses is None:
+            return [], None
+        return await self._search_by_cursor(
+            self._filter_query(clauses),
+            self._films_list_sort(sort),
+            cursor,
+            page_size,
+            query_fingerprint(endpoint="films:list", sort=sort, **self._filters_key_params(filters)),
+        )
+
+    async def get_facets(self, filters: FilmFilters) -> bytes:
+        """Агрегации списка фильмов (с кешированием). Возвращает готовое JSON-тело."""
+        return await self.cache.get_or_set_raw(
+            build_cache_key("films:facets", **self._filters_key_params(filters)),
+            lambda: self._get_facets_from_elastic(filters),
+            config.CACHE_FILMS_FACETS_TTL,
+            # агрегации считаются по всему каталогу: остальные изменения догоняет короткий TTL
+            dependencies=lambda raw: self._facets_dependencies(filters),
+        )
+
+    @staticmethod
+    def _facets_dependencies(filters: FilmFilters) -> List[str]:
+        """Теги агрегаций: состав жанров фильтра."""
+        return [genre_films_tag(genre_id) for genre_id in filters.genres]
+
+    @staticmethod
+    def _films_list_dependencies(filters: FilmFilters) -> Callable[[bytes], List[str]]:
+        """
+        Теги страницы списка: фильмы на ней и, при фильтре по жанрам, состав этих
+        жанров. Фильм с новым рейтингом или только добавленный появится на странице
+        без фильтра по истечении CACHE_FILMS_LIST_TTL.
+        """
+        tags = [genre_films_tag(genre_id) for genre_id in filters.genres]
+        return lambda raw: [*tags, *film_rows_dependencies(raw)]
+
+    @staticmethod
+    def _filters_key_params(filters: FilmFilters) -> dict:
+        return {
+            "genre": sorted(filters.genres) or None,
+            "rating_min": filters.rating_min,
+            "rating_max": filters.rating_max,
+            "person": filters.person,
+        }
+
+    async def _films_list_filters(self, filters: FilmFilters) -> Optional[Dict[str, dict]]:
+        """
+        Условия фильтров по имени фасета (genres, rating) либо person. Все они
+        выполняются в контексте filter: не влияют на скоринг и кешируются Elasticsearch.
+        None, если ни одного из указанных жанров не существует.
+        """
+        clauses: Dict[str, dict] = {}
+        if filters.genres:
+            genre_names = [name for name in [await self._resolve_genre_name(genre) for genre in filters.genres] if name]
+            if not genre_names:
+                return None
+            clauses["genres"] = {"terms": {"genres": sorted(set(genre_names))}}
+        if filters.rating_min is not None or filters.rating_max is not None:
+            bounds = {}
+            if filters.rating_min is not None:
+                bounds["gte"] = filters.rating_min
+            if filters.rating_max is not None:
+                bounds["lte"] = filters.rating_max
+            clauses["rating"] = {"range": {"imdb_rating": bounds}}
+        if filters.person:
+            clauses["person"] = {
+                "bool": {
+                    "should": [
+                        {"nested": {"path": role_field, "query": {"term": {f"{role_field}.id": filters.person}}}}
+                        for role_field in PERSON_ROLE_FIELDS
+                    ],
+                    "minimum_should_match": 1,
+                }
+            }
+        return clauses
+
+    @staticmethod
+    def _filter_query(clauses: Dict[str, dict]) -> dict:
+        if not clauses:
+            return {"match_all": {}}
+        return {"bool": {"filter": list(clauses.values())}}
+
+    @staticmethod
+    def _facets_body(clauses: Dict[str, dict]) -> dict:
+        """
+        Запрос с агрегациями по фасетам. Фильтры фасетов вынесены в post_filter,
+        а каждая агрегация применяет фильтры остальных фасетов: так счётчики жанров
+        не обнуляются выбором жанра. Хиты при этом те же, что у обычного списка.
+        """
+        facet_clauses = {name: clause for name, clause in clauses.items() if name in FACET_AGGREGATIONS}
+        query_clauses = [clause for name, clause in clauses.items() if name not in FACET_AGGREGATIONS]
+        body = {
+            "query": {"bool": {"filter": query_clauses}} if query_clauses else {"match_all": {}},
+            "aggs": {
+                name: {
+                    "filter": {"bool": {"filter": [
+                        clause for other, clause in facet_clauses.items() if other != name
+                    ]}},
+                    "aggs": {"values": aggregation},
+                }
+                for name, aggregation in FACET_AGGREGATIONS.items()
+            },
+        }
+        if facet_clauses:
+            body["post_filter"] = {"bool": {"filter": list(facet_clauses.values())}}
+        return body
+
+    async def _facets_from_response(self, res: dict) -> bytes:
+        return await self._facets_from_buckets(
+            res["hits"]["total"]["value"],
+            [(bucket["key"], bucket["doc_count"]) for bucket in res["aggregations"]["genres"]["values"]["buckets"]],
+            [(bucket["key"], bucket["doc_count"]) for bucket in res["aggregations"]["rating"]["values"]["buckets"]],
+        )
+
+    async def _facets_from_buckets(
+        self, total: int, genre_buckets: List[Tuple[str, int]], rating_buckets: List[Tuple[float, int]]
+    ) -> bytes:
+        """
+        Тело фасетов по корзинам агрегаций: жанры (название, число) разрешаются
+        в id, корзины рейтинга (нижняя граница, число) — в диапазоны.
+        """
+        genres_by_name = {
+            genre.name.lower(): genre
+            for genre in await self._resolve_genres([name for name, _ in genre_buckets])
+        }
+        interval = config.FILMS_FACET_RATING_INTERVAL
+        return orjson.dumps({
+            "total": total,
+            "genres": [
+                {"id": genre.id, "name": genre.name, "count": count}
+                for name, count in genre_buckets
+                if (genre := genres_by_name.get(name.lower())) is not None
+            ],
+            "rating": [{"min": key, "max": key + interval, "count": count} for key, count in rating_buckets],
+        })
+
+    @staticmethod
+    def _empty_facets() -> bytes:
+        return orjson.dumps({"total": 0, "genres": [], "rating": []})
+
+    @staticmethod
+    def _films_list_sort(sort: str) -> List[dict]:
+        sort_order = "desc" if sort == "-imdb_rating" else "asc"
+        return [{"imdb_rating": {"order": sort_order}}]
+
+    async def _search_by_cursor(
+        self,
+        query: dict,
+        sort: List[dict],
+        cursor: str,
+        page_size: int,
+        fingerprint: str,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Постраничный обход результатов через point-in-time и search_after.
+
+        Стоимость страницы не зависит от её глубины и не ограничена max_result_window.
+        Пустой курсор открывает новый PIT; порядок стабилизируется тай-брейкером _shard_doc.
+
+        Args:
+            query: Запрос Elasticsearch
+            sort: Сортировка без тай-брейкера
+            cursor: Курсор от клиента, пустая строка для первой страницы
+            page_size: Размер страницы
+            fingerprint: Отпечаток параметров запроса, к которому привязан курсор
+
+        Returns:
+            Строки фильмов страницы и курсор следующей страницы (None, если страница последняя).
+
+        Raises:
+            InvalidCursorError: Курсор повреждён, истёк или выдан для другого запроса.
+        """
+        if cursor:
+            state = decode_cursor(cursor, fingerprint)
+        else:
+            pit = await self.db_client.open_point_in_time(
+                index=self.film_index, keep_alive=config.ELASTIC_PIT_KEEP_ALIVE
             )
-            for hit in res["hits"]["hits"]
+            state = Cursor(pit=pit["id"], fingerprint=fingerprint)
+
+        body = {
+            "query": query,
+            "sort": [*sort, {"_shard_doc": {"order": "asc"}}],
+            "_source": LIST_SOURCE_FIELDS,
+            "track_total_hits": False,
+            "size": page_size,
+            "pit": {"id": state.pit, "keep_alive": config.ELASTIC_PIT_KEEP_ALIVE},
+        }
+        if state.after is not None:
+            body["search_after"] = state.after
+        try:
+            res = await self.db_client.search(body=body)
+        except NotFoundError as exc:
+            raise InvalidCursorError("cursor expired") from exc
+
+        hits = res["hits"]["hits"]
+        if len(hits) < page_size:
+            with contextlib.suppress(NotFoundError):
+                await self.db_client.close_point_in_time(id=res.get("pit_id", state.pit))
+            return self._hits_to_rows(hits), None
+        next_cursor = Cursor(pit=res.get("pit_id", state.pit), after=hits[-1]["sort"], fingerprint=fingerprint)
+        return self._hits_to_rows(hits), encode_cursor(next_cursor)
+
+    @staticmethod
+    def _hits_to_rows(hits: List[dict]) -> List[dict]:
+        """
+        Строки списочных ответов в форме FilmSearchResponseModel.
+
+        Собираются без pydantic: поля приходят из Elasticsearch уже нужных типов,
+        а тело ответа сериализуется orjson напрямую, минуя повторную валидацию.
+        """
+        return [
+            {
+                "uuid": hit["_id"],
+                "title": hit["_source"]["title"],
+                "imdb_rating": hit["_source"].get("imdb_rating"),
+            }
+            for hit in hits
         ]
-    
+
+
+def get_film_service(request: Request) -> FilmService:
+    """
+    Получает сервис фильмов из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        FilmService: Сервис фильмов.
+    """
+
+    return request.app.state.film_service
@@ -0,0 +1,125 @@
+import asyncio
+import contextlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import config
+from db.indexes import GENRES_INDEX
+from db.redis import listen_channel
+from models.genre_model import Genre
+
+logger = logging.getLogger(__name__)
+
+
+class GenreRegistry:
+    """
+    Словарь всех жанров в памяти процесса.
+
+    Индекс жанров маленький и меняется редко, поэтому он целиком загружается при
+    старте приложения и обновляется в фоне: по таймеру и по уведомлению в канале
+    Redis pub/sub. Разрешение жанров по id и по названию не требует запросов к
+    Elasticsearch и выполняется точно, без нечёткого поиска.
+    """
+
+    genre_index = GENRES_INDEX
+
+    def __init__(self, db_client: AsyncElasticsearch):
+        self.db_client = db_client
+        self.by_id: Dict[str, Genre] = {}
+        self.by_name: Dict[str, Genre] = {}
+        self.loaded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_pending = False
+
+    async def load(self) -> None:
+        """Загружает индекс жанров целиком и атомарно подменяет словари."""
+        by_id: Dict[str, Genre] = {}
+        async for hit in async_scan(self.db_client, index=self.genre_index, query={"query": {"match_all": {}}}):
+            genre = Genre(id=hit["_id"], name=hit["_source"]["name"])
+            by_id[genre.id] = genre
+        self.by_id = by_id
+        self.by_name = {genre.name.lower(): genre for genre in by_id.values()}
+        self.loaded = True
+        logger.info("Genre registry loaded: %d genres", len(by_id))
+
+    def get(self, genre_id: str) -> Optional[Genre]:
+        """Жанр по UUID."""
+        return self.by_id.get(genre_id)
+
+    def get_name(self, genre_id: str) -> Optional[str]:
+        """Название жанра по UUID."""
+        genre = self.by_id.get(genre_id)
+        return genre.name if genre else None
+
+    def get_by_names(self, genre_names: Iterable[str]) -> List[Genre]:
+        """Жанры по точным (без учёта регистра) названиям, в порядке запроса, без повторов."""
+        genres: Dict[str, Genre] = {}
+        for name in genre_names:
+            genre = self.by_name.get(name.lower())
+            if genre is not None:
+                genres.setdefault(genre.id, genre)
+        return list(genres.values())
+
+    async def refresh_periodically(self, interval: float) -> None:
+        """Фоновая задача: перезагружает словарь раз в interval секунд."""
+        while True:
+            await asyncio.sleep(interval)
+            await self._safe_load()
+
+    async def listen_changes(self, redis: Redis) -> None:
+        """Фоновая задача: перезагружает словарь по уведомлению об изменении жанров."""
+        await listen_channel(redis, config.GENRES_CHANGED_CHANNEL, lambda _: self._schedule_refresh())
+
+    @staticmethod
+    async def notify_changed(redis: Redis) -> None:
+        """Оповещает все воркеры о том, что индекс жанров изменился."""
+        try:
+            await redis.publish(config.GENRES_CHANGED_CHANNEL, b"1")
+        except RedisError as exc:
+            logger.warning("Genre change notification failed: %s", exc)
+
+    async def close(self) -> None:
+        """Отменяет перезагрузку по уведомлению, если она ещё идёт."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+            self._refresh_task = None
+
+    def _schedule_refresh(self) -> None:
+        # серия уведомлений подряд схлопывается в одну перезагрузку, а уведомление,
+        # пришедшее во время загрузки, приводит к ещё одной после её окончания
+        self._refresh_pending = True
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._drain_refreshes())
+
+    async def _drain_refreshes(self) -> None:
+        while self._refresh_pending:
+            self._refresh_pending = False
+            await self._safe_load()
+
+    async def _safe_load(self) -> None:
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Genre registry refresh failed")
+
+
+def get_genre_registry(request: Request) -> GenreRegistry:
+    """
+    Получает словарь жанров из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        GenreRegistry: Словарь жанров.
+    """
+
+    return request.app.state.genre_registry
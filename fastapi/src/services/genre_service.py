@@ -1,26 +1,54 @@
-from typing import Optional, List
-from functools import lru_cache
+from typing import Dict, Optional, List, Tuple
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
-from fastapi import Depends
+from fastapi import Request
+from pydantic import TypeAdapter
 
-from db.elasticsearch import get_elastic
+from core.config import config
+from db.indexes import GENRES_INDEX
 from models.genre_model import Genre
 from services.abc.abstract_db_service import AbstractDBService
+from services.cache_invalidation import genre_tag
+from services.cache_service import RedisCacheService, build_cache_key
+from services.suggester import Suggester
 
+_genre_adapter = TypeAdapter(Optional[Genre])
+_genres_adapter = TypeAdapter(List[Genre])
 
-@lru_cache(maxsize=1)
-def get_genre_service(elastic: AsyncElasticsearch = Depends(get_elastic)) -> 'GenreService':
-    return GenreService(elastic)
+
+def _genres_dependencies(genres: List[Genre]) -> List[str]:
+    return [genre_tag(genre.id) for genre in genres]
 
 
 class GenreService(AbstractDBService[Genre, AsyncElasticsearch]):
-    genre_index = "genres"
+    genre_index = GENRES_INDEX
     
-    def __init__(self, db_client: AsyncElasticsearch):
+    def __init__(self, db_client: AsyncElasticsearch, cache: RedisCacheService):
         super().__init__(db_client)
+        self.cache = cache
+        self.suggester = Suggester(db_client, self.genre_index, "name", "genres:suggest")
 
     async def get_by_id(self, genre_id: str) -> Optional[Genre]:
+        """Получает жанр по ID (из кеша или Elasticsearch)."""
+        genre, _ = await self.get_by_id_with_etag(genre_id)
+        return genre
+
+    async def get_etag(self, genre_id: str) -> Optional[str]:
+        """ETag закешированного жанра без сборки модели; None — жанра нет в кеше."""
+        return await self.cache.get_etag(build_cache_key("genre", genre_id=genre_id), local=True)
+
+    async def get_by_id_with_etag(self, genre_id: str) -> Tuple[Optional[Genre], Optional[str]]:
+        """Получает жанр по ID вместе с ETag его закешированного значения."""
+        return await self.cache.get_or_set_with_etag(
+            build_cache_key("genre", genre_id=genre_id),
+            lambda: self._get_by_id_from_elastic(genre_id),
+            config.CACHE_GENRE_TTL,
+            _genre_adapter,
+            local=True,
+            dependencies=lambda genre: [genre_tag(genre_id)],
+        )
+
+    async def _get_by_id_from_elastic(self, genre_id: str) -> Optional[Genre]:
         """Получает жанр по ID из Elasticsearch."""
         try:
             doc = await self.db_client.get(index=self.genre_index, id=genre_id)
@@ -29,8 +57,62 @@ class GenreService(AbstractDBService[Genre, AsyncElasticsearch]):
         except NotFoundError:
             return None
         
+    async def get_many(self, genre_ids: List[str]) -> List[Genre]:
+        """
+        Получает жанры по списку ID: сначала из кешей, недостающие — одним mget.
+        Порядок ответа совпадает с порядком запроса, повторы и несуществующие id пропускаются.
+        """
+        genre_ids = list(dict.fromkeys(genre_ids))
+        genres = await self.cache.get_many_or_set(
+            {genre_id: build_cache_key("genre", genre_id=genre_id) for genre_id in genre_ids},
+            self._get_many_from_elastic,
+            config.CACHE_GENRE_TTL,
+            _genre_adapter,
+            local=True,
+            dependencies=lambda genre_id, genre: [genre_tag(genre_id)],
+        )
+        return [genres[genre_id] for genre_id in genre_ids if genres.get(genre_id) is not None]
+
+    async def _get_many_from_elastic(self, genre_ids: List[str]) -> Dict[str, Genre]:
+        """Получает жанры одним mget."""
+        res = await self.db_client.mget(index=self.genre_index, ids=genre_ids)
+        return {doc["_id"]: Genre(**doc["_source"]) for doc in res["docs"] if doc.get("found")}
+
+    async def suggest(self, prefix: str, size: int) -> bytes:
+        """Подсказки по началу названия жанра. Возвращает готовое JSON-тело ответа."""
+        return await self.suggester.suggest(prefix, size)
+
     async def search(self, query: str, page_number: int, page_size: int) -> List[Genre]:
-        """Поиск жанров по названию (с учетом опечаток)."""
+        """Поиск жанров по названию (с учетом опечаток и кешированием)."""
+        genres, _ = await self.search_with_etag(query, page_number, page_size)
+        return genres
+
+    async def search_etag(self, query: str, page_number: int, page_size: int) -> Optional[str]:
+        """ETag закешированной страницы поиска жанров; None — страницы нет в кеше."""
+        return await self.cache.get_etag(self._search_key(query, page_number, page_size))
+
+    async def search_with_etag(
+        self, query: str, page_number: int, page_size: int
+    ) -> Tuple[List[Genre], Optional[str]]:
+        """Поиск жанров по названию вместе с ETag закешированной страницы."""
+        try:
+            return await self.cache.get_or_set_with_etag(
+                self._search_key(query, page_number, page_size),
+                lambda: self._search_in_elastic(query, page_number, page_size),
+                config.CACHE_GENRES_SEARCH_TTL,
+                _genres_adapter,
+                dependencies=_genres_dependencies,
+            )
+        except NotFoundError:
+            # индекса жанров ещё нет; прочие ошибки не маскируются пустым ответом
+            return [], None
+
+    @staticmethod
+    def _search_key(query: str, page_number: int, page_size: int) -> str:
+        return build_cache_key("genres:search", query=query, page_number=page_number, page_size=page_size)
+
+    async def _search_in_elastic(self, query: str, page_number: int, page_size: int) -> List[Genre]:
+        """Поиск жанров по названию в Elasticsearch."""
         body = {
             "query": {
                 "match": {
@@ -44,33 +126,51 @@ class GenreService(AbstractDBService[Genre, AsyncElasticsearch]):
             "size": page_size
         }
 
-        try:
-            res = await self.db_client.search(index=self.genre_index, body=body)
-            return [Genre(id=hit["_id"], name=hit["_source"]["name"]) for hit in res["hits"]["hits"]]
-        except Exception:
-            return []
+        res = await self.db_client.search(index=self.genre_index, body=body)
+        return [Genre(id=hit["_id"], name=hit["_source"]["name"]) for hit in res["hits"]["hits"]]
 
     async def get_genres_list(
         self,
         page_number: int = 1,
         page_size: int = 50,
     ) -> List[Genre]:
-        """Получает список жанров с пагинацией."""
+        """Получает список жанров с пагинацией (с кешированием)."""
+        genres, _ = await self.get_genres_list_with_etag(page_number, page_size)
+        return genres
+
+    async def get_genres_list_etag(self, page_number: int, page_size: int) -> Optional[str]:
+        """ETag закешированной страницы списка жанров; None — страницы нет в кеше."""
+        return await self.cache.get_etag(build_cache_key("genres:list", page_number=page_number, page_size=page_size))
+
+    async def get_genres_list_with_etag(
+        self, page_number: int, page_size: int
+    ) -> Tuple[List[Genre], Optional[str]]:
+        """Получает страницу списка жанров вместе с ETag её закешированного значения."""
+        try:
+            return await self.cache.get_or_set_with_etag(
+                build_cache_key("genres:list", page_number=page_number, page_size=page_size),
+                lambda: self._get_genres_list_from_elastic(page_number, page_size),
+                config.CACHE_GENRES_LIST_TTL,
+                _genres_adapter,
+                dependencies=_genres_dependencies,
+            )
+        except NotFoundError:
+            return [], None
+
+    async def _get_genres_list_from_elastic(self, page_number: int, page_size: int) -> List[Genre]:
+        """Получает список жанров с пагинацией из Elasticsearch."""
         query = {
             "from": (page_number - 1) * page_size,
             "size": page_size
         }
-        try:
-            response = await self.db_client.search(index=self.genre_index, body=query)
-            genres = [Genre(**hit["_source"]) for hit in response["hits"]["hits"]]
-            return genres
-        except NotFoundError:
-            return []
+        response = await self.db_client.search(index=self.genre_index, body=query)
+        genres = [Genre(**hit["_source"]) for hit in response["hits"]["hits"]]
+        return genres
         
     async def get_genre_name_by_id(self, genre_id: str) -> Optional[str]:
         """Получает название жанра по его UUID."""
         try:
-            doc = await self.db_client.get(index="genres", id=genre_id)
+            doc = await self.db_client.get(index=self.genre_index, id=genre_id)
             return doc["_source"]["name"]
         except NotFoundError:
             return None    
@@ -91,3 +191,17 @@ class GenreService(AbstractDBService[Genre, AsyncElasticsearch]):
         }
         res = await self.db_client.search(index=self.genre_index, body=body)
         return [Genre(id=hit["_id"], name=hit["_source"]["name"]) for hit in res["hits"]["hits"]]
+
+
+def get_genre_service(request: Request) -> GenreService:
+    """
+    Получает сервис жанров из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        GenreService: Сервис жанров.
+    """
+
+    return request.app.state.genre_service
@@ -0,0 +1,50 @@
+import base64
+import hashlib
+from typing import Any, List, Optional
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён, истёк или выдан для другого запроса."""
+
+
+class Cursor(BaseModel):
+    """Состояние курсорной пагинации: point-in-time и sort-значения последнего хита."""
+    pit: str
+    after: Optional[List[Any]] = None
+    fingerprint: str
+
+
+def query_fingerprint(**params: Any) -> str:
+    """Короткий отпечаток параметров запроса, к которому привязан курсор."""
+    return hashlib.blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    """Упаковывает курсор в непрозрачную для клиента url-safe строку."""
+    return base64.urlsafe_b64encode(orjson.dumps(cursor.model_dump())).rstrip(b"=").decode()
+
+
+def decode_cursor(value: str, fingerprint: str) -> Cursor:
+    """
+    Распаковывает курсор и проверяет, что он выдан для того же запроса.
+
+    Args:
+        value: Строка курсора от клиента
+        fingerprint: Отпечаток параметров текущего запроса, см. query_fingerprint
+
+    Raises:
+        InvalidCursorError: Курсор не разбирается или выдан для других параметров.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        cursor = Cursor.model_validate(orjson.loads(raw))
+    except (ValueError, ValidationError) as exc:
+        raise InvalidCursorError("malformed cursor") from exc
+    if cursor.fingerprint != fingerprint:
+        raise InvalidCursorError("cursor does not match query parameters")
+    return cursor
@@ -0,0 +1,131 @@
+from typing import Dict, Optional, List
+
+import orjson
+from elasticsearch import AsyncElasticsearch, NotFoundError
+from fastapi import Request
+from pydantic import TypeAdapter
+
+from core.config import config
+from db.indexes import PERSONS_INDEX
+from models.person_model import PersonResponseModel
+from services.abc.abstract_db_service import AbstractDBService
+from services.cache_invalidation import film_rows_dependencies
+from services.cache_service import RedisCacheService, build_cache_key
+from services.film_service import FilmService
+from services.suggester import Suggester
+
+_person_adapter = TypeAdapter(Optional[PersonResponseModel])
+_persons_adapter = TypeAdapter(List[PersonResponseModel])
+
+
+class PersonService(AbstractDBService[PersonResponseModel, AsyncElasticsearch]):
+    person_index = PERSONS_INDEX
+
+    def __init__(self, db_client: AsyncElasticsearch, cache: RedisCacheService, film_service: FilmService):
+        super().__init__(db_client)
+        self.cache = cache
+        self.film_service = film_service
+        self.suggester = Suggester(db_client, self.person_index, "full_name", "persons:suggest")
+
+    async def get_by_id(self, person_id: str) -> Optional[PersonResponseModel]:
+        """Получает персону с её фильмами и ролями по ID (из кеша или Elasticsearch)."""
+        return await self.cache.get_or_set(
+            build_cache_key("person", person_id=person_id),
+            lambda: self._get_by_id_from_elastic(person_id),
+            config.CACHE_PERSON_TTL,
+            _person_adapter,
+            local=True,
+        )
+
+    async def _get_by_id_from_elastic(self, person_id: str) -> Optional[PersonResponseModel]:
+        """Получает персону по ID из Elasticsearch."""
+        try:
+            doc = await self.db_client.get(index=self.person_index, id=person_id)
+            return PersonResponseModel(**doc["_source"])
+        except NotFoundError:
+            return None
+
+    async def get_many(self, person_ids: List[str]) -> List[PersonResponseModel]:
+        """
+        Получает персон по списку ID: сначала из кешей, недостающие — одним mget.
+        Порядок ответа совпадает с порядком запроса, повторы и несуществующие id пропускаются.
+        """
+        person_ids = list(dict.fromkeys(person_ids))
+        persons = await self.cache.get_many_or_set(
+            {person_id: build_cache_key("person", person_id=person_id) for person_id in person_ids},
+            self._get_many_from_elastic,
+            config.CACHE_PERSON_TTL,
+            _person_adapter,
+            local=True,
+        )
+        return [persons[person_id] for person_id in person_ids if persons.get(person_id) is not None]
+
+    async def _get_many_from_elastic(self, person_ids: List[str]) -> Dict[str, PersonResponseModel]:
+        """Получает персон одним mget."""
+        res = await self.db_client.mget(index=self.person_index, ids=person_ids)
+        return {doc["_id"]: PersonResponseModel(**doc["_source"]) for doc in res["docs"] if doc.get("found")}
+
+    async def suggest(self, prefix: str, size: int) -> bytes:
+        """Подсказки по началу имени или фамилии персоны. Возвращает готовое JSON-тело ответа."""
+        return await self.suggester.suggest(prefix, size)
+
+    async def search(self, query: str, page_number: int, page_size: int) -> List[PersonResponseModel]:
+        """Поиск персон по имени (с учетом опечаток и кешированием)."""
+        return await self.cache.get_or_set(
+            build_cache_key("persons:search", query=query, page_number=page_number, page_size=page_size),
+            lambda: self._search_in_elastic(query, page_number, page_size),
+            config.CACHE_PERSONS_SEARCH_TTL,
+            _persons_adapter,
+        )
+
+    async def _search_in_elastic(self, query: str, page_number: int, page_size: int) -> List[PersonResponseModel]:
+        """Поиск персон по имени в Elasticsearch."""
+        body = {
+            "query": {
+                "match": {
+                    "full_name": {
+                        "query": query,
+                        "fuzziness": "AUTO"
+                    }
+                }
+            },
+            "track_total_hits": False,
+            "from": (page_number - 1) * page_size,
+            "size": page_size
+        }
+        res = await self.db_client.search(index=self.person_index, body=body)
+        return [PersonResponseModel(**hit["_source"]) for hit in res["hits"]["hits"]]
+
+    async def get_person_films(self, person_id: str) -> Optional[bytes]:
+        """
+        Фильмы персоны (с кешированием): id фильмов берутся из документа персоны,
+        сами фильмы — одним mget. Возвращает готовое JSON-тело ответа либо None,
+        если персона не найдена.
+        """
+        person = await self.get_by_id(person_id)
+        if person is None:
+            return None
+        return await self.cache.get_or_set_raw(
+            build_cache_key("person:films", person_id=person_id),
+            lambda: self._get_person_films_from_elastic(person),
+            config.CACHE_PERSON_FILMS_TTL,
+            dependencies=film_rows_dependencies,
+        )
+
+    async def _get_person_films_from_elastic(self, person: PersonResponseModel) -> bytes:
+        rows = await self.film_service.get_list_rows([film.uuid for film in person.films])
+        return orjson.dumps(rows)
+
+
+def get_person_service(request: Request) -> PersonService:
+    """
+    Получает сервис персон из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        PersonService: Сервис персон.
+    """
+
+    return request.app.state.person_service
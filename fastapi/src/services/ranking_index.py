@@ -0,0 +1,367 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import config
+from db.indexes import MOVIES_INDEX
+from models.film_model import FilmFilters
+from services.cache_invalidation import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+# Поля фильма, которые нужны индексу: строка ответа и фильтр по жанрам
+RANKING_SOURCE_FIELDS = ["title", "imdb_rating", "genres"]
+
+
+@dataclass(frozen=True)
+class _Columns:
+    """
+    Неизменяемый снимок колонок индекса ранжирования; позиция — номер фильма.
+
+    Удалённые фильмы не вырезаются, а помечаются в alive до следующей полной
+    загрузки: так позиции остальных фильмов и их строки не меняются.
+    """
+    ids: List[str]
+    positions: Dict[str, int]
+    # готовые JSON-строки ответа (форма FilmSearchResponseModel)
+    rows: List[bytes]
+    # рейтинг; NaN — рейтинга нет (в выдаче такие фильмы последние, как в Elasticsearch)
+    ratings: np.ndarray
+    alive: np.ndarray
+    # битовая маска жанров: бит genre_bits[name] в слове bit // 64
+    genres: np.ndarray
+    genre_bits: Dict[str, int]
+    # живые позиции по убыванию и по возрастанию рейтинга
+    order_desc: np.ndarray
+    order_asc: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "_Columns":
+        return cls(
+            ids=[], positions={}, rows=[], ratings=np.empty(0), alive=np.empty(0, dtype=bool),
+            genres=np.zeros((0, 1), dtype=np.uint64), genre_bits={},
+            order_desc=np.empty(0, dtype=np.int64), order_asc=np.empty(0, dtype=np.int64),
+        )
+
+    def updated(self, docs: Dict[str, Optional[dict]]) -> "_Columns":
+        """
+        Новый снимок с применёнными изменениями.
+
+        Args:
+            docs: Id фильма -> _source (поля RANKING_SOURCE_FIELDS) либо None, если фильм удалён
+        """
+        ids = list(self.ids)
+        positions = dict(self.positions)
+        rows = list(self.rows)
+        genre_bits = dict(self.genre_bits)
+        added = [film_id for film_id, source in docs.items() if source is not None and film_id not in positions]
+        for film_id in added:
+            positions[film_id] = len(ids)
+            ids.append(film_id)
+            rows.append(b"")
+        for source in docs.values():
+            for name in (source or {}).get("genres") or []:
+                genre_bits.setdefault(name, len(genre_bits))
+
+        ratings = np.concatenate([self.ratings, np.full(len(added), np.nan)])
+        alive = np.concatenate([self.alive, np.ones(len(added), dtype=bool)])
+        genres = np.zeros((len(ids), max(1, -(-len(genre_bits) // 64))), dtype=np.uint64)
+        genres[:len(self.ids), :self.genres.shape[1]] = self.genres
+
+        marked_rows: List[int] = []
+        marked_bits: List[int] = []
+        for film_id, source in docs.items():
+            position = positions.get(film_id)
+            if position is None:
+                continue
+            if source is None:
+                alive[position] = False
+                continue
+            rating = source.get("imdb_rating")
+            rows[position] = orjson.dumps({"uuid": film_id, "title": source.get("title"), "imdb_rating": rating})
+            ratings[position] = np.nan if rating is None else rating
+            alive[position] = True
+            genres[position] = 0
+            for name in source.get("genres") or []:
+                marked_rows.append(position)
+                marked_bits.append(genre_bits[name])
+        if marked_rows:
+            bits = np.asarray(marked_bits, dtype=np.uint64)
+            np.bitwise_or.at(
+                genres,
+                (np.asarray(marked_rows), (bits // 64).astype(np.intp)),
+                np.left_shift(np.uint64(1), bits % np.uint64(64)),
+            )
+
+        live = np.flatnonzero(alive)
+        # устойчивая сортировка: при равном рейтинге порядок загрузки, NaN в конце
+        order_desc = live[np.argsort(-ratings[live], kind="stable")]
+        order_asc = live[np.argsort(ratings[live], kind="stable")]
+        return _Columns(ids, positions, rows, ratings, alive, genres, genre_bits, order_desc, order_asc)
+
+    def page(
+        self,
+        genre_names: Optional[List[str]],
+        rating_min: Optional[float],
+        rating_max: Optional[float],
+        descending: bool,
+        offset: int,
+        size: int,
+    ) -> bytes:
+        order = self.order_desc if descending else self.order_asc
+        mask = self._combine(self._genre_mask(genre_names), self._rating_mask(rating_min, rating_max))
+        if mask is not None:
+            order = order[mask[order]]
+        rows = self.rows
+        return b"[" + b",".join([rows[position] for position in order[offset:offset + size].tolist()]) + b"]"
+
+    def facets(
+        self,
+        genre_names: Optional[List[str]],
+        rating_min: Optional[float],
+        rating_max: Optional[float],
+        genres_size: int,
+        interval: float,
+    ) -> Tuple[int, List[Tuple[str, int]], List[Tuple[float, int]]]:
+        """
+        Фасеты так же, как агрегации Elasticsearch в FilmService: каждый фасет
+        учитывает фильтр другого, общее число — оба.
+
+        Returns:
+            Число фильмов; (название жанра, число) по убыванию числа, при равенстве
+            по названию; (нижняя граница корзины рейтинга, число) по возрастанию.
+        """
+        genre_mask = self._genre_mask(genre_names)
+        rating_mask = self._rating_mask(rating_min, rating_max)
+        total = int(np.count_nonzero(self._combine(self.alive, genre_mask, rating_mask)))
+
+        # счётчик жанра — число строк с его битом; обходим только занятые биты
+        rows = self.genres[self._combine(self.alive, rating_mask)]
+        counts = (
+            (name, np.count_nonzero(rows[:, bit // 64] & (np.uint64(1) << np.uint64(bit % 64))))
+            for name, bit in self.genre_bits.items()
+        )
+        genre_counts = sorted(
+            ((name, int(count)) for name, count in counts if count), key=lambda item: (-item[1], item[0])
+        )[:genres_size]
+
+        # корзины как у histogram: floor(рейтинг / interval), пустые в пределах 0..10 тоже
+        ratings = self.ratings[self._combine(self.alive, genre_mask)]
+        buckets = np.floor(ratings[~np.isnan(ratings)] / interval).astype(np.int64)
+        low = min(0, int(buckets.min())) if len(buckets) else 0
+        high = max(int(np.floor((10 - interval) / interval)), int(buckets.max()) if len(buckets) else 0)
+        rating_counts = np.bincount(buckets - low, minlength=high - low + 1)
+        return total, genre_counts, [
+            (float((low + index) * interval), int(count)) for index, count in enumerate(rating_counts.tolist())
+        ]
+
+    def _genre_mask(self, genre_names: Optional[List[str]]) -> Optional[np.ndarray]:
+        if genre_names is None:
+            return None
+        wanted = np.zeros(self.genres.shape[1], dtype=np.uint64)
+        for name in genre_names:
+            bit = self.genre_bits.get(name)
+            if bit is not None:
+                wanted[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return (self.genres & wanted).any(axis=1)
+
+    def _rating_mask(self, rating_min: Optional[float], rating_max: Optional[float]) -> Optional[np.ndarray]:
+        if rating_min is None and rating_max is None:
+            return None
+        # сравнения с NaN ложны: фильмы без рейтинга отсеиваются, как range в Elasticsearch
+        mask = np.ones(len(self.ids), dtype=bool)
+        if rating_min is not None:
+            mask &= self.ratings >= rating_min
+        if rating_max is not None:
+            mask &= self.ratings <= rating_max
+        return mask
+
+    @staticmethod
+    def _combine(*masks: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        present = [mask for mask in masks if mask is not None]
+        if not present:
+            return None
+        return np.logical_and.reduce(present) if len(present) > 1 else present[0]
+
+
+class FilmRankingIndex:
+    """
+    Колоночный индекс фильмов в памяти процесса для списка фильмов,
+    отсортированного по рейтингу и отфильтрованного по жанрам и рейтингу,
+    и его фасетов.
+
+    Id, рейтинг и маска жанров фильмов хранятся массивами NumPy, а строки ответа
+    сериализуются заранее. Порядки по рейтингу в обе стороны рассчитываются при
+    загрузке и после изменений, поэтому страница — это векторная маска фильтров
+    и срез готового порядка, без запросов к Elasticsearch и Redis. Каталог
+    в несколько сотен тысяч фильмов занимает десятки мегабайт на воркер.
+
+    Индекс загружается целиком в фоне и затем следует за потоком событий
+    изменений CACHE_EVENTS_STREAM (его пишет ETL film_events): каждый воркер
+    читает поток сам, без группы, и дочитывает изменённые фильмы одним mget.
+    Раз в FILMS_RANKING_INDEX_REFRESH_INTERVAL индекс перезагружается целиком —
+    это убирает удалённые фильмы и страхует от пропущенных событий.
+    """
+
+    film_index = MOVIES_INDEX
+
+    def __init__(self, db_client: AsyncElasticsearch):
+        self.db_client = db_client
+        self.loaded = False
+        self._columns = _Columns.empty()
+        # фасеты по наборам фильтров; снимок колонок неизменяем, так что память
+        # верна, пока self._columns не подменён
+        self._facets: Dict[tuple, Tuple[int, List[Tuple[str, int]], List[Tuple[float, int]]]] = {}
+        self._facets_columns = self._columns
+
+    def __len__(self) -> int:
+        return len(self._columns.order_desc)
+
+    def can_serve(self, filters: FilmFilters) -> bool:
+        """Может ли индекс ответить на запрос с такими фильтрами (фильтр по персоне — нет)."""
+        return self.loaded and not filters.person
+
+    def get_page(
+        self,
+        genre_names: Optional[List[str]],
+        rating_min: Optional[float],
+        rating_max: Optional[float],
+        descending: bool,
+        page_number: int,
+        page_size: int,
+    ) -> bytes:
+        """
+        Страница списка фильмов: готовое JSON-тело в форме списка FilmSearchResponseModel.
+
+        Args:
+            genre_names: Названия жанров (фильм входит хотя бы в один); None — без фильтра
+            rating_min: Нижняя граница рейтинга включительно
+            rating_max: Верхняя граница рейтинга включительно
+            descending: По убыванию рейтинга
+            page_number: Номер страницы с 1
+            page_size: Размер страницы
+        """
+        return self._columns.page(
+            genre_names, rating_min, rating_max, descending, (page_number - 1) * page_size, page_size
+        )
+
+    def get_facets(
+        self, genre_names: Optional[List[str]], rating_min: Optional[float], rating_max: Optional[float]
+    ) -> Tuple[int, List[Tuple[str, int]], List[Tuple[float, int]]]:
+        """
+        Фасеты списка фильмов по колонкам индекса, без Elasticsearch: счётчики жанров
+        по маскам жанров и гистограмма рейтинга (см. _Columns.facets). Результат
+        запоминается до следующей подмены снимка.
+        """
+        columns = self._columns
+        if self._facets_columns is not columns or len(self._facets) >= config.FILMS_RANKING_INDEX_FACETS_MEMO_SIZE:
+            self._facets = {}
+            self._facets_columns = columns
+        key = (tuple(sorted(genre_names)) if genre_names is not None else None, rating_min, rating_max)
+        facets = self._facets.get(key)
+        if facets is None:
+            facets = self._facets[key] = columns.facets(
+                genre_names, rating_min, rating_max,
+                config.FILMS_FACET_GENRES_SIZE, config.FILMS_FACET_RATING_INTERVAL,
+            )
+        return facets
+
+    async def load(self) -> None:
+        """Загружает все фильмы и атомарно подменяет снимок колонок."""
+        started = time.perf_counter()
+        docs: Dict[str, Optional[dict]] = {}
+        async for hit in async_scan(
+            self.db_client,
+            index=self.film_index,
+            query={"query": {"match_all": {}}, "_source": RANKING_SOURCE_FIELDS},
+            size=config.FILMS_RANKING_INDEX_BATCH_SIZE,
+        ):
+            docs[hit["_id"]] = hit["_source"]
+        # сборка — сотни миллисекунд на большом каталоге: не в потоке событийного цикла
+        self._columns = await asyncio.to_thread(_Columns.empty().updated, docs)
+        self.loaded = True
+        logger.info("Film ranking index loaded: %d films in %.2fs", len(self), time.perf_counter() - started)
+
+    async def apply_changes(self, film_ids: List[str]) -> None:
+        """Перечитывает изменённые фильмы; не найденные в Elasticsearch удаляются из индекса."""
+        docs: Dict[str, Optional[dict]] = {}
+        batch_size = config.FILMS_RANKING_INDEX_BATCH_SIZE
+        for start in range(0, len(film_ids), batch_size):
+            res = await self.db_client.mget(
+                index=self.film_index, ids=film_ids[start:start + batch_size], source_includes=RANKING_SOURCE_FIELDS
+            )
+            for doc in res["docs"]:
+                docs[doc["_id"]] = doc["_source"] if doc.get("found") else None
+        self._columns = await asyncio.to_thread(self._columns.updated, docs)
+        logger.debug("Film ranking index updated: %d films changed", len(docs))
+
+    async def run(self, redis: Redis, retry_delay: float = 1.0) -> None:
+        """
+        Фоновая задача: загружает индекс, затем применяет события изменений фильмов
+        и периодически перезагружает индекс целиком.
+        """
+        loop = asyncio.get_running_loop()
+        last_id: Optional[str] = None
+        next_reload = 0.0
+        while True:
+            try:
+                if loop.time() >= next_reload:
+                    # позиция запоминается до загрузки: события, пришедшие во время неё, не теряются
+                    last_id = await self._stream_position(redis)
+                    await self.load()
+                    next_reload = loop.time() + config.FILMS_RANKING_INDEX_REFRESH_INTERVAL
+                response = await redis.xread(
+                    {config.CACHE_EVENTS_STREAM: last_id},
+                    count=config.FILMS_RANKING_INDEX_BATCH_SIZE,
+                    block=config.CACHE_EVENTS_BLOCK_MS,
+                )
+                film_ids: Dict[str, None] = {}
+                for _, messages in response or []:
+                    for message_id, fields in messages:
+                        last_id = message_id
+                        try:
+                            event = ChangeEvent.from_fields(fields)
+                        except KeyError:
+                            continue
+                        if event.entity == "film":
+                            film_ids[event.id] = None
+                if film_ids:
+                    await self.apply_changes(list(film_ids))
+            except RedisError as exc:
+                logger.warning("Film ranking index change feed failed: %s", exc)
+                await asyncio.sleep(retry_delay)
+            except Exception:
+                # индекс продолжает отвечать прежним снимком; следующая попытка — полная загрузка
+                logger.exception("Film ranking index refresh failed")
+                next_reload = loop.time() + retry_delay
+                await asyncio.sleep(retry_delay)
+
+    @staticmethod
+    async def _stream_position(redis: Redis) -> str:
+        """Id последнего события в потоке либо 0-0, если поток пуст."""
+        entries = await redis.xrevrange(config.CACHE_EVENTS_STREAM, count=1)
+        return entries[0][0] if entries else "0-0"
+
+
+def get_film_ranking_index(request: Request) -> Optional[FilmRankingIndex]:
+    """
+    Получает индекс ранжирования фильмов из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        Optional[FilmRankingIndex]: Индекс ранжирования, если он включён.
+    """
+
+    return request.app.state.film_ranking_index
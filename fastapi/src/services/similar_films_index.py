@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import config
+from db.indexes import MOVIES_INDEX, PERSON_ROLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+# Порядок похожих фильмов: по убыванию схожести, при равной — по рейтингу
+SIMILAR_FILMS_SORT = [
+    {"_score": {"order": "desc"}},
+    {"imdb_rating": {"order": "desc", "missing": "_last"}},
+]
+
+
+def similar_films_query(film_id: str, film: dict) -> dict:
+    """
+    Запрос похожих фильмов: more_like_this по названию, описанию и жанрам
+    и общие актёры, сценаристы и режиссёры. Состав хранится в nested-полях,
+    которых more_like_this не видит, поэтому персоны — отдельные условия по id.
+    Им рассчитывается индекс и ищутся страницы за его пределами, поэтому порядок
+    (SIMILAR_FILMS_SORT) везде один.
+
+    Args:
+        film_id: Id фильма
+        film: Источник документа фильма с полями состава (PERSON_ROLE_FIELDS)
+    """
+    should = [{
+        "more_like_this": {
+            "fields": ["title", "description", "genres"],
+            "like": [{"_index": MOVIES_INDEX, "_id": film_id}],
+            "min_term_freq": 1,
+            "min_doc_freq": 2,
+            "max_query_terms": 25,
+        }
+    }]
+    for role_field in PERSON_ROLE_FIELDS:
+        person_ids = [person["id"] for person in film.get(role_field) or []]
+        if person_ids:
+            should.append({
+                "nested": {
+                    "path": role_field,
+                    "query": {"terms": {f"{role_field}.id": person_ids}},
+                    "score_mode": "sum",
+                }
+            })
+    return {
+        "bool": {
+            "should": should,
+            "minimum_should_match": 1,
+            "must_not": [{"ids": {"values": [film_id]}}],
+        }
+    }
+
+
+class SimilarFilmsIndex:
+    """
+    Предрассчитанные списки похожих фильмов.
+
+    Фоновая задача обходит все фильмы и для каждого находит top-N похожих запросом
+    similar_films_query (пачками через msearch). Результаты хранятся в хеше Redis
+    film_id -> JSON-список id, поэтому запрос похожих фильмов сводится к HGET и mget.
+    Новый хеш собирается под временным ключом и атомарно подменяет старый через RENAME.
+    """
+
+    film_index = MOVIES_INDEX
+
+    def __init__(self, db_client: AsyncElasticsearch, redis: Redis):
+        self.db_client = db_client
+        self.redis = redis
+        self.key = f"{config.CACHE_PREFIX}:similar:films"
+        self.lock_key = f"{self.key}:lock"
+
+    async def get_ids(self, film_id: str) -> Optional[List[str]]:
+        """
+        Id похожих фильмов в порядке убывания схожести.
+
+        Returns:
+            Список id либо None, если для фильма ещё ничего не рассчитано.
+        """
+        try:
+            raw = await self.redis.hget(self.key, film_id)
+        except RedisError as exc:
+            logger.warning("Similar films lookup failed for %s: %s", film_id, exc)
+            return None
+        return orjson.loads(raw) if raw is not None else None
+
+    async def rebuild(self) -> int:
+        """Пересчитывает похожие фильмы для всего каталога. Возвращает число фильмов."""
+        building_key = f"{self.key}:building"
+        await self.redis.delete(building_key)
+        total = 0
+        batch: List[Tuple[str, dict]] = []
+        async for hit in async_scan(
+            self.db_client,
+            index=self.film_index,
+            query={"query": {"match_all": {}}, "_source": list(PERSON_ROLE_FIELDS)},
+        ):
+            batch.append((hit["_id"], hit.get("_source") or {}))
+            if len(batch) >= config.SIMILAR_FILMS_BATCH_SIZE:
+                total += await self._process_batch(building_key, batch)
+                batch = []
+        if batch:
+            total += await self._process_batch(building_key, batch)
+        if total:
+            await self.redis.rename(building_key, self.key)
+        logger.info("Similar films index rebuilt for %d films", total)
+        return total
+
+    async def _process_batch(self, building_key: str, films: List[Tuple[str, dict]]) -> int:
+        searches = []
+        for film_id, film in films:
+            searches.append({"index": self.film_index})
+            searches.append({
+                "query": similar_films_query(film_id, film),
+                "sort": SIMILAR_FILMS_SORT,
+                "_source": False,
+                "track_total_hits": False,
+                "size": config.SIMILAR_FILMS_TOP_N,
+            })
+        res = await self.db_client.msearch(searches=searches)
+        mapping = {}
+        for (film_id, _), response in zip(films, res["responses"]):
+            if "error" in response:
+                logger.warning("Similar films query failed for %s: %s", film_id, response["error"])
+                continue
+            mapping[film_id] = orjson.dumps([hit["_id"] for hit in response["hits"]["hits"]])
+        if mapping:
+            await self.redis.hset(building_key, mapping=mapping)
+        return len(mapping)
+
+    async def refresh_periodically(self, interval: float, check_interval: float = 60) -> None:
+        """
+        Фоновая задача: пересчитывает индекс раз в interval секунд.
+
+        Блокировка в Redis живёт interval секунд и не снимается после расчёта,
+        поэтому среди всех воркеров пересчёт выполняется не чаще одного раза за период.
+        """
+        while True:
+            try:
+                if await self.redis.set(self.lock_key, b"1", nx=True, ex=int(interval)):
+                    try:
+                        await self.rebuild()
+                    except Exception:
+                        # даём другому воркеру повторить попытку, не дожидаясь конца периода
+                        await self.redis.delete(self.lock_key)
+                        raise
+            except Exception:
+                logger.exception("Similar films index rebuild failed")
+            await asyncio.sleep(check_interval)
+
+
+def get_similar_films_index(request: Request) -> SimilarFilmsIndex:
+    """
+    Получает индекс похожих фильмов из состояния приложения.
+
+    Args:
+        request (Request): Текущий запрос FastAPI.
+
+    Returns:
+        SimilarFilmsIndex: Индекс похожих фильмов.
+    """
+
+    return request.app.state.similar_films_index
+
+
+async def main() -> None:
+    """Разовый пересчёт индекса похожих фильмов, например из cron."""
+    from db.elasticsearch import init_elastic
+    from db.redis import init_redis
+
+    redis = await init_redis()
+    es = await init_elastic()
+    try:
+        await SimilarFilmsIndex(es, redis).rebuild()
+    finally:
+        await redis.close()
+        await es.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import logging
+
+import orjson
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from core.config import config
+from core.metrics import CACHE_REQUESTS
+from db.indexes import SUGGEST_FIELD
+from services.cache_service import build_cache_key
+from services.memory_cache import MISSING, MemoryCache
+
+logger = logging.getLogger(__name__)
+
+
+class Suggester:
+    """
+    Подсказки поиска (typeahead) по полю completion индекса.
+
+    Возвращает только id и название, готовыми JSON-байтами. Короткие префиксы
+    составляют большую часть нажатий клавиш и их немного, поэтому ответы на них
+    хранятся в памяти процесса и отдаются без сетевых запросов. Длинные префиксы
+    почти не повторяются и идут прямо в Elasticsearch, минуя Redis: лишний сетевой
+    переход стоил бы дороже, чем сам completion suggester.
+    """
+
+    def __init__(self, es: AsyncElasticsearch, index: str, title_field: str, namespace: str):
+        """
+        Args:
+            es: Клиент Elasticsearch
+            index: Индекс с полем подсказок
+            title_field: Поле документа, отдаваемое как название
+            namespace: Пространство имён для ключей и метрик кеша, например "films:suggest"
+        """
+        self.es = es
+        self.index = index
+        self.title_field = title_field
+        self.namespace = namespace
+        self.prefix_cache = MemoryCache(
+            maxsize=config.SUGGEST_PREFIX_CACHE_MAXSIZE, ttl=config.SUGGEST_PREFIX_CACHE_TTL
+        )
+
+    async def suggest(self, prefix: str, size: int) -> bytes:
+        """
+        Подсказки по началу ввода.
+
+        Args:
+            prefix: Введённый текст
+            size: Количество подсказок
+
+        Returns:
+            bytes: JSON-список объектов с полями uuid и title.
+        """
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return b"[]"
+        if len(prefix) > config.SUGGEST_PREFIX_CACHE_MAX_LENGTH:
+            return await self._from_elastic(prefix, size)
+
+        key = build_cache_key(self.namespace, prefix=prefix, size=size)
+        raw = self.prefix_cache.get(key)
+        CACHE_REQUESTS.labels("local", self.namespace, "miss" if raw is MISSING else "hit").inc()
+        if raw is MISSING:
+            raw = await self._from_elastic(prefix, size)
+            self.prefix_cache.set(key, raw)
+        return raw
+
+    async def _from_elastic(self, prefix: str, size: int) -> bytes:
+        try:
+            res = await self.es.search(
+                index=self.index,
+                source=[self.title_field],
+                suggest={"suggestions": {"prefix": prefix, "completion": {"field": SUGGEST_FIELD, "size": size}}},
+            )
+        except NotFoundError:
+            logger.warning("Suggest index %s does not exist", self.index)
+            return b"[]"
+        options = res["suggest"]["suggestions"][0]["options"]
+        return orjson.dumps([
+            {"uuid": option["_id"], "title": option["_source"][self.title_field]}
+            for option in options
+        ])
@@ -0,0 +1,270 @@
+"""
+Прогрев кеша по наблюдаемому трафику.
+
+Middleware (api.middleware.traffic) отмечает успешные GET-запросы к маршрутам
+фильмов и жанров в TrafficRecorder: запрос нормализуется до маршрута и значимых
+параметров, счётчики копятся в памяти и раз в WARMUP_FLUSH_INTERVAL сбрасываются
+одним пайплайном в сортированное множество Redis. Множество общее для всех
+воркеров; его оценки периодически умножаются на коэффициент затухания, поэтому
+наверху оказываются запросы, популярные в последние часы.
+
+TrafficWarmup повторяет top-N запросов через FilmService и GenreService при
+старте воркера и по расписанию, с ограниченной конкурентностью, и прекращает
+прогрев при первых признаках недоступности Elasticsearch. Воркер готов к приёму
+трафика (/ready), когда прогретые запросы покрывают долю трафика
+WARMUP_READY_HIT_RATIO — это ожидаемая доля попаданий в кеш.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.config import config
+from core.metrics import WARMUP_HIT_RATIO
+from db.resilience import is_unavailable
+from models.film_model import FilmFilters
+from services.film_service import FilmService
+from services.genre_service import GenreService
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "on", "yes"):
+        return True
+    if value.lower() in ("0", "false", "off", "no"):
+        return False
+    raise ValueError(f"invalid boolean: {value}")
+
+
+@dataclass(frozen=True)
+class WarmRoute:
+    """Маршрут, который можно прогреть: вызов сервиса и значимые параметры запроса."""
+    warm: Callable[[FilmService, GenreService, Dict[str, Any]], Awaitable[Any]]
+    # параметр запроса -> (преобразование строки, значение по умолчанию); список — повторяемый параметр
+    params: Mapping[str, Tuple[Callable[[str], Any], Any]]
+
+    def normalize(self, path_params: Mapping[str, Any], query: Sequence[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+        """
+        Параметры запроса без неизвестных и равных значениям по умолчанию: запросы,
+        отличающиеся только ими, дают одну и ту же запись. None — параметр некорректен.
+        """
+        values: Dict[str, Any] = dict(path_params)
+        for name, (convert, default) in self.params.items():
+            raw = [value for key, value in query if key == name]
+            if not raw:
+                continue
+            try:
+                value = sorted({convert(item) for item in raw}) if isinstance(default, list) else convert(raw[-1])
+            except ValueError:
+                return None
+            if value != default:
+                values[name] = value
+        return values
+
+    def with_defaults(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        return {**{name: default for name, (_, default) in self.params.items()}, **values}
+
+
+_PAGE = {"page_number": (int, 1), "page_size": (int, 50)}
+
+WARM_ROUTES: Dict[str, WarmRoute] = {
+    "/api/v1/films/": WarmRoute(
+        lambda films, genres, p: films.get_films_list(
+            p["sort"],
+            FilmFilters(genres=p["genre"], rating_min=p["rating_min"], rating_max=p["rating_max"], person=p["person"]),
+            p["page_number"],
+            p["page_size"],
+            p["facets"],
+        ),
+        {
+            "sort": (str, "-imdb_rating"),
+            "genre": (str, []),
+            "rating_min": (float, None),
+            "rating_max": (float, None),
+            "person": (str, None),
+            "facets": (_parse_bool, False),
+            **_PAGE,
+        },
+    ),
+    "/api/v1/films/search": WarmRoute(
+        lambda films, genres, p: films.search(p["query"], p["page_number"], p["page_size"]),
+        {"query": (str, None), **_PAGE},
+    ),
+    "/api/v1/films/{film_id}": WarmRoute(lambda films, genres, p: films.get_by_id(p["film_id"]), {}),
+    "/api/v1/films/{film_id}/similar": WarmRoute(
+        lambda films, genres, p: films.get_similar_films(p["film_id"], p["page_number"], p["page_size"]),
+        {"page_number": (int, 1), "page_size": (int, 10)},
+    ),
+    "/api/v1/genres/": WarmRoute(
+        lambda films, genres, p: genres.get_genres_list(p["page_number"], p["page_size"]), _PAGE
+    ),
+    "/api/v1/genres/search": WarmRoute(
+        lambda films, genres, p: genres.search(p["query"], p["page_number"], p["page_size"]),
+        {"query": (str, None), **_PAGE},
+    ),
+    "/api/v1/genres/{genre_id}": WarmRoute(lambda films, genres, p: genres.get_by_id(p["genre_id"]), {}),
+}
+
+
+class TrafficRecorder:
+    """Счётчики нормализованных запросов в памяти процесса до сброса в Redis."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def record(self, route_path: str, path_params: Mapping[str, Any], query: Sequence[Tuple[str, str]]) -> None:
+        route = WARM_ROUTES.get(route_path)
+        if route is None:
+            return
+        values = route.normalize(path_params, query)
+        if values is not None:
+            self.counts[orjson.dumps([route_path, values], option=orjson.OPT_SORT_KEYS)] += 1
+
+    def drain(self) -> Counter:
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+class TrafficWarmup:
+    """Прогрев кеша top-N запросами трафика при старте воркера и по расписанию."""
+
+    def __init__(
+        self, redis: Redis, recorder: TrafficRecorder, film_service: FilmService, genre_service: GenreService
+    ):
+        self.redis = redis
+        self.recorder = recorder
+        self.film_service = film_service
+        self.genre_service = genre_service
+        self.key = config.WARMUP_KEY
+        self.lock_key = f"{self.key}:lock"
+        self.ready = False
+        self.hit_ratio = 0.0
+
+    async def flush(self) -> None:
+        """Сбрасывает накопленные счётчики в сортированное множество одним пайплайном."""
+        counts = self.recorder.drain()
+        if not counts:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for member, count in counts.items():
+                    pipe.zincrby(self.key, count, member)
+                await pipe.execute()
+        except RedisError as exc:
+            # счётчики за период теряются: на порядок запросов это почти не влияет
+            logger.warning("Traffic stats flush failed: %s", exc)
+
+    async def decay(self) -> None:
+        """Умножает оценки на коэффициент затухания за WARMUP_INTERVAL и оставляет WARMUP_TRACKED_KEYS лучших."""
+        factor = 0.5 ** (config.WARMUP_INTERVAL / config.WARMUP_DECAY_HALF_LIFE)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(self.key, {self.key: factor})
+            pipe.zremrangebyrank(self.key, 0, -(config.WARMUP_TRACKED_KEYS + 1))
+            await pipe.execute()
+
+    async def warm(self) -> float:
+        """
+        Повторяет top-N запросов с конкурентностью не выше WARMUP_CONCURRENCY.
+
+        Returns:
+            Ожидаемая доля попаданий: сумма оценок прогретых запросов к сумме оценок top-N;
+            1.0, если трафика ещё нет.
+        """
+        top = await self.redis.zrevrange(self.key, 0, config.WARMUP_TOP_N - 1, withscores=True)
+        total = sum(score for _, score in top)
+        if not total:
+            return 1.0
+        semaphore = asyncio.Semaphore(config.WARMUP_CONCURRENCY)
+        unavailable = asyncio.Event()
+        warmed = 0.0
+
+        async def replay(member: bytes, score: float) -> None:
+            nonlocal warmed
+            async with semaphore:
+                if unavailable.is_set():
+                    return
+                try:
+                    route_path, values = orjson.loads(member)
+                    route = WARM_ROUTES[route_path]
+                    await route.warm(self.film_service, self.genre_service, route.with_defaults(values))
+                except Exception as exc:
+                    if is_unavailable(exc):
+                        # не добавляем нагрузки хранилищу, которое и так не справляется
+                        unavailable.set()
+                    else:
+                        logger.debug("Warm-up of %r failed: %s", member, exc)
+                    return
+                warmed += score
+
+        await asyncio.gather(*(replay(member, score) for member, score in top))
+        if unavailable.is_set():
+            logger.warning("Warm-up stopped: Elasticsearch is unavailable")
+        return warmed / total
+
+    async def run_startup(self) -> None:
+        """
+        Фоновая задача старта воркера: прогревает кеш, пока доля попаданий не достигнет
+        WARMUP_READY_HIT_RATIO, и затем отмечает воркер готовым. По истечении
+        WARMUP_READY_TIMEOUT воркер отмечается готовым и без этого.
+        """
+        started = time.monotonic()
+        while not self.ready:
+            try:
+                self.hit_ratio = await self.warm()
+            except Exception:
+                logger.exception("Warm-up failed")
+            WARMUP_HIT_RATIO.set(self.hit_ratio)
+            elapsed = time.monotonic() - started
+            if self.hit_ratio >= config.WARMUP_READY_HIT_RATIO:
+                logger.info("Warm-up finished in %.2fs, hit ratio %.2f", elapsed, self.hit_ratio)
+                self.ready = True
+            elif config.WARMUP_READY_TIMEOUT is not None and elapsed >= config.WARMUP_READY_TIMEOUT:
+                logger.warning("Warm-up reached hit ratio %.2f only, ready anyway after %.0fs", self.hit_ratio, elapsed)
+                self.ready = True
+            else:
+                await asyncio.sleep(config.WARMUP_RETRY_INTERVAL)
+
+    async def run_schedule(self) -> None:
+        """
+        Фоновая задача: сбрасывает счётчики трафика и раз в WARMUP_INTERVAL применяет
+        затухание и прогревает кеш. Блокировка в Redis живёт WARMUP_INTERVAL секунд
+        и не снимается, поэтому среди всех воркеров это делает один за период.
+        """
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + config.WARMUP_INTERVAL
+        while True:
+            await asyncio.sleep(config.WARMUP_FLUSH_INTERVAL)
+            await self.flush()
+            if loop.time() < next_run:
+                continue
+            next_run = loop.time() + config.WARMUP_INTERVAL
+            try:
+                if await self.redis.set(self.lock_key, b"1", nx=True, ex=config.WARMUP_INTERVAL):
+                    await self.decay()
+                    self.hit_ratio = await self.warm()
+                    WARMUP_HIT_RATIO.set(self.hit_ratio)
+                    logger.info("Scheduled warm-up finished, hit ratio %.2f", self.hit_ratio)
+            except Exception:
+                logger.exception("Scheduled warm-up failed")
+
+
+async def readiness_endpoint(request: Request) -> Response:
+    """
+    Готовность воркера к трафику: 200, когда прогрев достиг целевой доли попаданий
+    (или выключен), иначе 503.
+    """
+    warmup: Optional[TrafficWarmup] = request.app.state.warmup
+    ready = warmup is None or warmup.ready
+    body = {"status": "ready" if ready else "warming"}
+    if warmup is not None:
+        body["hit_ratio"] = round(warmup.hit_ratio, 3)
+    return Response(orjson.dumps(body), status_code=200 if ready else 503, media_type="application/json")
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import orjson
+from fakeredis import FakeAsyncRedis
+
+from services.cache_invalidation import CacheInvalidationConsumer, ChangeEvent, film_rows_dependencies
+from services.cache_service import RedisCacheService, dependency_tag_key
+
+
+def test_film_event_tags():
+    event = ChangeEvent(entity="film", id="f1", genres=["g1", "g2"])
+
+    assert event.tags() == ["film:f1", "films:genre:g1", "films:genre:g2"]
+
+
+def test_genre_event_tags():
+    assert ChangeEvent(entity="genre", id="g1").tags() == ["genre:g1"]
+
+
+def test_event_round_trip_through_stream_fields():
+    event = ChangeEvent(entity="film", id="f1", genres=["g1"])
+    fields = {name.encode(): value.encode() for name, value in event.to_fields().items()}
+
+    assert ChangeEvent.from_fields(fields) == event
+    assert ChangeEvent.from_fields({b"entity": b"person", b"id": b"p1", b"genres": b""}).genres == []
+
+
+def test_film_rows_dependencies():
+    raw = orjson.dumps([{"uuid": "f1", "title": "A"}, {"uuid": "f2", "title": "B"}])
+
+    assert film_rows_dependencies(raw) == ["film:f1", "film:f2"]
+
+
+def test_invalidate_tags_deletes_exactly_tagged_keys():
+    async def scenario():
+        redis = FakeAsyncRedis()
+        cache = RedisCacheService(redis)
+        await cache.set_many(
+            {"k:film": b"1", "k:list": b"2", "k:other": b"3"},
+            {"k:film": 60, "k:list": 60, "k:other": 60},
+            {"k:film": ["film:f1"], "k:list": ["film:f1", "films:genre:g1"], "k:other": ["film:f2"]},
+        )
+
+        invalidated = await cache.invalidate_tags(*ChangeEvent(entity="film", id="f1").tags())
+
+        assert invalidated == 2
+        assert await redis.exists("k:film", "k:list") == 0
+        assert await redis.get("k:other") == b"3"
+        assert await redis.exists(dependency_tag_key("film:f1")) == 0
+        # тег жанра не затронут: его множество и ключ в нём остаются
+        assert await redis.zrange(dependency_tag_key("films:genre:g1"), 0, -1) == [b"k:list"]
+
+    asyncio.run(scenario())
+
+
+def test_set_many_prunes_expired_tag_members():
+    async def scenario():
+        redis = FakeAsyncRedis()
+        cache = RedisCacheService(redis)
+        tag_key = dependency_tag_key("film:f1")
+        await redis.zadd(tag_key, {"k:expired": time.time() - 1})
+
+        await cache.set_many({"k:live": b"1"}, {"k:live": 60}, {"k:live": ["film:f1"]})
+
+        assert await redis.zrange(tag_key, 0, -1) == [b"k:live"]
+
+    asyncio.run(scenario())
+
+
+def test_consumer_skips_malformed_event_and_acks_batch():
+    async def scenario():
+        redis = FakeAsyncRedis()
+        cache = RedisCacheService(redis)
+        consumer = CacheInvalidationConsumer(redis, cache, consumer="test")
+        await consumer._ensure_group()
+        await cache.set_many({"k:film": b"1"}, {"k:film": 60}, {"k:film": ["film:f1"]})
+        await redis.xadd(consumer.stream, {"entity": "film"})
+        await redis.xadd(consumer.stream, ChangeEvent(entity="film", id="f1").to_fields())
+
+        [(_, messages)] = await redis.xreadgroup(consumer.group, consumer.consumer, {consumer.stream: ">"})
+        await consumer._handle(messages)
+
+        assert await redis.get("k:film") is None
+        assert (await redis.xpending(consumer.stream, consumer.group))["pending"] == 0
+
+    asyncio.run(scenario())
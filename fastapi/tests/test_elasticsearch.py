@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+
+import elastic_transport
+from elastic_transport import AiohttpHttpNode, NodeConfig
+
+from core.config import config
+from db.elasticsearch import (_SESSION_OVERRIDE_SUPPORTED, _VERIFIED_TRANSPORT_VERSION, InstrumentedAiohttpNode,
+                              PooledAiohttpNode)
+
+# Строки переопределения, которых нет в исходном методе elastic-transport
+_OVERRIDE_ONLY_LINES = {
+    "if not _SESSION_OVERRIDE_SUPPORTED:",
+    "super()._create_aiohttp_session()",
+    "return",
+    "keepalive_timeout=config.ELASTIC_KEEPALIVE_TIMEOUT,",
+}
+
+
+def _code_lines(function) -> list:
+    """Строки кода функции без отступов, пустых строк и докстринга."""
+    source = inspect.getsource(function)
+    if function.__doc__ is not None:
+        start = source.index('"""')
+        source = source[:start] + source[source.index('"""', start + 3) + 3:]
+    return [line.strip() for line in source.splitlines() if line.strip()]
+
+
+def test_transport_version_is_verified():
+    version = tuple(int(part) for part in elastic_transport.__version__.split(".")[:2])
+    assert version == _VERIFIED_TRANSPORT_VERSION
+    assert _SESSION_OVERRIDE_SUPPORTED
+
+
+def test_session_override_matches_transport():
+    # переопределение повторяет закрытый метод elastic-transport: при любом его изменении
+    # тест падает, и переопределение нужно сверить заново
+    upstream = _code_lines(AiohttpHttpNode._create_aiohttp_session)
+    override = [
+        line.replace("self.connector_class(", "aiohttp.TCPConnector(")
+        for line in _code_lines(PooledAiohttpNode._create_aiohttp_session)
+        if line not in _OVERRIDE_ONLY_LINES
+    ]
+    assert override == upstream
+
+
+def test_session_uses_keepalive_and_connector_class():
+    async def scenario():
+        node = InstrumentedAiohttpNode(NodeConfig("http", "localhost", 9200, connections_per_node=3))
+        try:
+            node._create_aiohttp_session()
+            connector = node.session.connector
+            assert isinstance(connector, InstrumentedAiohttpNode.connector_class)
+            assert connector.limit_per_host == 3
+            assert connector._keepalive_timeout == config.ELASTIC_KEEPALIVE_TIMEOUT
+        finally:
+            await node.close()
+
+    asyncio.run(scenario())
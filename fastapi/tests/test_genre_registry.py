@@ -0,0 +1,25 @@
+import asyncio
+
+from services.genre_registry import GenreRegistry
+
+
+def test_close_cancels_pending_refresh():
+    async def scenario():
+        registry = GenreRegistry(db_client=None)
+        started = asyncio.Event()
+
+        async def slow_load():
+            started.set()
+            await asyncio.sleep(60)
+
+        registry.load = slow_load
+        registry._schedule_refresh()
+        task = registry._refresh_task
+        await started.wait()
+        await registry.close()
+        assert task.cancelled()
+        assert registry._refresh_task is None
+        # повторное закрытие без задачи ничего не делает
+        await registry.close()
+
+    asyncio.run(scenario())
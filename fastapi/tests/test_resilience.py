@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elastic_transport import ConnectionError as TransportConnectionError
+from elasticsearch import ApiError
+
+from db.resilience import CircuitBreaker, DeadlineExceededError, ResilientElasticsearch, set_deadline
+
+
+class _SlowClient:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def search(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return {"hits": {"hits": []}}
+
+
+def _resilient(delay: float) -> ResilientElasticsearch:
+    return ResilientElasticsearch(_SlowClient(delay), CircuitBreaker("test", failure_threshold=3, recovery_timeout=1))
+
+
+def test_latency_ignores_reads_without_deadline():
+    async def scenario():
+        es = _resilient(0.01)
+        # фоновая задача: срока нет
+        await es.search(index="movies")
+        assert es.latency is None
+
+        set_deadline(1.0)
+        await es.search(index="movies")
+        assert es.latency is not None
+
+    asyncio.run(scenario())
+
+
+def test_latency_decays_without_samples():
+    es = _resilient(0.0)
+    es._observe_latency(1.0)
+    es._latency_at = time.monotonic() - es.LATENCY_HALF_LIFE
+
+    assert abs(es.latency - 0.5) < 0.01
+
+
+class _FailingClient:
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+    async def search(self, **kwargs):
+        raise self.exc
+
+
+def test_own_deadline_does_not_open_breaker():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+        es = ResilientElasticsearch(_SlowClient(0.05), breaker)
+        for _ in range(5):
+            set_deadline(0.001)
+            with pytest.raises(DeadlineExceededError):
+                await es.search(index="movies")
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_server_errors_open_breaker():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+        es = ResilientElasticsearch(_FailingClient(TransportConnectionError("refused")), breaker)
+        for _ in range(2):
+            with pytest.raises(TransportConnectionError):
+                await es.search(index="movies")
+        assert breaker.state == CircuitBreaker.OPEN
+
+    asyncio.run(scenario())
+
+
+def _api_error(status: int) -> ApiError:
+    meta = ApiResponseMeta(
+        status=status, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=NodeConfig("http", "es", 9200)
+    )
+    return ApiError("error", meta=meta, body={})
+
+
+def test_api_error_handler_maps_unavailable_statuses_to_503():
+    from main import elastic_api_error_handler
+
+    async def scenario():
+        for status in (500, 503, 429):
+            response = await elastic_api_error_handler(None, _api_error(status))
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+        with pytest.raises(ApiError):
+            await elastic_api_error_handler(None, _api_error(400))
+
+    asyncio.run(scenario())